@@ -0,0 +1,131 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_loader import read_price_csv, write_csv_atomic
+from universe_backtest import find_symbol_files
+
+# 原始价格 + 复权因子的存储: <raw_dir>/<symbol>.csv 为不复权日线，<raw_dir>/factors/<symbol>.csv 为后复权因子(date, hfq_factor)
+# 因子只在发生除权除息的日期有一行，从该日起生效；后复权价 = 原始价 × 当日因子，前复权价 = 后复权价 / 最新因子
+# 历史因子不会因为新的分红而改变，所以刷新时只需追加新的因子行，前复权数据由本地重新计算
+
+ADJUST_MODES = ('qfq', 'hfq', 'raw')
+PRICE_COLUMNS = ['open', 'close', 'high', 'low']
+FACTOR_COLUMN = 'hfq_factor'
+
+
+def factors_path(raw_dir, symbol):
+    return os.path.join(raw_dir, 'factors', f'{symbol}.csv')
+
+
+def fetch_factors(symbol):
+    import akshare as ak
+    return ak.stock_zh_a_daily(symbol=symbol, adjust='hfq-factor')
+
+
+def normalize_factors(factors):
+    factors = pd.DataFrame({'date': pd.to_datetime(factors['date']),
+                            FACTOR_COLUMN: pd.to_numeric(factors[FACTOR_COLUMN], errors='coerce')})
+    factors = factors.dropna().sort_values('date', kind='stable')
+    return factors.drop_duplicates('date', keep='last').reset_index(drop=True)
+
+
+def read_factors(path):
+    return normalize_factors(pd.read_csv(path, encoding='utf-8-sig'))
+
+
+def write_factors(factors, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_csv_atomic(factors.assign(date=factors['date'].dt.strftime('%Y-%m-%d')), path)
+
+
+def refresh_factors(symbol, path, fetch=fetch_factors, tolerance=1e-6):
+    # 已保存的因子与新数据一致时只追加新的除权日；历史因子被修订时整体重写
+    fresh = fetch(symbol)
+    if fresh is None or len(fresh) == 0:
+        raise ValueError("复权因子为空")
+    fresh = normalize_factors(fresh)
+    if not os.path.exists(path):
+        write_factors(fresh, path)
+        return {'mode': 'full', 'new_factors': len(fresh)}
+
+    stored = read_factors(path)
+    last_date = stored['date'].max() if len(stored) > 0 else pd.Timestamp.min
+    overlap = stored.merge(fresh, on='date', how='left', suffixes=('', '_new'))
+    consistent = ((overlap[FACTOR_COLUMN] - overlap[f'{FACTOR_COLUMN}_new']).abs() <= tolerance).all()
+    if not consistent:
+        write_factors(fresh, path)
+        return {'mode': 'rebuild', 'new_factors': len(fresh)}
+
+    new_factors = fresh[fresh['date'] > last_date]
+    if len(new_factors) == 0:
+        return {'mode': 'up-to-date', 'new_factors': 0}
+    write_factors(pd.concat([stored, new_factors], ignore_index=True), path)
+    return {'mode': 'append', 'new_factors': len(new_factors)}
+
+
+def factor_at(dates, factors):
+    # 每个交易日适用的因子(该日或之前最近一次除权日的因子)；早于第一条因子的日期沿用第一条
+    factor_dates = factors['date'].to_numpy(dtype='datetime64[ns]')
+    values = factors[FACTOR_COLUMN].to_numpy(dtype=float)
+    if len(values) == 0:
+        return np.ones(len(dates))
+    pos = np.searchsorted(factor_dates, pd.DatetimeIndex(dates).to_numpy(dtype='datetime64[ns]'), side='right') - 1
+    return values[np.maximum(pos, 0)]
+
+
+def adjust_prices(raw, factors, adjust='qfq'):
+    # raw 为 read_price_csv 格式(date 索引)的不复权日线；只调整价格列，成交额等其余列保持不变
+    if adjust not in ADJUST_MODES:
+        raise ValueError(f"未知的复权方式: {adjust}")
+    if adjust == 'raw':
+        return raw.copy()
+    factor = factor_at(raw.index, factors)
+    # 没有因子行(从未除权除息)时三种价格相同，factor_at 已返回全 1，直接沿用原始价格
+    if adjust == 'qfq' and len(factors) > 0:
+        factor = factor / factors[FACTOR_COLUMN].iloc[-1]
+    columns = [x for x in PRICE_COLUMNS if x in raw.columns]
+    adjusted = raw.copy()
+    adjusted[columns] = raw[columns].to_numpy(dtype=float) * factor[:, None]
+    return adjusted
+
+
+def build_view(raw_csv, factor_csv, output_file, adjust='qfq'):
+    raw = read_price_csv(raw_csv)
+    factors = read_factors(factor_csv) if adjust != 'raw' else None
+    view = adjust_prices(raw, factors, adjust).reset_index()
+    view['date'] = view['date'].dt.strftime('%Y-%m-%d')
+    write_csv_atomic(view, output_file)
+    return len(view)
+
+
+def build_views(raw_dir, output_dir, adjust='qfq', pattern='*.csv'):
+    os.makedirs(output_dir, exist_ok=True)
+    built = {}
+    failures = {}
+    for symbol, raw_csv in find_symbol_files(raw_dir, pattern):
+        try:
+            built[symbol] = build_view(raw_csv, factors_path(raw_dir, symbol),
+                                       os.path.join(output_dir, f'{symbol}.csv'), adjust)
+        except Exception as e:
+            failures[symbol] = f"{type(e).__name__}: {e}"
+    return built, failures
+
+
+def run(args):
+    if os.path.abspath(args.raw_dir) == os.path.abspath(args.output_dir):
+        raise SystemExit("输出目录不能与原始数据目录相同")
+    started = time.time()
+    built, failures = build_views(args.raw_dir, args.output_dir, args.adjust, args.pattern)
+    print(f"完成: 由原始价格和复权因子生成 {len(built)} 个 {args.adjust} 数据文件，用时 {time.time() - started:.1f} 秒，"
+          f"保存在 {args.output_dir}")
+    if failures:
+        print(f"失败 {len(failures)} 个: " + ', '.join(f"{k} ({v})" for k, v in failures.items()))
+
+
+if __name__ == '__main__':
+    import sys
+    from cli import main
+    main(['adjust'] + sys.argv[1:])
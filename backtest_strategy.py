@@ -1,278 +1,163 @@
-import pandas as pd
-import numpy as np
-import matplotlib.dates as mdates
-import matplotlib.pyplot as plt
-from matplotlib import font_manager
-import platform
-
-system_name = platform.system()
-if system_name == 'Windows':
-    font_names = ['SimHei', 'Microsoft YaHei', 'SimSun', 'FangSong', 'KaiTi']
-    found = False
-    for font_name in font_names:
-        try:
-            font_prop = font_manager.FontProperties(family=font_name)
-            plt.rcParams['font.sans-serif'] = [font_name]
-            plt.rcParams['axes.unicode_minus'] = False
-            found = True
-            break
-        except:
-            continue
-
-print("=" * 60)
-print("青农商行(002958)定投策略回测")
-print("=" * 60)
-
-df = pd.read_csv('qrcb_historical_data.csv')
-df['date'] = pd.to_datetime(df['date'])
-df.set_index('date', inplace=True)
-
-print(f"\n数据时间范围: {df.index[0]} 至 {df.index[-1]}")
-print(f"总交易日数: {len(df)}")
-print(f"首日收盘价: {df['close'].iloc[0]:.2f}")
-print(f"末日收盘价: {df['close'].iloc[-1]:.2f}")
-
-# 输入开始日期（暂时注释掉，直接使用默认）
-# start_date_input = input("\n请输入开始日期 (格式: YYYY-MM-DD, 按Enter使用默认开始日期): ")
-# if start_date_input:
-#     start_date = pd.to_datetime(start_date_input)
-#     # 过滤数据，只保留开始日期之后的数据
-#     df = df[df.index >= start_date]
-#     print(f"\n回测时间范围: {df.index[0]} 至 {df.index[-1]}")
-#     print(f"回测交易日数: {len(df)}")
-# else:
-print(f"\n使用默认时间范围: {df.index[0]} 至 {df.index[-1]}")
-
-monthly_investment = 1000
-
-def backtest_sip(data, invest_day=1):
-    data = data.copy()
-    data['year_month'] = data.index.to_period('M')
-    
-    total_invested = 0
-    total_shares = 0
-    investment_dates = []
-    
-    for year_month in data['year_month'].unique():
-        month_data = data[data['year_month'] == year_month]
-        
-        if invest_day == 'lowest':
-            invest_idx = month_data['low'].idxmin()
-        elif invest_day == 'highest':
-            invest_idx = month_data['high'].idxmax()
-        else:
-            if invest_day == -1:
-                invest_idx = month_data.index[-1]
-            else:
-                invest_idx = min(invest_day - 1, len(month_data) - 1)
-                if invest_idx < 0:
-                    continue
-                invest_idx = month_data.index[invest_idx]
-        
-        if invest_idx not in month_data.index:
-            continue
-            
-        invest_price = month_data.loc[invest_idx, 'close']
-        
-        shares = monthly_investment / invest_price
-        
-        total_invested += monthly_investment
-        total_shares += shares
-        
-        investment_dates.append({
-            'date': invest_idx,
-            'price': invest_price,
-            'shares': shares
-        })
-    
-    final_value = total_shares * data['close'].iloc[-1]
-    total_profit = final_value - total_invested
-    profit_rate = (total_profit / total_invested) * 100 if total_invested > 0 else 0
-    
-    years = (data.index[-1] - data.index[0]).days / 365.25
-    annualized_return = ((final_value / total_invested) ** (1 / years) - 1) * 100 if years > 0 and total_invested > 0 else 0
-    
-    return {
-        'total_invested': total_invested,
-        'final_value': final_value,
-        'total_profit': total_profit,
-        'profit_rate': profit_rate,
-        'annualized_return': annualized_return,
-        'investment_count': len(investment_dates),
-        'investment_dates': investment_dates
-    }
-
-invest_day = 11
-
-def backtest_sip_with_open(data, invest_day=11):
-    data = data.copy()
-    data['year_month'] = data.index.to_period('M')
-    
-    total_invested = 0
-    total_shares = 0
-    investment_dates = []
-    
-    for year_month in data['year_month'].unique():
-        month_data = data[data['year_month'] == year_month]
-        
-        # 寻找11日或之后的第一个交易日
-        target_day = invest_day
-        invest_date = None
-        invest_price = None
-        
-        # 先找11日当天
-        for date in month_data.index:
-            if date.day == target_day:
-                invest_date = date
-                invest_price = month_data.loc[date, 'open']
-                break
-        
-        # 如果11日没开盘，找下一个交易日
-        if invest_date is None:
-            for date in month_data.index:
-                if date.day > target_day:
-                    invest_date = date
-                    invest_price = month_data.loc[date, 'open']
-                    break
-        
-        # 如果11日之后也没有（月末），就找该月最后一个交易日
-        if invest_date is None and len(month_data) > 0:
-            invest_date = month_data.index[-1]
-            invest_price = month_data.loc[invest_date, 'open']
-        
-        if invest_date is not None and invest_price is not None:
-            shares = monthly_investment / invest_price
-            
-            total_invested += monthly_investment
-            total_shares += shares
-            
-            investment_dates.append({
-                'date': invest_date,
-                'price': invest_price,
-                'shares': shares
-            })
-    
-    final_value = total_shares * data['close'].iloc[-1]
-    total_profit = final_value - total_invested
-    profit_rate = (total_profit / total_invested) * 100 if total_invested > 0 else 0
-    
-    years = (data.index[-1] - data.index[0]).days / 365.25
-    annualized_return = ((final_value / total_invested) ** (1 / years) - 1) * 100 if years > 0 and total_invested > 0 else 0
-    
-    return {
-        'total_invested': total_invested,
-        'final_value': final_value,
-        'total_profit': total_profit,
-        'profit_rate': profit_rate,
-        'annualized_return': annualized_return,
-        'investment_count': len(investment_dates),
-        'investment_dates': investment_dates
-    }
+import sys
 
-result = backtest_sip_with_open(df, invest_day=invest_day)
-
-print(f"\n{'=' * 60}")
-print(f"策略: 每月{invest_day}日(或下一个交易日)用开盘价定投 {monthly_investment} 元")
-print(f"{'=' * 60}")
-print(f"\n定投次数: {result['investment_count']} 次")
-print(f"总投入金额: {result['total_invested']:.2f} 元")
-print(f"期末总资产: {result['final_value']:.2f} 元")
-print(f"总收益: {result['total_profit']:.2f} 元")
-print(f"收益率: {result['profit_rate']:.2f}%")
-print(f"年化收益率: {result['annualized_return']:.2f}%")
-
-print(f"\n单笔投资对比 (一次性买入 {result['total_invested']:.2f} 元):")
-one_time_shares = result['total_invested'] / df['close'].iloc[0]
-one_time_value = one_time_shares * df['close'].iloc[-1]
-one_time_profit = one_time_value - result['total_invested']
-one_time_profit_rate = (one_time_profit / result['total_invested']) * 100 if result['total_invested'] > 0 else 0
-print(f"一次性买入收益: {one_time_profit:.2f} 元 ({one_time_profit_rate:.2f}%)")
-
-fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(14, 10))
-
-ax1.plot(df.index, df['close'], label='收盘价', linewidth=1.5, color='blue')
-if len(result['investment_dates']) > 0:
-    dates = [x['date'] for x in result['investment_dates']]
-    prices = [x['price'] for x in result['investment_dates']]
-    ax1.scatter(dates, prices, color='red', s=50, zorder=5, label='定投日')
-ax1.set_title('青农商行(002958) 价格走势与定投点', fontsize=14, fontweight='bold')
-ax1.set_ylabel('价格 (元)', fontsize=12)
-ax1.legend(fontsize=10)
-ax1.grid(True, alpha=0.3)
-
-portfolio_values = []
-total_invested_list = []
-profit_list = []
-annualized_return_list = []
-current_shares = 0
-current_invested = 0
-invest_dict = {x['date']: x['shares'] for x in result['investment_dates']}
-date_to_profit = {}
-date_to_annualized_return = {}
-
-start_date = df.index[0]
+import numpy as np
+import pandas as pd
 
-for date in df.index:
-    if date in invest_dict:
-        current_shares += invest_dict[date]
-        current_invested += monthly_investment
-    value = current_shares * df.loc[date, 'close']
-    profit = value - current_invested
-    
-    # 计算年化收益率
-    days = (date - start_date).days
-    annualized_return = 0.0
-    if days > 0 and current_invested > 0:
-        years = days / 365.25
-        if value > 0:
-            annualized_return = ((value / current_invested) ** (1 / years) - 1) * 100
-    
-    portfolio_values.append(value)
-    total_invested_list.append(current_invested)
-    profit_list.append(profit)
-    annualized_return_list.append(annualized_return)
-    date_to_profit[date] = profit
-    date_to_annualized_return[date] = annualized_return
+from data_loader import load_price_data
+from profiling import finish_profile, profiler_from_args, stage
+from sip_backtest import backtest_sip_with_open
+from sip_engine import build_month_index, calendar_day_rows, rolling_start_analysis, sweep_sip_with_open
 
-ax2.plot(df.index, portfolio_values, label='资产市值', linewidth=2, color='green')
-ax2.plot(df.index, total_invested_list, label='累计投入', linewidth=2, color='orange', linestyle='--')
-ax2.set_title('定投资产净值变化', fontsize=14, fontweight='bold')
-ax2.set_xlabel('日期', fontsize=12)
-ax2.set_ylabel('金额 (元)', fontsize=12)
-ax2.legend(fontsize=10)
-ax2.grid(True, alpha=0.3)
 
-def format_coord(x, y):
+def run(args):
+    profiler = profiler_from_args(args)
     try:
-        # 将 Matplotlib 的内部数值转换为日期对象
-        date_obj = mdates.num2date(x)
-        date_str = date_obj.strftime('%Y-%m-%d')
-        
-        # 尝试寻找最接近的实际交易日数据
-        target_date = pd.Timestamp(date_obj).replace(tzinfo=None) # 去除时区以匹配索引
-        nearest_date = df.index.asof(target_date)
-        
-        if nearest_date is not pd.NaT:
-            price = df.loc[nearest_date, 'close']
-            profit = date_to_profit[nearest_date]
-            annualized_return = date_to_annualized_return[nearest_date]
-            profit_color = '+' if profit >= 0 else ''
-            annualized_color = '+' if annualized_return >= 0 else ''
-            return f'日期: {date_str} | 收盘价: {price:.2f}元 | 盈亏: {profit_color}{profit:.2f}元 | 年化: {annualized_color}{annualized_return:.2f}% | 当前y轴: {y:.2f}'
-        return f'日期: {date_str} | y: {y:.2f}'
-    except:
-        return f'x={x:.4f}, y={y:.2f}'
-
-# 重新绑定
-ax1.format_coord = format_coord
-ax2.format_coord = format_coord
-
-plt.tight_layout()
-plt.savefig('sip_backtest_result.png', dpi=300, bbox_inches='tight')
-print("\n回测图表已保存为: sip_backtest_result.png")
-print("\n提示: 在价格走势或资产净值图表上，鼠标悬停在坐标区域即可查看对应日期的收盘价")
-plt.show()
-
-print("\n" + "=" * 60)
-print("回测完成！")
-print("=" * 60)
+        _run(args, profiler)
+    finally:
+        finish_profile(profiler, args.profile_output)
+
+
+def _run(args, profiler):
+    # 画图模块(matplotlib)只在本命令执行时导入
+    import sip_plots
+
+    if args.headless:
+        sip_plots.use_headless_backend()
+    max_points = args.max_points if args.max_points is not None else (2000 if args.headless else 0)
+    sip_plots.setup_chinese_font()
+
+    print("=" * 60)
+    print("青农商行(002958)定投策略回测")
+    print("=" * 60)
+
+    with stage(profiler, 'load'):
+        df = load_price_data(args.csv)
+
+    print(f"\n数据时间范围: {df.index[0]} 至 {df.index[-1]}")
+    print(f"总交易日数: {len(df)}")
+    print(f"首日收盘价: {df['close'].iloc[0]:.2f}")
+    print(f"末日收盘价: {df['close'].iloc[-1]:.2f}")
+
+    if args.start_date:
+        start_date = pd.to_datetime(args.start_date)
+        # 过滤数据，只保留开始日期之后的数据
+        df = df[df.index >= start_date]
+        print(f"\n回测时间范围: {df.index[0]} 至 {df.index[-1]}")
+        print(f"回测交易日数: {len(df)}")
+    else:
+        print(f"\n使用默认时间范围: {df.index[0]} 至 {df.index[-1]}")
+
+    monthly_investment = args.monthly_investment
+    invest_day = args.invest_day
+    with stage(profiler, 'month_grouping'):
+        month_index = build_month_index(df.index)
+    price_field = args.price_field
+    price_label = '开盘价' if price_field == 'open' else f'{price_field} 价格'
+    price_fields = ('open', 'close', 'low', 'high')
+    if price_field not in price_fields:
+        # 分钟采样价(ingest-minutes 导入)缺失的日子用开盘价代替
+        df = df.assign(**{price_field: df[price_field].fillna(df['open'])})
+        price_fields += (price_field,)
+
+    if args.sweep:
+        amounts = [float(x) for x in args.amounts.split(',') if x.strip()]
+        with stage(profiler, 'sweep'):
+            sweep = sweep_sip_with_open(df, price_fields=price_fields, amounts=amounts, month_index=month_index)
+
+        print(f"\n{'=' * 60}")
+        print(f"参数扫描: {len(sweep['invest_days'])} 个定投日 × {len(sweep['price_fields'])} 个价格字段 × {len(sweep['amounts'])} 个金额")
+        print(f"{'=' * 60}")
+        for k, amount in enumerate(sweep['amounts']):
+            profit_rates = sweep['profit_rate'][:, :, k]
+            best_day_idx, best_field_idx = np.unravel_index(np.argmax(profit_rates), profit_rates.shape)
+            worst_day_idx, worst_field_idx = np.unravel_index(np.argmin(profit_rates), profit_rates.shape)
+            print(f"\n每月定投 {amount:.0f} 元:")
+            print(f"  最优: 每月{sweep['invest_days'][best_day_idx]}日 {sweep['price_fields'][best_field_idx]} "
+                  f"收益率 {profit_rates[best_day_idx, best_field_idx]:.2f}% "
+                  f"年化 {sweep['annualized_return'][best_day_idx, best_field_idx, k]:.2f}%")
+            print(f"  最差: 每月{sweep['invest_days'][worst_day_idx]}日 {sweep['price_fields'][worst_field_idx]} "
+                  f"收益率 {profit_rates[worst_day_idx, worst_field_idx]:.2f}% "
+                  f"年化 {sweep['annualized_return'][worst_day_idx, worst_field_idx, k]:.2f}%")
+
+        with stage(profiler, 'plotting'):
+            sip_plots.plot_sweep_heatmap(sweep, 'sip_sweep_heatmap.png')
+        print("\n参数扫描热力图已保存为: sip_sweep_heatmap.png")
+        if not args.headless:
+            sip_plots.show_figures()
+        return
+
+    if args.all_starts:
+        with stage(profiler, 'all_starts'):
+            invest_rows = calendar_day_rows(df, invest_day, month_index)
+            rolling = rolling_start_analysis(df, invest_rows, price_field=price_field, monthly_investment=monthly_investment,
+                                             month_index=month_index, windows=args.windows)
+
+        print(f"\n{'=' * 60}")
+        print(f"全部起始月份分析: 每月{invest_day}日(或下一个交易日)用{price_label}定投 {monthly_investment} 元，持有至 {df.index[-1].strftime('%Y-%m-%d')}")
+        print(f"{'=' * 60}")
+        profit_rates = rolling['profit_rate']
+        annualized_returns = rolling['annualized_return']
+        xirrs = rolling['xirr']
+        print(f"\n起始月份数: {len(profit_rates)}")
+        print(f"收益率为正的起始月份占比: {(profit_rates > 0).mean() * 100:.2f}%")
+        for q in [0, 10, 25, 50, 75, 90, 100]:
+            print(f"  收益率 {q:>3}% 分位: {np.percentile(profit_rates, q):>8.2f}%   年化 {np.percentile(annualized_returns, q):>8.2f}%"
+                  f"   XIRR {np.nanpercentile(xirrs, q):>8.2f}%")
+        best, worst = np.argmax(profit_rates), np.argmin(profit_rates)
+        print(f"最佳起始月份: {rolling['start_dates'][best].strftime('%Y-%m')} (收益率: {profit_rates[best]:.2f}%)")
+        print(f"最差起始月份: {rolling['start_dates'][worst].strftime('%Y-%m')} (收益率: {profit_rates[worst]:.2f}%)")
+
+        pd.DataFrame({
+            'start_date': rolling['start_dates'],
+            'total_invested': rolling['total_invested'],
+            'final_value': rolling['final_value'],
+            'total_profit': rolling['total_profit'],
+            'profit_rate': profit_rates,
+            'annualized_return': annualized_returns,
+            'xirr': xirrs
+        }).to_csv('sip_all_starts.csv', index=False, encoding='utf-8-sig')
+        print("\n全部起始月份结果已保存为: sip_all_starts.csv")
+
+        with stage(profiler, 'plotting'):
+            sip_plots.plot_all_starts(rolling, 'sip_all_starts.png')
+        print("全部起始月份分析图表已保存为: sip_all_starts.png")
+        if not args.headless:
+            sip_plots.show_figures()
+        return
+
+    result = backtest_sip_with_open(df, invest_day=invest_day, month_index=month_index,
+                                    monthly_investment=monthly_investment, profiler=profiler, price_field=price_field)
+
+    print(f"\n{'=' * 60}")
+    print(f"策略: 每月{invest_day}日(或下一个交易日)用{price_label}定投 {monthly_investment:g} 元")
+    print(f"{'=' * 60}")
+    print(f"\n定投次数: {result['investment_count']} 次")
+    print(f"总投入金额: {result['total_invested']:.2f} 元")
+    print(f"期末总资产: {result['final_value']:.2f} 元")
+    print(f"总收益: {result['total_profit']:.2f} 元")
+    print(f"收益率: {result['profit_rate']:.2f}%")
+    print(f"年化收益率: {result['annualized_return']:.2f}%")
+    print(f"资金加权年化收益率(XIRR): {result['xirr']:.2f}%")
+
+    print(f"\n单笔投资对比 (一次性买入 {result['total_invested']:.2f} 元):")
+    one_time_shares = result['total_invested'] / df['close'].iloc[0]
+    one_time_value = one_time_shares * df['close'].iloc[-1]
+    one_time_profit = one_time_value - result['total_invested']
+    one_time_profit_rate = (one_time_profit / result['total_invested']) * 100 if result['total_invested'] > 0 else 0
+    print(f"一次性买入收益: {one_time_profit:.2f} 元 ({one_time_profit_rate:.2f}%)")
+
+    with stage(profiler, 'plotting'):
+        sip_plots.plot_sip_result(df, result, 'sip_backtest_result.png', max_points=max_points, crosshair=args.crosshair)
+    print("\n回测图表已保存为: sip_backtest_result.png")
+    if not args.headless:
+        print("\n提示: 在价格走势或资产净值图表上，鼠标悬停在坐标区域即可查看对应日期的收盘价")
+        sip_plots.show_figures()
+
+    print("\n" + "=" * 60)
+    print("回测完成！")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    from cli import main
+    main(['backtest'] + sys.argv[1:])
@@ -0,0 +1,83 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from data_loader import load_price_data
+from result_cache import ResultCache
+from sip_backtest import EnhancedSIPBacktest
+from universe_backtest import find_symbol_files
+
+
+def init_worker():
+    # 每个 worker 在第一次导入 pyplot 之前切换到无界面的 Agg 后端
+    import matplotlib
+    matplotlib.use('Agg')
+    from sip_plots import setup_chinese_font
+    setup_chinese_font()
+
+
+_worker_caches = {}
+
+
+def worker_cache(cache_dir, cache_max_bytes):
+    # 每个 worker 复用同一个 ResultCache，目录只在第一次写入和超出容量时扫描
+    if cache_dir is None:
+        return None
+    key = (cache_dir, cache_max_bytes)
+    if key not in _worker_caches:
+        _worker_caches[key] = ResultCache(cache_dir, cache_max_bytes)
+    return _worker_caches[key]
+
+
+def render_symbol_report(task):
+    symbol, csv_path, output_dir, monthly_investment, max_points, dpi, cache_dir, cache_max_bytes = task
+    try:
+        data = load_price_data(csv_path)
+        cache = worker_cache(cache_dir, cache_max_bytes)
+        backtest = EnhancedSIPBacktest(data, monthly_investment=monthly_investment, cache=cache)
+        backtest.run_all_strategies(verbose=False)
+        output_file = os.path.join(output_dir, f"{symbol}_multi_strategy_comparison.png")
+        backtest.plot_comparison(output_file=output_file, title=symbol, show=False, max_points=max_points, dpi=dpi,
+                                 verbose=False)
+        return symbol, output_file, None
+    except Exception as e:
+        return symbol, None, f"{type(e).__name__}: {e}"
+
+
+def render_reports(symbol_files, output_dir, monthly_investment=1000, max_points=2000, dpi=300, workers=None,
+                   cache_dir=None, cache_max_bytes=512 * 1024 * 1024):
+    # cache_dir 不为 None 时各 worker 共用同一个结果缓存目录
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = [(symbol, path, output_dir, monthly_investment, max_points, dpi, cache_dir, cache_max_bytes)
+             for symbol, path in symbol_files]
+    rendered = {}
+    failures = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        for done, (symbol, output_file, error) in enumerate(pool.map(render_symbol_report, tasks), 1):
+            if error is None:
+                rendered[symbol] = output_file
+            else:
+                failures[symbol] = error
+            if done % 50 == 0 or done == len(tasks):
+                print(f"已生成 {done}/{len(tasks)}")
+    return rendered, failures
+
+
+def run(args):
+    symbol_files = find_symbol_files(args.data_dir, args.pattern)
+    print(f"共找到 {len(symbol_files)} 个股票数据文件，开始生成图表...")
+
+    started = time.time()
+    rendered, failures = render_reports(symbol_files, args.output_dir, args.monthly_investment,
+                                        args.max_points, args.dpi, args.workers,
+                                        cache_dir=None if args.no_cache else args.cache_dir,
+                                        cache_max_bytes=int(args.cache_max_mb * 1024 * 1024))
+    print(f"完成: 生成 {len(rendered)} 张图表，用时 {time.time() - started:.1f} 秒，保存在 {args.output_dir}")
+    if failures:
+        print(f"失败 {len(failures)} 个: " + ', '.join(f"{k} ({v})" for k, v in failures.items()))
+
+
+if __name__ == '__main__':
+    import sys
+    from cli import main
+    main(['report'] + sys.argv[1:])
@@ -0,0 +1,215 @@
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from data_loader import load_price_data, read_price_csv
+from sip_backtest import EnhancedSIPBacktest
+from sip_engine import build_equity_curves, build_month_index
+
+RESULT_VERSION = 1
+
+STRATEGY_METHODS = [
+    ("每月1日定投", 'strategy_monthly_day_1'),
+    ("每月15日定投", 'strategy_monthly_day_15'),
+    ("每月最后1日定投", 'strategy_monthly_last_day'),
+    ("每月最低点定投(理想)", 'strategy_monthly_lowest'),
+    ("每月最高点定投(最差)", 'strategy_monthly_highest'),
+]
+
+
+def synthetic_ohlcv(years=5, start_date='2019-01-02', seed=0, start_price=10.0, volatility=0.02, drift=0.0002,
+                    gap_prob=0.0, suspension_prob=0.0, suspension_days=(5, 30)):
+    # 生成与 load_price_data 结果同格式的日线数据(date 索引, open/close/high/low/amount)，相同参数总是得到相同数据
+    # gap_prob: 每个工作日被随机去掉(节假日)的概率；suspension_prob: 每个工作日开始一段连续停牌的概率
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(start=start_date, periods=max(int(round(years * 252)), 1))
+    n = len(dates)
+
+    log_returns = rng.normal(drift, volatility, n)
+    close = np.maximum(np.round(start_price * np.exp(np.cumsum(log_returns)), 2), 0.01)
+    prev_close = np.r_[start_price, close[:-1]]
+    open_ = np.maximum(np.round(prev_close * np.exp(rng.normal(0, volatility / 2, n)), 2), 0.01)
+    high = np.round(np.maximum(open_, close) * (1 + np.abs(rng.normal(0, volatility / 2, n))), 2)
+    low = np.maximum(np.round(np.minimum(open_, close) * (1 - np.abs(rng.normal(0, volatility / 2, n))), 2), 0.01)
+    amount = np.round(rng.lognormal(12, 1, n), 0)
+
+    keep = rng.random(n) >= gap_prob
+    for start in np.flatnonzero(rng.random(n) < suspension_prob):
+        keep[start:start + rng.integers(suspension_days[0], suspension_days[1] + 1)] = False
+    keep[0] = True
+
+    df = pd.DataFrame({'open': open_, 'close': close, 'high': high, 'low': low, 'amount': amount},
+                      index=pd.DatetimeIndex(dates, name='date'))
+    return df[keep]
+
+
+def synthetic_universe(symbols=10, seed=0, **kwargs):
+    # 每只股票使用不同的随机种子和起始价格
+    universe = {}
+    for i in range(symbols):
+        start_price = 2.0 + (seed * 7919 + i * 104729) % 4800 / 100
+        universe[f'sim{i:06d}'] = synthetic_ohlcv(seed=seed * 100003 + i, start_price=start_price, **kwargs)
+    return universe
+
+
+def write_synthetic_csv(df, output_file):
+    # 与 get_qrcb_data.py 保存的文件格式一致
+    df.reset_index().assign(date=df.index.strftime('%Y-%m-%d')).to_csv(output_file, index=False, encoding='utf-8-sig')
+
+
+def time_call(func, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return {'median': float(np.median(timings)), 'min': float(np.min(timings)), 'repeat': repeat}
+
+
+def benchmark_size(years, workdir, repeat=3, seed=0, gap_prob=0.01, suspension_prob=0.002, render=True, dpi=100,
+                   symbols=0, workers=None):
+    df = synthetic_ohlcv(years=years, seed=seed, gap_prob=gap_prob, suspension_prob=suspension_prob)
+    csv_path = os.path.join(workdir, f'sim_{years}y.csv')
+    write_synthetic_csv(df, csv_path)
+    timings = {}
+
+    timings['load_csv'] = time_call(lambda: read_price_csv(csv_path), repeat)
+    load_price_data(csv_path)
+    timings['load_cached'] = time_call(lambda: load_price_data(csv_path), repeat)
+
+    data = load_price_data(csv_path)
+    backtest = EnhancedSIPBacktest(data)
+
+    def month_grouping():
+        month_starts, month_ends = build_month_index(data.index)
+        for start, end in zip(month_starts, month_ends):
+            data.iloc[start:end]
+
+    timings['month_grouping'] = time_call(month_grouping, repeat)
+    for name, method in STRATEGY_METHODS:
+        timings[f'strategy:{method}'] = time_call(lambda: backtest.run_strategy(name, getattr(backtest, method)), repeat)
+    timings['strategies:fused'] = time_call(backtest.run_vectorized, repeat)
+
+    records = {name: result['investment_dates'] for name, result in backtest.results.items()}
+    timings['metrics'] = time_call(lambda: [backtest.compute_metrics(x) for x in records.values()], repeat)
+    timings['equity_curves'] = time_call(lambda: build_equity_curves(data.index, data['close'], backtest.results),
+                                         repeat)
+
+    if render:
+        from sip_plots import use_headless_backend
+        use_headless_backend()
+        output_file = os.path.join(workdir, f'sim_{years}y.png')
+        timings['render'] = time_call(lambda: backtest.plot_comparison(output_file=output_file, show=False, dpi=dpi,
+                                                                       verbose=False), repeat)
+
+    if symbols > 0:
+        from universe_backtest import run_universe
+        universe_dir = os.path.join(workdir, f'universe_{years}y')
+        os.makedirs(universe_dir, exist_ok=True)
+        symbol_files = []
+        for symbol, symbol_df in synthetic_universe(symbols, seed=seed, years=years, gap_prob=gap_prob,
+                                                    suspension_prob=suspension_prob).items():
+            path = os.path.join(universe_dir, f'{symbol}.csv')
+            write_synthetic_csv(symbol_df, path)
+            symbol_files.append((symbol, path))
+        timings['universe'] = time_call(lambda: run_universe(symbol_files, workers=workers), repeat)
+
+    return [{'years': years, 'rows': len(data), 'stage': stage, **timing} for stage, timing in timings.items()]
+
+
+def run_benchmarks(years_list=(1, 5, 20), repeat=3, seed=0, gap_prob=0.01, suspension_prob=0.002, render=True,
+                   dpi=100, symbols=0, workers=None):
+    workdir = tempfile.mkdtemp(prefix='sip_bench_')
+    try:
+        results = []
+        for years in years_list:
+            print(f"正在测试 {years} 年数据...")
+            results.extend(benchmark_size(years, workdir, repeat=repeat, seed=seed, gap_prob=gap_prob,
+                                          suspension_prob=suspension_prob, render=render, dpi=dpi,
+                                          symbols=symbols, workers=workers))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'version': RESULT_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count()
+        },
+        'config': {
+            'years': list(years_list),
+            'repeat': repeat,
+            'seed': seed,
+            'gap_prob': gap_prob,
+            'suspension_prob': suspension_prob,
+            'render': render,
+            'dpi': dpi,
+            'symbols': symbols
+        },
+        'results': results
+    }
+
+
+def compare_results(current, baseline, threshold=0.1):
+    # 按 (年数, 阶段) 对比中位数耗时，ratio > 1 + threshold 记为变慢
+    baseline_timings = {(x['years'], x['stage']): x['median'] for x in baseline['results']}
+    rows = []
+    for x in current['results']:
+        key = (x['years'], x['stage'])
+        if key not in baseline_timings:
+            continue
+        ratio = x['median'] / baseline_timings[key] if baseline_timings[key] > 0 else float('inf')
+        rows.append({'years': x['years'], 'stage': x['stage'], 'baseline': baseline_timings[key],
+                     'current': x['median'], 'ratio': ratio, 'regression': ratio > 1 + threshold})
+    return rows
+
+
+def print_results(results):
+    print(f"\n{'年数':<6} {'行数':<8} {'阶段':<36} {'中位数(ms)':<12} {'最小(ms)':<12}")
+    print("-" * 80)
+    for x in results['results']:
+        print(f"{x['years']:<6} {x['rows']:<8} {x['stage']:<36} {x['median'] * 1000:<12.2f} {x['min'] * 1000:<12.2f}")
+
+
+def run(args):
+    years_list = [int(x) for x in args.years.split(',') if x.strip()]
+    results = run_benchmarks(years_list, repeat=args.repeat, seed=args.seed, gap_prob=args.gap_prob,
+                             suspension_prob=args.suspension_prob, render=not args.no_render, dpi=args.dpi,
+                             symbols=args.symbols, workers=args.workers)
+    print_results(results)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\n测试结果已保存为: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows = compare_results(results, baseline, args.threshold)
+        print(f"\n与基线 {args.baseline} 对比 (变慢超过 {args.threshold * 100:.0f}% 标记为 !):")
+        for row in rows:
+            mark = '!' if row['regression'] else ' '
+            print(f"{mark} {row['years']:<6} {row['stage']:<36} {row['baseline'] * 1000:>10.2f} ms -> "
+                  f"{row['current'] * 1000:>10.2f} ms  x{row['ratio']:.2f}")
+        regressions = [x for x in rows if x['regression']]
+        if regressions:
+            print(f"\n共 {len(regressions)} 项变慢")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    import sys
+    from cli import main
+    sys.exit(main(['bench'] + sys.argv[1:]))
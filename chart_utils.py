@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+
+
+class HoverIndex:
+    # 鼠标悬停查询表：只在画图时构建一次，之后每次移动鼠标只做一次 searchsorted
+    def __init__(self, index, **series):
+        import matplotlib.dates as mdates
+
+        self.dates = pd.DatetimeIndex(index)
+        self.x = np.asarray(mdates.date2num(self.dates.to_numpy()), dtype=float)
+        self.series = {name: np.asarray(values, dtype=float) for name, values in series.items()}
+
+    def lookup(self, x):
+        # 与 df.index.asof 相同: 返回不晚于 x 的最近一个交易日的行号，没有则返回 None
+        if x is None or not np.isfinite(x) or len(self.x) == 0:
+            return None
+        pos = int(np.searchsorted(self.x, x, side='right')) - 1
+        return pos if pos >= 0 else None
+
+    def date_str(self, pos):
+        return np.datetime_as_string(self.dates.values[pos], unit='D')
+
+    def __getitem__(self, name):
+        return self.series[name]
+
+
+def make_format_coord(hover, formatter):
+    def format_coord(x, y):
+        pos = hover.lookup(x)
+        if pos is None:
+            return f'x={x:.4f}, y={y:.2f}'
+        return formatter(pos, y)
+    return format_coord
+
+
+class BlittedCrosshair:
+    # 可选的十字线 + 文本标注。十字线使用 animated 艺术家，移动鼠标时只恢复背景并重绘这几个对象
+    def __init__(self, fig, axes, hover, text_func):
+        self.fig = fig
+        self.axes = list(axes)
+        self.hover = hover
+        self.text_func = text_func
+        self.background = None
+
+        x0 = hover.x[0] if len(hover.x) else 0.0
+        self.lines = [ax.axvline(x0, color='gray', linewidth=0.8, linestyle='--', animated=True, visible=False)
+                      for ax in self.axes]
+        self.annotation = self.axes[0].annotate(
+            '', xy=(0.01, 0.97), xycoords='axes fraction', va='top', fontsize=9, animated=True, visible=False,
+            bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
+        self.artists = self.lines + [self.annotation]
+
+        canvas = fig.canvas
+        self.enabled = getattr(canvas, 'supports_blit', False)
+        if self.enabled:
+            canvas.mpl_connect('draw_event', self._on_draw)
+            canvas.mpl_connect('motion_notify_event', self._on_move)
+            canvas.mpl_connect('figure_leave_event', self._on_leave)
+
+    def _on_draw(self, event):
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        for artist in self.artists:
+            artist.axes.draw_artist(artist)
+
+    def _on_move(self, event):
+        if self.background is None:
+            return
+        pos = self.hover.lookup(event.xdata) if event.inaxes in self.axes else None
+        if pos is None:
+            self._set_visible(False)
+        else:
+            x = self.hover.x[pos]
+            for line in self.lines:
+                line.set_xdata([x, x])
+            self.annotation.set_text(self.text_func(pos))
+            self._set_visible(True)
+        self._blit()
+
+    def _on_leave(self, event):
+        if self.background is not None:
+            self._set_visible(False)
+            self._blit()
+
+    def _set_visible(self, visible):
+        for artist in self.artists:
+            artist.set_visible(visible)
+
+    def _blit(self):
+        canvas = self.fig.canvas
+        canvas.restore_region(self.background)
+        for artist in self.artists:
+            artist.axes.draw_artist(artist)
+        canvas.blit(self.fig.bbox)
+
+
+def lttb_indices(x, y, n_out):
+    # Largest-Triangle-Three-Buckets 降采样：保留首尾点，每个桶选与相邻桶构成三角形面积最大的点，尽量保持曲线形状
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out is None or n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x = x[edges[i + 1]:edges[i + 2]].mean()
+            next_y = y[edges[i + 1]:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        area = np.abs((x[a] - next_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def decimate_series(index, values, max_points=None):
+    # 返回降采样后的 (日期, 数值)；max_points 为空或数据点不多时原样返回
+    values = np.asarray(values, dtype=float)
+    if not max_points or len(values) <= max_points:
+        return index, values
+    x = pd.DatetimeIndex(index).asi8.astype(float)
+    positions = lttb_indices(x, values, max_points)
+    return index[positions], values[positions]
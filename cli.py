@@ -0,0 +1,199 @@
+import argparse
+import importlib
+import sys
+
+from paths import DATA_DIR, RAW_DATA_DIR
+
+# 子命令 -> 实现模块；模块只在执行对应命令时导入，matplotlib/mplfinance/akshare 不会被无关命令加载
+COMMANDS = {
+    'fetch': 'get_qrcb_data',
+    'backtest': 'backtest_strategy',
+    'compare': 'multi_strategy_backtest',
+    'kline': 'plot_kline',
+    'universe': 'universe_backtest',
+    'report': 'batch_report',
+    'bench': 'benchmark',
+    'live': 'sip_state',
+    'ingest-minutes': 'minute_ingest',
+    'montecarlo': 'monte_carlo',
+    'adjust': 'adjustment',
+    'panel': 'price_panel',
+    'walkforward': 'walk_forward',
+}
+
+def add_plot_arguments(parser):
+    parser.add_argument('--crosshair', action='store_true', help='在图表上显示跟随鼠标的十字线和数据标注')
+    parser.add_argument('--headless', action='store_true', help='无界面批量模式: 使用 Agg 后端，只保存图片不弹出窗口')
+    parser.add_argument('--max-points', type=int, default=None, help='曲线最多绘制的点数(LTTB降采样)，无界面模式默认 2000，0 表示不降采样')
+
+
+def add_profile_arguments(parser):
+    parser.add_argument('--profile', action='store_true', help='统计各阶段耗时、调用次数和峰值内存')
+    parser.add_argument('--profile-output', help='把阶段统计结果保存为JSON文件(隐含 --profile)')
+
+
+def add_cache_arguments(parser):
+    parser.add_argument('--cache-dir', default='.result_cache', help='回测结果和图表的磁盘缓存目录')
+    parser.add_argument('--cache-max-mb', type=float, default=512, help='缓存目录的最大容量(MB)，超出时删除最久未使用的条目')
+    parser.add_argument('--no-cache', action='store_true', help='不读取也不写入结果缓存')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cli.py', description='A股定投回测工具')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    p = subparsers.add_parser('fetch', help='获取A股历史数据')
+    p.add_argument('--symbols', help='批量模式: 股票代码列表，用逗号分隔，例如 sz002958,sh600000')
+    p.add_argument('--symbols-file', help='批量模式: 股票代码文件，每行一个代码')
+    p.add_argument('--output-dir', help=f'批量模式的输出目录，默认为 {DATA_DIR}，使用 --raw-store 时默认为 {RAW_DATA_DIR}')
+    p.add_argument('--manifest', help='批量模式的结果清单路径，默认为 <output-dir>/manifest.json')
+    p.add_argument('--workers', type=int, default=8, help='并发下载线程数')
+    p.add_argument('--rate-limit', type=float, default=5.0, help='每个主机每秒最多请求次数，0 表示不限速')
+    p.add_argument('--retries', type=int, default=3, help='每个代码最多尝试次数')
+    p.add_argument('--backoff', type=float, default=1.0, help='重试退避基数(秒)，每次失败后翻倍')
+    p.add_argument('--start-date', default='20190101')
+    p.add_argument('--end-date', default='20261231')
+    p.add_argument('--adjust', default='qfq', choices=['qfq', 'hfq', ''])
+    p.add_argument('--incremental', action='store_true', help='增量刷新: 只下载已有文件最后日期之后的新数据')
+    p.add_argument('--raw-store', action='store_true',
+                   help='保存不复权价格和复权因子(忽略 --adjust)，之后用 adjust 命令在本地生成 qfq/hfq 数据')
+    p.add_argument('--base-url', help='把行情请求改发到指定地址(例如本地测试服务器 http://127.0.0.1:8000)')
+
+    p = subparsers.add_parser('backtest', help='单策略定投回测(开盘价买入)')
+    p.add_argument('--csv', default='qrcb_historical_data.csv', help='历史数据CSV文件')
+    p.add_argument('--monthly-investment', type=float, default=1000)
+    p.add_argument('--invest-day', type=int, default=11, help='每月定投日(遇非交易日顺延)')
+    p.add_argument('--price-field', default='open', help='买入价格列，例如 open 或 ingest-minutes 导入的 at_1000')
+    p.add_argument('--sweep', action='store_true', help='批量扫描 定投日(1-31) × 价格字段 × 每月金额 的全部组合')
+    p.add_argument('--amounts', default='1000', help='扫描模式下的每月定投金额列表，用逗号分隔，例如 500,1000,2000')
+    p.add_argument('--start-date', help='回测开始日期 (格式: YYYY-MM-DD)，默认使用全部数据')
+    p.add_argument('--all-starts', action='store_true', help='计算每一个可能的起始月份定投到期末的结果分布')
+    p.add_argument('--windows', action='store_true', help='配合 --all-starts，额外计算每一个 (起始月, 结束月) 窗口')
+    add_plot_arguments(p)
+    add_profile_arguments(p)
+
+    p = subparsers.add_parser('compare', help='多策略定投对比')
+    p.add_argument('--csv', default='qrcb_historical_data.csv', help='历史数据CSV文件')
+    p.add_argument('--monthly-investment', type=float, default=1000)
+    p.add_argument('--engine', default='class', choices=['class', 'simple'],
+                   help='class: EnhancedSIPBacktest 五种策略; simple: 按每月固定日期的简单回测')
+    p.add_argument('--smart', action='store_true', help='额外运行价值平均、均线加倍、均线上轨暂停三种智能定投(仅 class 引擎)')
+    add_plot_arguments(p)
+    add_profile_arguments(p)
+    add_cache_arguments(p)
+
+    p = subparsers.add_parser('kline', help='绘制最近一段时间的K线图')
+    p.add_argument('--csv', default='qrcb_historical_data.csv', help='历史数据CSV文件')
+    p.add_argument('--days', type=int, default=100, help='未指定日期范围时绘制最近多少个交易日，0 表示全部历史')
+    p.add_argument('--start-date', help='开始日期 (格式: YYYY-MM-DD)')
+    p.add_argument('--end-date', help='结束日期 (格式: YYYY-MM-DD)')
+    p.add_argument('--resolution', default='auto', choices=['auto', 'D', 'W', 'M', 'Q'],
+                   help='K线周期: D 日线, W 周线, M 月线, Q 季线; auto 按日期范围自动选择')
+    p.add_argument('--max-candles', type=int, default=250, help='自动选择周期时最多绘制的K线根数')
+    p.add_argument('--output', default='qrcb_kline.png')
+    p.add_argument('--headless', action='store_true', help='只保存图片不弹出窗口')
+
+    p = subparsers.add_parser('universe', help='全市场多策略定投回测排名')
+    p.add_argument('--data-dir', default='data', help='每个股票一个CSV文件的目录')
+    p.add_argument('--pattern', default='*.csv')
+    p.add_argument('--monthly-investment', type=float, default=1000)
+    p.add_argument('--workers', type=int, default=None, help='进程数，默认使用全部CPU核心')
+    p.add_argument('--sort-by', default='profit_rate',
+                   help='排序字段: total_invested, final_value, total_profit, profit_rate, annualized_return, xirr, investment_count')
+    p.add_argument('--smart', action='store_true', help='额外运行三种智能定投策略')
+    p.add_argument('--panel', help='从 panel 命令生成的面板目录读取全部股票，代替 --data-dir 下的CSV文件')
+    p.add_argument('--top', type=int, default=20, help='打印排名前N的结果')
+    p.add_argument('--output', default='universe_ranking.csv')
+
+    p = subparsers.add_parser('report', help='无界面批量生成多策略对比图表')
+    p.add_argument('--data-dir', default='data', help='每个股票一个CSV文件的目录')
+    p.add_argument('--pattern', default='*.csv')
+    p.add_argument('--output-dir', default='reports')
+    p.add_argument('--monthly-investment', type=float, default=1000)
+    p.add_argument('--max-points', type=int, default=2000, help='每条曲线最多绘制的点数(LTTB降采样)，0 表示不降采样')
+    p.add_argument('--dpi', type=int, default=300)
+    p.add_argument('--workers', type=int, default=None, help='进程数，默认使用全部CPU核心')
+    add_cache_arguments(p)
+
+    p = subparsers.add_parser('live', help='逐日增量更新保存的定投状态，不重新回测全部历史')
+    p.add_argument('--data-dir', default='data', help='每个股票一个CSV文件的目录')
+    p.add_argument('--pattern', default='*.csv')
+    p.add_argument('--state-dir', default='sip_state', help='每个股票一个状态JSON文件的目录')
+    p.add_argument('--monthly-investment', type=float, default=1000, help='首次建立状态时使用的每月定投金额')
+    p.add_argument('--tail-rows', type=int, default=30, help='已有状态时只读取CSV末尾的行数')
+    p.add_argument('--output', default='sip_state_summary.csv')
+
+    p = subparsers.add_parser('ingest-minutes', help='分块读取分钟数据，聚合为日线并写入盘中采样价')
+    p.add_argument('minute_files', nargs='+', help='分钟数据CSV文件，按时间先后排列')
+    p.add_argument('--csv', default='qrcb_historical_data.csv', help='写入的日线数据CSV文件')
+    p.add_argument('--sample-times', default='10:00,14:30', help='盘中采样时刻列表，用逗号分隔')
+    p.add_argument('--chunksize', type=int, default=200000, help='每次读取的分钟数据行数')
+
+    p = subparsers.add_parser('panel', help='把目录下的全部股票数据合并为紧凑的多股票面板')
+    p.add_argument('--data-dir', default='data', help='每个股票一个CSV文件的目录')
+    p.add_argument('--pattern', default='*.csv')
+    p.add_argument('--output', default='panel', help='面板保存目录')
+    p.add_argument('--price-dtype', default='ticks', choices=['ticks', 'float32'],
+                   help='ticks: 价格存为 int32 的分(0.01元); float32: 存为单精度浮点数(复权价有更多小数位时使用)')
+
+    p = subparsers.add_parser('adjust', help='由原始价格和复权因子在本地生成前复权/后复权/不复权数据')
+    p.add_argument('--raw-dir', default=RAW_DATA_DIR, help='fetch --raw-store 保存的原始价格目录')
+    p.add_argument('--output-dir', default=DATA_DIR, help='生成的数据目录，格式与 fetch 下载的文件相同')
+    p.add_argument('--adjust', default='qfq', choices=['qfq', 'hfq', 'raw'])
+    p.add_argument('--pattern', default='*.csv')
+
+    p = subparsers.add_parser('walkforward', help='滚动前推检验: 在训练窗口给策略排名，在随后的测试窗口检验')
+    p.add_argument('--csv', default='qrcb_historical_data.csv', help='单只股票模式的历史数据CSV文件')
+    p.add_argument('--data-dir', help='全市场模式: 每个股票一个CSV文件的目录')
+    p.add_argument('--pattern', default='*.csv')
+    p.add_argument('--panel', help='全市场模式: panel 命令生成的面板目录')
+    p.add_argument('--monthly-investment', type=float, default=1000)
+    p.add_argument('--train-months', type=int, default=24, help='训练窗口的月数')
+    p.add_argument('--test-months', type=int, default=12, help='测试窗口的月数')
+    p.add_argument('--step-months', type=int, default=None, help='窗口每次前移的月数，默认等于测试窗口月数')
+    p.add_argument('--metric', default='profit_rate', choices=['profit_rate', 'annualized_return', 'xirr'],
+                   help='排名使用的指标')
+    p.add_argument('--smart', action='store_true', help='额外运行三种智能定投策略')
+    p.add_argument('--exclude', default='每月最低点定投(理想),每月最高点定投(最差)',
+                   help='不参与排名的策略名称，用逗号分隔；默认排除只有事后才知道的月内最低/最高点策略')
+    p.add_argument('--workers', type=int, default=None, help='进程数，默认使用全部CPU核心')
+    p.add_argument('--output', default='walk_forward.csv')
+
+    p = subparsers.add_parser('montecarlo', help='块自助法模拟大量价格路径，统计各定投策略结果的分位数')
+    p.add_argument('--csv', default='qrcb_historical_data.csv')
+    p.add_argument('--monthly-investment', type=float, default=1000)
+    p.add_argument('--paths', type=int, default=10000, help='模拟的价格路径数')
+    p.add_argument('--block-size', type=int, default=20, help='每个抽样块包含的连续交易日数')
+    p.add_argument('--batch-size', type=int, default=500, help='每批同时计算的路径数')
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--workers', type=int, default=None, help='进程数，默认使用全部CPU核心')
+    p.add_argument('--output', default='montecarlo_summary.csv')
+
+    p = subparsers.add_parser('bench', help='用合成行情数据测试各阶段耗时')
+    p.add_argument('--years', default='1,5,20', help='测试的数据年数列表，用逗号分隔')
+    p.add_argument('--repeat', type=int, default=3, help='每个阶段重复次数，取中位数')
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--gap-prob', type=float, default=0.01, help='每个工作日随机缺失(节假日)的概率')
+    p.add_argument('--suspension-prob', type=float, default=0.002, help='每个工作日开始一段连续停牌的概率')
+    p.add_argument('--symbols', type=int, default=0, help='大于0时额外测试该数量股票的全市场回测')
+    p.add_argument('--workers', type=int, default=None, help='全市场回测的进程数')
+    p.add_argument('--no-render', action='store_true', help='跳过图表绘制阶段')
+    p.add_argument('--dpi', type=int, default=100)
+    p.add_argument('--output', default='benchmark_results.json')
+    p.add_argument('--baseline', help='基线结果JSON文件，对比后有变慢项时返回非零退出码')
+    p.add_argument('--threshold', type=float, default=0.1, help='相对基线变慢超过该比例视为退化')
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    module_name = COMMANDS[args.command]
+    if args.command == 'compare' and args.engine == 'simple':
+        module_name = 'simple_sip_backtest'
+    module = importlib.import_module(module_name)
+    return module.run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,140 @@
+import io
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+CACHE_VERSION = 1
+
+
+def default_cache_dir(csv_path):
+    csv_path = os.path.abspath(csv_path)
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(os.path.dirname(csv_path), '.price_cache', name)
+
+
+def read_price_csv(csv_path):
+    df = pd.read_csv(csv_path)
+    df['date'] = pd.to_datetime(df['date'])
+    df.set_index('date', inplace=True)
+    return df
+
+
+def write_csv_atomic(df, output_file):
+    tmp_file = output_file + '.tmp'
+    df.to_csv(tmp_file, index=False, encoding="utf-8-sig")
+    os.replace(tmp_file, output_file)
+
+
+def read_csv_tail(path, n_rows):
+    # 只读取文件末尾若干行(加上表头)，避免为了拿最后日期而解析整份历史
+    with open(path, 'rb') as f:
+        header = f.readline()
+        header_end = f.tell()
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        block = b''
+        while pos > header_end and block.count(b'\n') <= n_rows:
+            step = min(65536, pos - header_end)
+            pos -= step
+            f.seek(pos)
+            block = f.read(step) + block
+    lines = block.splitlines()
+    if pos > header_end:
+        lines = lines[1:]
+    lines = [x for x in lines if x.strip()][-n_rows:]
+    return pd.read_csv(io.BytesIO(header + b'\n'.join(lines)), encoding='utf-8-sig')
+
+
+def _source_signature(csv_path):
+    stat = os.stat(csv_path)
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+
+def _read_cache(cache_dir, signature):
+    meta_path = os.path.join(cache_dir, 'meta.json')
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('version') != CACHE_VERSION or meta.get('source') != signature:
+        return None
+
+    # 每列一个带类型的 .npy 文件，读取时无需再解析文本和日期
+    index = pd.DatetimeIndex(np.load(os.path.join(cache_dir, 'date.npy')), name='date')
+    columns = {}
+    for i, column in enumerate(meta['columns']):
+        columns[column] = np.load(os.path.join(cache_dir, f'col_{i}.npy'))
+    return pd.DataFrame(columns, index=index)
+
+
+def _write_cache(df, cache_dir, signature):
+    # 先写到临时目录再整体替换，避免其他进程读到写了一半的缓存
+    tmp_dir = f'{cache_dir}.tmp{os.getpid()}'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    np.save(os.path.join(tmp_dir, 'date.npy'), df.index.to_numpy())
+    for i, column in enumerate(df.columns):
+        values = df[column].to_numpy()
+        if values.dtype == object or not np.issubdtype(values.dtype, np.number):
+            values = values.astype(str)
+        np.save(os.path.join(tmp_dir, f'col_{i}.npy'), values)
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'version': CACHE_VERSION, 'source': signature, 'columns': list(df.columns)},
+                  f, ensure_ascii=False)
+
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.makedirs(os.path.dirname(cache_dir), exist_ok=True)
+    try:
+        os.replace(tmp_dir, cache_dir)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def load_price_data(csv_path='qrcb_historical_data.csv', cache_dir=None, use_cache=True):
+    # 与 read_csv + to_datetime + set_index 返回相同的 DataFrame；CSV 有变化(修改时间或大小不同)时自动重建列式缓存
+    if not use_cache:
+        return read_price_csv(csv_path)
+
+    if cache_dir is None:
+        cache_dir = default_cache_dir(csv_path)
+    signature = _source_signature(csv_path)
+
+    try:
+        df = _read_cache(cache_dir, signature)
+    except (OSError, ValueError, KeyError):
+        df = None
+    if df is not None:
+        return df
+
+    df = read_price_csv(csv_path)
+    try:
+        _write_cache(df, cache_dir, signature)
+    except OSError as e:
+        print(f"写入缓存失败，直接使用CSV数据: {e}")
+    return df
+
+
+def load_derived_frame(csv_path, name, build, cache_dir=None):
+    # 由日线数据派生的表(例如周/月K线)，与日线共用源文件签名，CSV 变化后自动重建；build 接收日线 DataFrame
+    if cache_dir is None:
+        cache_dir = default_cache_dir(csv_path)
+    derived_dir = f'{cache_dir}.{name}'
+    signature = _source_signature(csv_path)
+
+    try:
+        df = _read_cache(derived_dir, signature)
+    except (OSError, ValueError, KeyError):
+        df = None
+    if df is not None:
+        return df
+
+    df = build(load_price_data(csv_path, cache_dir))
+    try:
+        _write_cache(df, derived_dir, signature)
+    except OSError as e:
+        print(f"写入缓存失败: {e}")
+    return df
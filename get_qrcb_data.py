@@ -1,38 +1,298 @@
-import akshare as ak
 import pandas as pd
+import json
 import os
+import shutil
+import threading
+import time
 import requests
 import urllib3
 import ssl
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit, urlunsplit
+from requests.adapters import HTTPAdapter
 
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-ssl._create_default_https_context = ssl._create_unverified_context
-os.environ['CURL_CA_BUNDLE'] = ''
-os.environ['REQUESTS_CA_BUNDLE'] = ''
-os.environ['SSL_CERT_FILE'] = ''
+from adjustment import factors_path, fetch_factors, refresh_factors
+from data_loader import read_csv_tail, write_csv_atomic
+from paths import DATA_DIR, RAW_DATA_DIR
 
 original_get = requests.get
 
-def patched_get(*args, **kwargs):
+
+class HostRateLimiter:
+    # 按主机限速：同一主机相邻两次请求至少间隔 min_interval 秒，多线程共享
+    def __init__(self, min_interval=0.0):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_time = {}
+
+    def wait(self, host):
+        if self.min_interval <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            ready = max(now, self._next_time.get(host, now))
+            self._next_time[host] = ready + self.min_interval
+        if ready > now:
+            time.sleep(ready - now)
+
+
+http_session = None
+rate_limiter = HostRateLimiter()
+base_url_override = None
+
+
+# 这些状态码视为暂时失败，由 download_symbols 按 --retries/--backoff 重试整只股票
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+def configure_http(pool_size=10, requests_per_second=0.0, base_url=None):
+    # 所有线程共享一个带连接池的 Session；Session 本身不重试，重试只在 download_symbols 中进行，每次请求都经过限速
+    global http_session, rate_limiter, base_url_override
+
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    session = requests.Session()
+    session.verify = False
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    http_session = session
+    rate_limiter = HostRateLimiter(1.0 / requests_per_second if requests_per_second > 0 else 0.0)
+    base_url_override = base_url.rstrip('/') if base_url else None
+
+
+def patched_get(url, params=None, **kwargs):
     kwargs['verify'] = False
-    return original_get(*args, **kwargs)
-
-requests.get = patched_get
-
-stock_code = "sz002958"
-
-print("正在获取青农商行(sz002958)的历史数据...")
-
-try:
-    df = ak.stock_zh_a_hist_tx(symbol=stock_code, start_date="20190101", end_date="20261231", adjust="qfq")
-    print(f"数据获取成功！共 {len(df)} 条记录")
-    print("\n最后10条数据:")
-    print(df.tail(10))
-    
-    output_file = "qrcb_historical_data.csv"
-    df.to_csv(output_file, index=False, encoding="utf-8-sig")
-    print(f"\n数据已保存到: {output_file}")
-except Exception as e:
-    print(f"获取数据时出错: {e}")
-    import traceback
-    traceback.print_exc()
+    # 测试时可把请求改发到本地替身服务器，只替换协议和主机，保留路径与参数
+    if base_url_override:
+        base = urlsplit(base_url_override)
+        parts = urlsplit(url)
+        url = urlunsplit((base.scheme, base.netloc, parts.path, parts.query, parts.fragment))
+    rate_limiter.wait(urlsplit(url).netloc)
+    if http_session is None:
+        return original_get(url, params=params, **kwargs)
+    response = http_session.get(url, params=params, **kwargs)
+    if response.status_code in RETRY_STATUS:
+        # akshare 不检查状态码，错误页会被当作数据解析；这里直接抛出，交给外层重试
+        response.raise_for_status()
+    return response
+
+
+def install_http_patch():
+    # 关闭证书校验并接管 requests.get；只在真正下载时调用，导入本模块不产生副作用
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    ssl._create_default_https_context = ssl._create_unverified_context
+    os.environ['CURL_CA_BUNDLE'] = ''
+    os.environ['REQUESTS_CA_BUNDLE'] = ''
+    os.environ['SSL_CERT_FILE'] = ''
+    requests.get = patched_get
+
+
+def fetch_symbol(symbol, start_date="20190101", end_date="20261231", adjust="qfq"):
+    import akshare as ak
+    return ak.stock_zh_a_hist_tx(symbol=symbol, start_date=start_date, end_date=end_date, adjust=adjust)
+
+
+def append_csv_atomic(df, output_file, columns):
+    # 复制原文件字节后追加新行，再原子替换；任何一步失败原文件都保持不变
+    tmp_file = output_file + '.tmp'
+    shutil.copyfile(output_file, tmp_file)
+    with open(tmp_file, 'rb+') as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b'\n'
+        else:
+            needs_newline = False
+        f.seek(0, os.SEEK_END)
+        if needs_newline:
+            f.write(b'\n')
+        f.write(df[columns].to_csv(index=False, header=False).encode('utf-8'))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, output_file)
+
+
+def refresh_symbol(symbol, output_file, start_date="20190101", end_date="20261231", adjust="qfq",
+                   overlap_rows=5, fetch=fetch_symbol, tolerance=1e-4):
+    # 增量刷新: 只抓取最后已存日期之后的数据；重叠窗口内价格对不上(前复权被重新调整)时整体重建
+    if not os.path.exists(output_file) or os.path.getsize(output_file) == 0:
+        df = fetch(symbol, start_date, end_date, adjust)
+        if df is None or len(df) == 0:
+            raise ValueError("返回数据为空")
+        write_csv_atomic(df, output_file)
+        return {'mode': 'full', 'rows': len(df), 'new_rows': len(df)}
+
+    stored = read_csv_tail(output_file, overlap_rows)
+    stored['date'] = pd.to_datetime(stored['date'])
+    last_date = stored['date'].max()
+    columns = list(stored.columns)
+
+    fresh = fetch(symbol, stored['date'].min().strftime('%Y%m%d'), end_date, adjust)
+    if fresh is None or len(fresh) == 0:
+        raise ValueError("返回数据为空")
+    fresh = fresh.copy()
+    fresh['date'] = pd.to_datetime(fresh['date'])
+
+    price_columns = [x for x in ['open', 'close', 'high', 'low'] if x in columns]
+    overlap = stored.merge(fresh, on='date', how='left', suffixes=('', '_new'))
+    consistent = set(columns) <= set(fresh.columns)
+    for column in price_columns:
+        if not consistent:
+            break
+        new_values = overlap[f'{column}_new']
+        consistent = new_values.notna().all() and ((overlap[column] - new_values).abs() <= tolerance).all()
+
+    if not consistent:
+        print(f"{symbol}: 重叠区间价格不一致(可能发生了复权调整)，重新下载全部历史")
+        df = fetch(symbol, start_date, end_date, adjust)
+        if df is None or len(df) == 0:
+            raise ValueError("返回数据为空")
+        write_csv_atomic(df, output_file)
+        return {'mode': 'rebuild', 'rows': len(df), 'new_rows': len(df)}
+
+    new_rows = fresh[fresh['date'] > last_date].sort_values('date')
+    if len(new_rows) == 0:
+        return {'mode': 'up-to-date', 'rows': None, 'new_rows': 0}
+
+    new_rows = new_rows.assign(date=new_rows['date'].dt.strftime('%Y-%m-%d'))
+    append_csv_atomic(new_rows, output_file, columns)
+    return {'mode': 'append', 'rows': None, 'new_rows': len(new_rows)}
+
+
+def read_symbols(symbols=None, symbols_file=None):
+    result = []
+    if symbols:
+        result.extend(x.strip() for x in symbols.split(',') if x.strip())
+    if symbols_file:
+        with open(symbols_file, encoding='utf-8') as f:
+            for line in f:
+                line = line.split('#', 1)[0].strip()
+                if line:
+                    result.append(line)
+    # 去重但保持原有顺序
+    return list(dict.fromkeys(result))
+
+
+def download_symbols(symbols, output_dir, workers=8, start_date="20190101", end_date="20261231",
+                     adjust="qfq", retries=3, backoff=1.0, fetch=fetch_symbol, manifest_path=None,
+                     incremental=False, raw_store=False, fetch_factors=fetch_factors):
+    # raw_store: 保存不复权价格并刷新复权因子，前/后复权数据由 adjustment.build_views 在本地生成
+    if raw_store:
+        adjust = ''
+    os.makedirs(output_dir, exist_ok=True)
+    if manifest_path is None:
+        manifest_path = os.path.join(output_dir, 'manifest.json')
+
+    def download_one(symbol):
+        started = time.time()
+        error = None
+        for attempt in range(1, retries + 1):
+            try:
+                output_file = os.path.join(output_dir, f"{symbol}.csv")
+                if incremental:
+                    refreshed = refresh_symbol(symbol, output_file, start_date, end_date, adjust, fetch=fetch)
+                    mode, rows = refreshed['mode'], refreshed['new_rows']
+                else:
+                    df = fetch(symbol, start_date, end_date, adjust)
+                    if df is None or len(df) == 0:
+                        raise ValueError("返回数据为空")
+                    write_csv_atomic(df, output_file)
+                    mode, rows = 'full', len(df)
+                factors = None
+                if raw_store:
+                    factors = refresh_factors(symbol, factors_path(output_dir, symbol), fetch=fetch_factors)
+                return {
+                    'symbol': symbol,
+                    'status': 'ok',
+                    'mode': mode,
+                    'rows': rows,
+                    'factors': factors,
+                    'path': output_file,
+                    'attempts': attempt,
+                    'elapsed': round(time.time() - started, 3),
+                    'error': None
+                }
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                if attempt < retries:
+                    time.sleep(backoff * 2 ** (attempt - 1))
+        return {
+            'symbol': symbol,
+            'status': 'failed',
+            'mode': None,
+            'rows': 0,
+            'factors': None,
+            'path': None,
+            'attempts': retries,
+            'elapsed': round(time.time() - started, 3),
+            'error': error
+        }
+
+    manifest = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(download_one, symbol): symbol for symbol in symbols}
+        for done, future in enumerate(as_completed(futures), 1):
+            entry = future.result()
+            manifest[entry['symbol']] = entry
+            status = f"{entry['mode']} {entry['rows']} 条" if entry['status'] == 'ok' else f"失败 ({entry['error']})"
+            print(f"[{done}/{len(symbols)}] {entry['symbol']}: {status}")
+
+    manifest = [manifest[symbol] for symbol in symbols]
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def run(args):
+    symbols = read_symbols(args.symbols, args.symbols_file)
+    if args.raw_store and not symbols:
+        symbols = ["sz002958"]
+    install_http_patch()
+    configure_http(pool_size=max(args.workers, 1), requests_per_second=args.rate_limit, base_url=args.base_url)
+
+    if symbols:
+        # 原始价格默认写入 adjust 命令读取的目录，不与生成的复权数据混在一起
+        output_dir = args.output_dir or (RAW_DATA_DIR if args.raw_store else DATA_DIR)
+        print(f"正在批量获取 {len(symbols)} 只股票的历史数据 (线程数: {args.workers})...")
+        manifest = download_symbols(symbols, output_dir, workers=args.workers,
+                                    start_date=args.start_date, end_date=args.end_date, adjust=args.adjust,
+                                    retries=args.retries, backoff=args.backoff, manifest_path=args.manifest,
+                                    incremental=args.incremental, raw_store=args.raw_store)
+        failed = [x['symbol'] for x in manifest if x['status'] != 'ok']
+        print(f"\n完成: 成功 {len(manifest) - len(failed)} 只, 失败 {len(failed)} 只")
+        if failed:
+            print(f"失败代码: {', '.join(failed)}")
+        if args.raw_store:
+            raw_dir = '' if output_dir == RAW_DATA_DIR else f' --raw-dir {output_dir}'
+            print(f"生成前复权数据: cli.py adjust{raw_dir} --adjust qfq")
+        return
+
+    stock_code = "sz002958"
+
+    print("正在获取青农商行(sz002958)的历史数据...")
+
+    try:
+        output_file = "qrcb_historical_data.csv"
+        if args.incremental:
+            refreshed = refresh_symbol(stock_code, output_file, args.start_date, args.end_date, args.adjust)
+            print(f"增量刷新完成 ({refreshed['mode']})，新增 {refreshed['new_rows']} 条记录")
+            print(f"\n数据已保存到: {output_file}")
+            return
+
+        df = fetch_symbol(stock_code, args.start_date, args.end_date, args.adjust)
+        print(f"数据获取成功！共 {len(df)} 条记录")
+        print("\n最后10条数据:")
+        print(df.tail(10))
+
+        df.to_csv(output_file, index=False, encoding="utf-8-sig")
+        print(f"\n数据已保存到: {output_file}")
+    except Exception as e:
+        print(f"获取数据时出错: {e}")
+        import traceback
+        traceback.print_exc()
+
+
+if __name__ == '__main__':
+    import sys
+    from cli import main
+    main(['fetch'] + sys.argv[1:])
@@ -0,0 +1,144 @@
+import os
+
+import pandas as pd
+
+from data_loader import read_price_csv, write_csv_atomic
+
+# 分钟数据列名统一为英文，兼容 akshare 分钟接口的中文列名；时间列单独处理，见 minute_datetimes
+MINUTE_COLUMNS = {
+    '开盘': 'open',
+    '收盘': 'close',
+    '最高': 'high',
+    '最低': 'low',
+    '成交量': 'volume',
+    '成交额': 'amount',
+}
+
+# 日期和时刻分两列保存的格式，按顺序匹配第一组同时存在的列
+SPLIT_DATETIME_COLUMNS = [('date', 'time'), ('day', 'time'), ('日期', '时间')]
+# 单列完整时间的列名，按顺序取第一个存在的列
+DATETIME_COLUMNS = ['datetime', '时间', 'time', 'date', 'day']
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+SUM_COLUMNS = ['volume', 'amount']
+
+
+def sample_column(sample_time):
+    # '10:00' -> 'at_1000'，回测时用 --price-field at_1000 选用该时刻的价格
+    return 'at_' + sample_time.replace(':', '')
+
+
+def minute_datetimes(chunk):
+    for date_column, time_column in SPLIT_DATETIME_COLUMNS:
+        if date_column in chunk.columns and time_column in chunk.columns:
+            return pd.to_datetime(chunk[date_column].astype(str) + ' ' + chunk[time_column].astype(str))
+    for column in DATETIME_COLUMNS:
+        if column in chunk.columns:
+            return pd.to_datetime(chunk[column])
+    raise ValueError(f"分钟数据缺少时间列，需要以下之一: {', '.join(DATETIME_COLUMNS)}")
+
+
+def iter_minute_chunks(paths, chunksize=200000):
+    # 逐个文件、每次 chunksize 行读取分钟数据，内存中最多只有一块原始数据
+    for path in paths:
+        for chunk in pd.read_csv(path, chunksize=chunksize):
+            datetimes = minute_datetimes(chunk)
+            chunk = chunk.rename(columns=MINUTE_COLUMNS)
+            columns = PRICE_COLUMNS + [x for x in SUM_COLUMNS if x in chunk.columns]
+            chunk = chunk[columns].copy()
+            chunk.insert(0, 'datetime', datetimes)
+            if not chunk['datetime'].is_monotonic_increasing:
+                chunk = chunk.sort_values('datetime', kind='stable')
+            yield chunk
+
+
+def aggregate_minutes(chunk, sample_times=()):
+    # 把若干个完整交易日的分钟数据聚合成日线；采样价为该时刻及之前最后一根分钟K线的收盘价，之前没有成交则为 NaN
+    day = chunk['datetime'].dt.normalize()
+    grouped = chunk.groupby(day, sort=True)
+    aggregations = {'open': ('open', 'first'), 'high': ('high', 'max'), 'low': ('low', 'min'),
+                    'close': ('close', 'last')}
+    aggregations.update({x: (x, 'sum') for x in SUM_COLUMNS if x in chunk.columns})
+    daily = grouped.agg(**aggregations)
+
+    minute_of_day = chunk['datetime'].dt.hour * 60 + chunk['datetime'].dt.minute
+    for sample_time in sample_times:
+        hour, minute = (int(x) for x in sample_time.split(':'))
+        before = (minute_of_day <= hour * 60 + minute).to_numpy()
+        daily[sample_column(sample_time)] = chunk['close'][before].groupby(day[before]).last().reindex(daily.index)
+    daily.index.name = 'date'
+    return daily
+
+
+def ingest_minute_bars(paths, sample_times=('10:00', '14:30'), chunksize=200000):
+    # 文件需按时间先后排列；每块数据末尾可能是不完整的一天，留到与下一块合并后再聚合
+    pieces = []
+    carry = None
+    for chunk in iter_minute_chunks(paths, chunksize):
+        if carry is not None and len(carry) > 0:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        if len(chunk) == 0:
+            continue
+        last_day = chunk['datetime'].iloc[-1].normalize()
+        complete = (chunk['datetime'] < last_day).to_numpy()
+        if complete.any():
+            pieces.append(aggregate_minutes(chunk[complete], sample_times))
+        carry = chunk[~complete]
+    if carry is not None and len(carry) > 0:
+        pieces.append(aggregate_minutes(carry, sample_times))
+
+    if not pieces:
+        return pd.DataFrame(columns=PRICE_COLUMNS + [sample_column(x) for x in sample_times])
+    daily = pd.concat(pieces)
+    return daily[~daily.index.duplicated(keep='last')]
+
+
+def write_daily_store(daily, csv_path, sample_times=('10:00', '14:30')):
+    # 日线文件不存在时直接写入聚合出的日线；已存在时按日期写入采样价列，并补入日线文件中没有的交易日，已有日期的其余列保持不变
+    # 已有日线为复权价而分钟数据为原始价格，按当天 日线收盘价 / 分钟收盘价 把采样价换算到日线的价格口径；
+    # 补入的交易日没有日线价格可比，沿用最近一个重叠交易日的比值(之前没有重叠日时用之后最近的)，成交量和成交额不换算
+    sample_columns = [sample_column(x) for x in sample_times]
+    if not os.path.exists(csv_path):
+        store = daily
+        matched = 0
+        added = len(daily)
+    else:
+        store = read_price_csv(csv_path)
+        store = store.drop(columns=[x for x in sample_columns if x in store.columns])
+        aligned = daily.reindex(store.index)
+        factor = store['close'] / aligned['close']
+        for column in sample_columns:
+            store[column] = aligned[column] * factor
+        matched = int(aligned['close'].notna().sum())
+
+        missing = daily[~daily.index.isin(store.index)]
+        added = len(missing)
+        if added > 0:
+            dates = store.index.union(missing.index)
+            scale = factor.dropna().reindex(dates).ffill().bfill().fillna(1.0).reindex(missing.index)
+            missing = missing.copy()
+            price_columns = [x for x in PRICE_COLUMNS + sample_columns if x in missing.columns]
+            missing[price_columns] = missing[price_columns].mul(scale, axis=0)
+            store = pd.concat([store, missing[[x for x in missing.columns if x in store.columns]]]).sort_index()
+
+    output = store.reset_index()
+    output['date'] = output['date'].dt.strftime('%Y-%m-%d')
+    write_csv_atomic(output, csv_path)
+    return matched, added
+
+
+def run(args):
+    sample_times = [x.strip() for x in args.sample_times.split(',') if x.strip()]
+    print(f"正在分块读取 {len(args.minute_files)} 个分钟数据文件 (每块 {args.chunksize} 行)...")
+    daily = ingest_minute_bars(args.minute_files, sample_times, args.chunksize)
+    print(f"聚合得到 {len(daily)} 个交易日")
+    matched, added = write_daily_store(daily, args.csv, sample_times)
+    columns = ', '.join(sample_column(x) for x in sample_times)
+    print(f"已写入 {args.csv}: {matched} 个已有交易日有分钟采样价 ({columns})，新增 {added} 个交易日")
+    print(f"回测时使用: cli.py backtest --csv {args.csv} --price-field {sample_column(sample_times[0])}")
+
+
+if __name__ == '__main__':
+    import sys
+    from cli import main
+    main(['ingest-minutes'] + sys.argv[1:])
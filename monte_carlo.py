@@ -0,0 +1,135 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_loader import load_price_data
+from shared_prices import map_with_shared_data
+from sip_engine import build_month_index, summarize_rows
+from strategies import STRATEGY_REGISTRY
+
+# 块自助法(block bootstrap)模拟: 把每个交易日相对前一日收盘价的 开/高/低/收 比值按连续的块重新抽样拼接成新的价格路径
+# 所有路径沿用原始交易日历，月份边界只计算一次；价格数组形状为 (交易日, 路径)，各策略对一批路径一次算完
+
+PRICE_FIELDS = ('open', 'high', 'low', 'close')
+OUTCOME_FIELDS = ['final_value', 'profit_rate', 'annualized_return', 'xirr']
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def bar_ratios(data):
+    # 第 t 行为第 t+1 个交易日的 开/高/低/收 除以第 t 个交易日收盘价，同一天的四个比值一起抽样，保证 low <= open/close <= high
+    close = data['close'].to_numpy(dtype=float)
+    ratios = np.stack([data[x].to_numpy(dtype=float)[1:] / close[:-1] for x in PRICE_FIELDS], axis=1)
+    if np.isnan(ratios).any():
+        raise ValueError("价格数据包含缺失值，无法计算日收益率")
+    return ratios
+
+
+def block_bootstrap_paths(data, n_paths, block_size=20, rng=None, ratios=None):
+    # 循环块自助法: 每条路径由随机起点、长度为 block_size 的连续块拼成，超出末尾从头接续，首日与原始数据相同
+    rng = np.random.default_rng(rng)
+    ratios = bar_ratios(data) if ratios is None else ratios
+    n_returns = len(ratios)
+    first = {x: np.full(n_paths, float(data[x].iloc[0])) for x in PRICE_FIELDS}
+    if n_returns == 0:
+        return {x: first[x][None, :] for x in PRICE_FIELDS}
+
+    block_size = max(1, min(block_size, n_returns))
+    n_blocks = -(-n_returns // block_size)
+    block_starts = rng.integers(0, n_returns, size=(n_blocks, n_paths))
+    offsets = np.arange(block_size)[None, :, None]
+    picks = ((block_starts[:, None, :] + offsets) % n_returns).reshape(n_blocks * block_size, n_paths)[:n_returns]
+
+    sampled = ratios[picks]
+    close = first['close'] * np.cumprod(sampled[:, :, 3], axis=0)
+    prev_close = np.vstack([first['close'][None, :], close[:-1]])
+    paths = {'close': np.vstack([first['close'][None, :], close])}
+    for k, field in enumerate(PRICE_FIELDS[:3]):
+        paths[field] = np.vstack([first[field][None, :], prev_close * sampled[:, :, k]])
+    return paths
+
+
+def evaluate_paths(paths, index, month_index, monthly_investment=1000, strategies=None):
+    # 对一批路径运行全部策略: 策略函数收到二维价格数组，返回 (月数, 路径) 的行号；指标由 summarize_rows 按列计算
+    strategies = STRATEGY_REGISTRY if strategies is None else strategies
+    month_starts, month_ends = month_index
+    n_paths = paths['close'].shape[1]
+    prices = {**paths, 'day': pd.DatetimeIndex(index).day.to_numpy()}
+    outcomes = {}
+    for name, func in strategies.items():
+        rows = np.broadcast_to(func(prices, month_starts, month_ends).reshape(len(month_starts), -1),
+                               (len(month_starts), n_paths))
+        summary = summarize_rows(index, paths['close'], rows, monthly_investment)
+        outcomes[name] = {field: summary[field] for field in OUTCOME_FIELDS}
+    return outcomes
+
+
+def simulate_batch(data, task):
+    # 每批使用独立的随机种子，结果与批次由哪个进程执行、以及进程数无关；进程池中 data 为共享内存中的同一份数据
+    n_paths, block_size, seed, monthly_investment, strategies = task
+    paths = block_bootstrap_paths(data, n_paths, block_size, np.random.default_rng(seed))
+    return evaluate_paths(paths, data.index, build_month_index(data.index), monthly_investment, strategies)
+
+
+def run_monte_carlo(data, n_paths=10000, block_size=20, seed=0, monthly_investment=1000, batch_size=500,
+                    workers=None, strategies=None):
+    # 路径按 batch_size 分批生成和计算，控制 交易日 × 路径 数组的内存；只有一批时不启动进程池
+    strategies = STRATEGY_REGISTRY if strategies is None else strategies
+    data = data[list(PRICE_FIELDS)]
+    bar_ratios(data)  # 在主进程中提前检查缺失值
+    batch_sizes = [min(batch_size, n_paths - start) for start in range(0, n_paths, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(batch_sizes))
+    tasks = [(size, block_size, s, monthly_investment, strategies) for size, s in zip(batch_sizes, seeds)]
+
+    if len(tasks) <= 1 or workers == 1:
+        batches = [simulate_batch(data, task) for task in tasks]
+    else:
+        batches = map_with_shared_data(simulate_batch, data, tasks, workers)
+
+    return {name: {field: np.concatenate([batch[name][field] for batch in batches]) for field in OUTCOME_FIELDS}
+            for name in strategies}
+
+
+def summarize_outcomes(outcomes, percentiles=PERCENTILES):
+    # 每个策略、每个指标一行: 均值、各分位数，以及亏损(收益率 < 0)路径的比例
+    rows = []
+    for name, fields in outcomes.items():
+        loss_probability = float(np.mean(fields['profit_rate'] < 0)) * 100
+        for field in OUTCOME_FIELDS:
+            values = fields[field]
+            row = {'strategy': name, 'metric': field, 'paths': len(values), 'mean': float(np.mean(values))}
+            row.update({f'p{p:g}': float(x) for p, x in zip(percentiles, np.percentile(values, percentiles))})
+            row['loss_probability'] = loss_probability
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def run(args):
+    data = load_price_data(args.csv)
+    workers = args.workers if args.workers is not None else os.cpu_count()
+    print(f"正在模拟 {args.paths} 条价格路径 (块长度 {args.block_size} 个交易日，每批 {args.batch_size} 条)...")
+    started = time.time()
+    outcomes = run_monte_carlo(data, args.paths, args.block_size, args.seed, args.monthly_investment,
+                               args.batch_size, workers)
+    print(f"模拟完成，用时 {time.time() - started:.1f} 秒")
+
+    table = summarize_outcomes(outcomes)
+    print("\n" + "=" * 100)
+    print(f"{'策略名称':<25} {'亏损概率(%)':<12} {'收益率P5(%)':<12} {'P50(%)':<10} {'P95(%)':<10} {'年化P50(%)':<12} {'XIRR P50(%)':<12}")
+    print("-" * 100)
+    for name in outcomes:
+        profit = table[(table['strategy'] == name) & (table['metric'] == 'profit_rate')].iloc[0]
+        annual = table[(table['strategy'] == name) & (table['metric'] == 'annualized_return')].iloc[0]
+        xirr = table[(table['strategy'] == name) & (table['metric'] == 'xirr')].iloc[0]
+        print(f"{name:<25} {profit['loss_probability']:<12.2f} {profit['p5']:<12.2f} {profit['p50']:<10.2f} "
+              f"{profit['p95']:<10.2f} {annual['p50']:<12.2f} {xirr['p50']:<12.2f}")
+
+    table.to_csv(args.output, index=False, encoding='utf-8-sig')
+    print(f"\n分位数统计已保存为: {args.output}")
+
+
+if __name__ == '__main__':
+    import sys
+    from cli import main
+    main(['montecarlo'] + sys.argv[1:])
@@ -0,0 +1,4 @@
+# fetch 与 adjust 共用的默认目录: fetch --raw-store 写入 RAW_DATA_DIR，adjust 从 RAW_DATA_DIR 读取并把结果写入 DATA_DIR
+# 单独成模块且不导入任何依赖，cli 与各命令模块都可以直接引用
+DATA_DIR = 'data'
+RAW_DATA_DIR = 'data_raw'
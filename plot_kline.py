@@ -1,103 +1,137 @@
+import sys
+
 import pandas as pd
-import mplfinance as mpf
-import matplotlib.pyplot as plt
-from matplotlib import font_manager
-import platform
-
-print("正在读取数据...")
-
-system_name = platform.system()
-if system_name == 'Windows':
-    font_names = ['SimHei', 'Microsoft YaHei', 'SimSun', 'FangSong', 'KaiTi']
-    found = False
-    for font_name in font_names:
-        try:
-            font_prop = font_manager.FontProperties(family=font_name)
-            plt.rcParams['font.sans-serif'] = [font_name]
-            plt.rcParams['axes.unicode_minus'] = False
-            print(f"使用字体: {font_name}")
-            found = True
-            break
-        except:
-            continue
-    if not found:
-        print("未找到中文字体，使用默认字体")
-elif system_name == 'Darwin':
-    plt.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'PingFang SC']
-    plt.rcParams['axes.unicode_minus'] = False
-else:
-    plt.rcParams['font.sans-serif'] = ['WenQuanYi Micro Hei', 'SimHei']
-    plt.rcParams['axes.unicode_minus'] = False
-
-df = pd.read_csv('qrcb_historical_data.csv')
-
-df['date'] = pd.to_datetime(df['date'])
-df.set_index('date', inplace=True)
-
-df = df.rename(columns={
-    'open': 'Open',
-    'high': 'High',
-    'low': 'Low',
-    'close': 'Close',
-    'amount': 'Volume'
-})
-
-print(f"数据范围: {df.index[0]} 至 {df.index[-1]}")
-print(f"共 {len(df)} 条记录")
-
-recent_df = df.tail(100)
-
-print("\n正在绘制K线图...")
-
-mc = mpf.make_marketcolors(
-    up='red',
-    down='green',
-    edge='i',
-    wick='i',
-    volume='in',
-    inherit=True
-)
-
-# 1. 先确定当前系统可用的字体名称
-if system_name == 'Windows':
-    my_font = 'SimHei'
-elif system_name == 'Darwin':
-    my_font = 'Arial Unicode MS'
-else:
-    my_font = 'WenQuanYi Micro Hei'
-
-# 2. 在创建样式时，明确指定 rc 参数
-s = mpf.make_mpf_style(
-    marketcolors=mc,
-    gridaxis='both',
-    gridstyle='-.',
-    y_on_right=False,
-    figcolor='white',
-    facecolor='white',
-    # 核心修正：通过 rc 字典传递字体和负号设置
-    rc={
-        'font.family': my_font, 
-        'axes.unicode_minus': False
-    }
-)
-
-# 3. 如果你的标题包含中文，请确保字符串正确
-# 例如：title='青农商行 (002958) 历史K线图'
-
-fig, axes = mpf.plot(
-    recent_df,
-    type='candle',
-    style=s,
-    title='青农商行 (002958) K线图 (最近 100 天)',
-    ylabel='价格',
-    volume=True,
-    ylabel_lower='交易量',
-    figratio=(16, 9),
-    figscale=1.2,
-    returnfig=True
-)
-
-plt.savefig('qrcb_kline.png', dpi=300, bbox_inches='tight')
-print("K线图已保存为: qrcb_kline.png")
-
-mpf.show()
+
+from data_loader import load_derived_frame, load_price_data
+
+# 日线预先聚合为周/月/季K线并缓存；绘图时按日期范围选择K线数不超过 max_candles 的最细级别
+# 聚合后的每根K线以该周期内最后一个交易日为日期
+LEVELS = {
+    'D': ('日', None),
+    'W': ('周', 'W-FRI'),
+    'M': ('月', 'M'),
+    'Q': ('季', 'Q'),
+}
+
+_levels_cache = {}
+
+
+def aggregate_bars(df, freq):
+    periods = df.index.to_period(freq)
+    aggregations = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last'}
+    aggregations.update({x: 'sum' for x in ('volume', 'amount') if x in df.columns})
+    grouped = df[list(aggregations)].groupby(periods, sort=True)
+    bars = grouped.agg(aggregations)
+    bars.index = pd.DatetimeIndex(df.index.to_series().groupby(periods, sort=True).max(), name='date')
+    return bars
+
+
+def load_kline_levels(csv_path):
+    # 同一进程内重复绘图(例如缩放到不同日期范围)时直接复用已加载的各级K线
+    levels = _levels_cache.get(csv_path)
+    if levels is None:
+        levels = {'D': load_price_data(csv_path)}
+        for level, (_, freq) in LEVELS.items():
+            if freq is not None:
+                levels[level] = load_derived_frame(csv_path, f'kline_{level}', lambda df, f=freq: aggregate_bars(df, f))
+        _levels_cache[csv_path] = levels
+    return levels
+
+
+def pick_resolution(levels, start, end, max_candles=250):
+    for level in LEVELS:
+        if len(levels[level].loc[start:end]) <= max_candles:
+            return level
+    return list(LEVELS)[-1]
+
+
+def run(args):
+    import sip_plots
+
+    if args.headless:
+        sip_plots.use_headless_backend()
+    import mplfinance as mpf
+    import matplotlib.pyplot as plt
+
+    print("正在读取数据...")
+    sip_plots.setup_chinese_font(verbose=True)
+
+    levels = load_kline_levels(args.csv)
+    daily = levels['D']
+    print(f"数据范围: {daily.index[0]} 至 {daily.index[-1]}")
+    print(f"共 {len(daily)} 条记录")
+
+    # 未指定日期范围时沿用最近 --days 个交易日，--days 0 表示全部历史
+    if args.start_date or args.end_date:
+        start = pd.Timestamp(args.start_date) if args.start_date else daily.index[0]
+        end = pd.Timestamp(args.end_date) if args.end_date else daily.index[-1]
+    else:
+        start = daily.index[-args.days] if 0 < args.days < len(daily) else daily.index[0]
+        end = daily.index[-1]
+
+    level = pick_resolution(levels, start, end, args.max_candles) if args.resolution == 'auto' else args.resolution
+    bars = levels[level].loc[start:end]
+    if len(bars) == 0:
+        raise SystemExit(f"{start.date()} 至 {end.date()} 没有数据")
+    level_name = LEVELS[level][0]
+
+    # 数据源没有成交量时下方面板显示成交额，不把成交额当作成交量
+    volume_column = 'volume' if 'volume' in bars.columns else 'amount'
+    volume_label = '成交量' if volume_column == 'volume' else '成交额(元)'
+    plot_df = bars.rename(columns={
+        'open': 'Open',
+        'high': 'High',
+        'low': 'Low',
+        'close': 'Close',
+        volume_column: 'Volume'
+    })[['Open', 'High', 'Low', 'Close', 'Volume']]
+
+    print(f"\n正在绘制{level_name}K线图 ({len(plot_df)} 根)...")
+
+    mc = mpf.make_marketcolors(
+        up='red',
+        down='green',
+        edge='i',
+        wick='i',
+        volume='in',
+        inherit=True
+    )
+
+    # 在创建样式时，明确指定 rc 参数
+    s = mpf.make_mpf_style(
+        marketcolors=mc,
+        gridaxis='both',
+        gridstyle='-.',
+        y_on_right=False,
+        figcolor='white',
+        facecolor='white',
+        # 核心修正：通过 rc 字典传递字体和负号设置
+        rc={
+            'font.family': sip_plots.chinese_font_name(),
+            'axes.unicode_minus': False
+        }
+    )
+
+    fig, axes = mpf.plot(
+        plot_df,
+        type='candle',
+        style=s,
+        title=f'青农商行 (002958) {level_name}K线图 ({plot_df.index[0]:%Y-%m-%d} 至 {plot_df.index[-1]:%Y-%m-%d})',
+        ylabel='价格',
+        volume=True,
+        ylabel_lower=volume_label,
+        figratio=(16, 9),
+        figscale=1.2,
+        returnfig=True
+    )
+
+    plt.savefig(args.output, dpi=300, bbox_inches='tight')
+    print(f"K线图已保存为: {args.output}")
+
+    if not args.headless:
+        mpf.show()
+
+
+if __name__ == '__main__':
+    from cli import main
+    main(['kline'] + sys.argv[1:])
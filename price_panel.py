@@ -0,0 +1,173 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_loader import load_price_data
+
+# 多股票面板: 所有股票共用一个交易日历，每个字段是一个 股票数 × 交易日 的连续数组
+# 价格列默认存为 int32 的分(0.01元)，也可存为 float32；其余列(成交额等)存为 float32；valid 标记该股票当天是否有数据(停牌为 False)
+# 面板可以保存为每个数组一个 .npy 文件的目录，加载时用内存映射，多个进程读取同一个面板只占一份页缓存
+
+PANEL_VERSION = 1
+PRICE_FIELDS = ('open', 'close', 'high', 'low')
+TICKS_PER_YUAN = 100
+MISSING_TICK = np.iinfo(np.int32).min
+
+
+class PricePanel:
+    def __init__(self, symbols, calendar, fields, valid, ticks=True):
+        self.symbols = list(symbols)
+        self.calendar = pd.DatetimeIndex(calendar, name='date')
+        self.fields = fields
+        self.valid = valid
+        self.ticks = ticks
+        self._positions = {symbol: i for i, symbol in enumerate(self.symbols)}
+
+    @classmethod
+    def from_frames(cls, frames, columns=None, price_dtype='ticks'):
+        # frames 为 {代码: load_price_data 格式的 DataFrame}；columns 默认为所有股票共有的数值列
+        if price_dtype not in ('ticks', 'float32'):
+            raise ValueError(f"未知的价格存储类型: {price_dtype}")
+        symbols = list(frames)
+        if columns is None:
+            first = frames[symbols[0]] if symbols else pd.DataFrame()
+            columns = [x for x in first.columns if pd.api.types.is_numeric_dtype(first[x])
+                       and all(x in frames[s].columns for s in symbols)]
+        dates = [frames[s].index.to_numpy(dtype='datetime64[ns]') for s in symbols]
+        calendar = pd.DatetimeIndex(np.unique(np.concatenate(dates)) if dates else [], name='date')
+
+        ticks = price_dtype == 'ticks'
+        shape = (len(symbols), len(calendar))
+        valid = np.zeros(shape, dtype=bool)
+        fields = {}
+        for column in columns:
+            if ticks and column in PRICE_FIELDS:
+                fields[column] = np.full(shape, MISSING_TICK, dtype=np.int32)
+            else:
+                fields[column] = np.full(shape, np.nan, dtype=np.float32)
+
+        for i, symbol in enumerate(symbols):
+            df = frames[symbol]
+            positions = calendar.get_indexer(df.index)
+            valid[i, positions] = True
+            for column in columns:
+                values = df[column].to_numpy(dtype=float)
+                if fields[column].dtype == np.int32:
+                    fields[column][i, positions] = np.where(np.isnan(values), MISSING_TICK,
+                                                            np.rint(np.nan_to_num(values) * TICKS_PER_YUAN))
+                else:
+                    fields[column][i, positions] = values
+        return cls(symbols, calendar, fields, valid, ticks)
+
+    @classmethod
+    def from_csv_files(cls, symbol_files, columns=None, price_dtype='ticks'):
+        return cls.from_frames({symbol: load_price_data(path) for symbol, path in symbol_files}, columns, price_dtype)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self._positions
+
+    def __getitem__(self, symbol):
+        # 单只股票的面板，数组为原面板的切片，不复制数据
+        i = self._positions[symbol]
+        return PricePanel([symbol], self.calendar, {k: v[i:i + 1] for k, v in self.fields.items()},
+                          self.valid[i:i + 1], self.ticks)
+
+    @property
+    def columns(self):
+        return list(self.fields)
+
+    @property
+    def nbytes(self):
+        return self.valid.nbytes + self.calendar.asi8.nbytes + sum(x.nbytes for x in self.fields.values())
+
+    def column(self, name, symbol=None):
+        # 某只股票某一列在整个日历上的 float64 值，无数据的位置为 NaN
+        values = self.fields[name][self._row(symbol)]
+        if values.dtype == np.int32:
+            result = values / TICKS_PER_YUAN
+            result[values == MISSING_TICK] = np.nan
+        else:
+            result = values.astype(float)
+        return result
+
+    def to_frame(self, symbol=None):
+        # 转为与 load_price_data 相同格式的 DataFrame，只保留该股票有数据的交易日
+        row = self._row(symbol)
+        mask = self.valid[row]
+        return pd.DataFrame({name: self.column(name, self.symbols[row])[mask] for name in self.fields},
+                            index=self.calendar[mask])
+
+    def _row(self, symbol):
+        if symbol is None:
+            if len(self.symbols) != 1:
+                raise ValueError("面板包含多只股票，请指定代码或先用 panel[代码] 选出单只股票")
+            return 0
+        return self._positions[symbol]
+
+    def save(self, directory):
+        # 每个文件先写入 .tmp 再 os.replace，meta.json 最后替换；已经内存映射旧文件的进程继续读取旧数据
+        os.makedirs(directory, exist_ok=True)
+        arrays = {'calendar.npy': self.calendar.to_numpy(dtype='datetime64[ns]').view(np.int64), 'valid.npy': self.valid}
+        for i, name in enumerate(self.fields):
+            arrays[f'field_{i}.npy'] = self.fields[name]
+        meta = {'version': PANEL_VERSION, 'symbols': self.symbols, 'columns': self.columns, 'ticks': self.ticks}
+
+        written = []
+        try:
+            for name, values in arrays.items():
+                tmp_file = os.path.join(directory, name + '.tmp')
+                written.append((tmp_file, os.path.join(directory, name)))
+                with open(tmp_file, 'wb') as f:
+                    np.save(f, values)
+            tmp_file = os.path.join(directory, 'meta.json.tmp')
+            written.append((tmp_file, os.path.join(directory, 'meta.json')))
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+        except BaseException:
+            for tmp_file, _ in written:
+                if os.path.exists(tmp_file):
+                    os.remove(tmp_file)
+            raise
+        for tmp_file, path in written:
+            os.replace(tmp_file, path)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != PANEL_VERSION:
+            raise ValueError(f"不支持的面板版本: {meta.get('version')}")
+        mmap_mode = 'r' if mmap else None
+        calendar = np.load(os.path.join(directory, 'calendar.npy')).view('datetime64[ns]')
+        valid = np.load(os.path.join(directory, 'valid.npy'), mmap_mode=mmap_mode)
+        fields = {name: np.load(os.path.join(directory, f'field_{i}.npy'), mmap_mode=mmap_mode)
+                  for i, name in enumerate(meta['columns'])}
+        return cls(meta['symbols'], calendar, fields, valid, meta['ticks'])
+
+
+def as_price_frame(data):
+    # 回测函数的统一入口: 单只股票的 PricePanel 转为 DataFrame，DataFrame 原样返回
+    if isinstance(data, PricePanel):
+        return data.to_frame()
+    return data
+
+
+def run(args):
+    from universe_backtest import find_symbol_files
+    symbol_files = find_symbol_files(args.data_dir, args.pattern)
+    print(f"共找到 {len(symbol_files)} 个股票数据文件，正在生成面板...")
+    panel = PricePanel.from_csv_files(symbol_files, price_dtype=args.price_dtype)
+    panel.save(args.output)
+    print(f"面板: {len(panel)} 只股票 × {len(panel.calendar)} 个交易日，"
+          f"{panel.nbytes / 1024 / 1024:.1f} MB，已保存到 {args.output}")
+
+
+if __name__ == '__main__':
+    import sys
+    from cli import main
+    main(['panel'] + sys.argv[1:])
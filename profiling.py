@@ -0,0 +1,98 @@
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+_NULL_STAGE = nullcontext()
+
+
+class StageProfiler:
+    # 按阶段累计 调用次数 / 总耗时 / tracemalloc 峰值内存(相对进入阶段时的增量)，同名阶段多次调用合并统计，支持嵌套
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.stats = {}
+        self._stack = []
+        self._started_tracing = False
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    @contextmanager
+    def stage(self, name):
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                self._stack[-1][1] = max(self._stack[-1][1], peak)
+            tracemalloc.reset_peak()
+            frame = [current, current]
+        else:
+            frame = [0, 0]
+        self._stack.append(frame)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self._stack.pop()
+            stat = self.stats.setdefault(name, {'calls': 0, 'seconds': 0.0, 'peak_bytes': 0})
+            stat['calls'] += 1
+            stat['seconds'] += elapsed
+            if self.trace_memory:
+                # reset_peak 是全局的，退出时把本阶段的峰值并入外层阶段
+                frame[1] = max(frame[1], tracemalloc.get_traced_memory()[1])
+                stat['peak_bytes'] = max(stat['peak_bytes'], frame[1] - frame[0])
+                if self._stack:
+                    self._stack[-1][1] = max(self._stack[-1][1], frame[1])
+                tracemalloc.reset_peak()
+
+    def stop(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def report(self):
+        return {
+            'trace_memory': self.trace_memory,
+            'stages': [
+                {'stage': name, 'calls': x['calls'], 'seconds': x['seconds'],
+                 'mean_ms': x['seconds'] / x['calls'] * 1000, 'peak_bytes': x['peak_bytes']}
+                for name, x in self.stats.items()
+            ]
+        }
+
+    def to_json(self, output_file=None):
+        text = json.dumps(self.report(), ensure_ascii=False, indent=2)
+        if output_file is not None:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                f.write(text)
+        return text
+
+    def print_report(self):
+        print(f"\n{'阶段':<40} {'调用次数':<10} {'总耗时(ms)':<12} {'平均(ms)':<12} {'峰值内存(KiB)':<14}")
+        print("-" * 92)
+        for x in self.report()['stages']:
+            print(f"{x['stage']:<40} {x['calls']:<10} {x['seconds'] * 1000:<12.2f} {x['mean_ms']:<12.3f} "
+                  f"{x['peak_bytes'] / 1024:<14.1f}")
+
+
+def stage(profiler, name):
+    # 未开启分析时返回可复用的空上下文，热循环里几乎没有额外开销
+    if profiler is None:
+        return _NULL_STAGE
+    return profiler.stage(name)
+
+
+def profiler_from_args(args):
+    if getattr(args, 'profile', False) or getattr(args, 'profile_output', None):
+        return StageProfiler()
+    return None
+
+
+def finish_profile(profiler, output_file=None):
+    if profiler is None:
+        return
+    profiler.stop()
+    profiler.print_report()
+    if output_file:
+        profiler.to_json(output_file)
+        print(f"\n阶段统计结果已保存为: {output_file}")
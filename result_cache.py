@@ -0,0 +1,282 @@
+import functools
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import types
+
+import numpy as np
+
+# 按内容寻址的磁盘缓存: 键为 输入数据哈希 + 策略标识 + 参数 的哈希，数据或参数任何变化都会得到新的键，旧条目不会被读到
+# 条目按最近使用时间(读取时刷新文件修改时间)淘汰，总大小不超过 max_bytes；写入先写临时文件再替换，多进程共用同一目录是安全的
+# 结果格式或计算口径变化时递增 CACHE_VERSION，使旧条目全部失效
+
+CACHE_VERSION = 1
+
+
+def _hasher():
+    return hashlib.blake2b(digest_size=20)
+
+
+def data_fingerprint(data):
+    # 日期索引、列名和每列的值一起参与哈希
+    h = _hasher()
+    # 统一为纳秒，索引精度不同(例如共享内存中的数据)但内容相同时哈希一致
+    h.update(data.index.to_numpy(dtype='datetime64[ns]').view(np.int64).tobytes())
+    for column in data.columns:
+        h.update(str(column).encode('utf-8') + b'\0')
+        values = data[column].to_numpy()
+        if np.issubdtype(values.dtype, np.number):
+            h.update(np.ascontiguousarray(values, dtype=float).tobytes())
+        else:
+            h.update('\0'.join(map(str, values)).encode('utf-8'))
+    return h.hexdigest()
+
+
+class UnhashableStrategy(TypeError):
+    pass
+
+
+def _code_digest(code, h):
+    # co_names 包含调用的全局函数名和属性名(例如 idxmin / idxmax)，只改这些名字时字节码可能完全相同
+    h.update(code.co_code)
+    h.update('\0'.join(code.co_names).encode('utf-8') + b'\0')
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            _code_digest(const, h)
+        else:
+            h.update(repr(const).encode('utf-8'))
+
+
+def _global_names(code):
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _global_names(const)
+    return names
+
+
+def _value_digest(value, h, seen):
+    # 按值哈希策略依赖的一切: 函数的字节码、默认参数、闭包变量和引用的全局函数/常量，partial 的函数和参数
+    if isinstance(value, (types.FunctionType, functools.partial, list, dict, set)):
+        # 引用环(例如互相调用的函数、包含自身的注册表)只展开一次
+        if id(value) in seen:
+            h.update(b'<seen>')
+            return
+        seen.add(id(value))
+
+    if value is None or isinstance(value, (bool, int, float, complex, str, bytes)):
+        h.update(f'{type(value).__name__}:{value!r}'.encode('utf-8') + b'\0')
+    elif isinstance(value, (tuple, list, set, frozenset)):
+        h.update(f'{type(value).__name__}[{len(value)}]'.encode('utf-8'))
+        for item in (sorted(value, key=repr) if isinstance(value, (set, frozenset)) else value):
+            _value_digest(item, h, seen)
+    elif isinstance(value, dict):
+        h.update(f'dict[{len(value)}]'.encode('utf-8'))
+        for k in sorted(value, key=repr):
+            _value_digest(k, h, seen)
+            _value_digest(value[k], h, seen)
+    elif isinstance(value, np.ndarray):
+        h.update(f'ndarray:{value.dtype.str}:{value.shape}'.encode('utf-8'))
+        h.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, functools.partial):
+        h.update(b'partial')
+        _value_digest(value.func, h, seen)
+        _value_digest(value.args, h, seen)
+        _value_digest(value.keywords, h, seen)
+    elif isinstance(value, types.MethodType):
+        # 绑定方法只哈希函数本身；EnhancedSIPBacktest 的策略方法所用数据已经在缓存键的数据哈希中
+        h.update(f'method:{type(value.__self__).__qualname__}'.encode('utf-8'))
+        _value_digest(value.__func__, h, seen)
+    elif isinstance(value, types.FunctionType):
+        h.update(f'function:{value.__module__}.{value.__qualname__}'.encode('utf-8'))
+        _code_digest(value.__code__, h)
+        _value_digest(value.__defaults__, h, seen)
+        _value_digest(value.__kwdefaults__, h, seen)
+        for cell in value.__closure__ or ():
+            try:
+                contents = cell.cell_contents
+            except ValueError:
+                h.update(b'<empty cell>')
+                continue
+            _value_digest(contents, h, seen)
+        for name in sorted(_global_names(value.__code__)):
+            if name not in value.__globals__:
+                continue
+            h.update(f'global:{name}'.encode('utf-8'))
+            _value_digest(value.__globals__[name], h, seen)
+    elif isinstance(value, (types.ModuleType, type, types.BuiltinFunctionType, np.ufunc)):
+        # 模块、类和内置函数只按名字区分，不展开其实现
+        h.update(f'{type(value).__name__}:{getattr(value, "__module__", "")}.'
+                 f'{getattr(value, "__qualname__", getattr(value, "__name__", ""))}'.encode('utf-8'))
+    else:
+        try:
+            h.update(pickle.dumps(value, protocol=4))
+        except Exception as e:
+            raise UnhashableStrategy(f"无法按值哈希 {type(value).__name__} 对象: {e}") from e
+
+
+def strategy_identity(func):
+    # 模块名 + 限定名 + 策略实现按值的哈希: 修改策略、它调用的全局函数、闭包变量或 partial 参数后原有缓存自动失效
+    # 依赖无法按值哈希的对象时返回 None，调用方不使用缓存
+    target = getattr(func, '__func__', func)
+    name = f"{getattr(target, '__module__', '')}.{getattr(target, '__qualname__', type(target).__qualname__)}"
+    h = _hasher()
+    try:
+        _value_digest(func, h, set())
+    except UnhashableStrategy:
+        return None
+    return f"{name}:{h.hexdigest()}"
+
+
+def results_fingerprint(results):
+    # 用于图表缓存: 每个策略的买入日期、价格、份额和金额
+    h = _hasher()
+    for name, result in results.items():
+        h.update(name.encode('utf-8') + b'\0')
+        records = result['investment_dates']
+        h.update(np.array([x['date'].value for x in records], dtype=np.int64).tobytes())
+        for field in ('price', 'shares'):
+            h.update(np.array([x[field] for x in records], dtype=float).tobytes())
+        h.update(np.array([x.get('amount', np.nan) for x in records], dtype=float).tobytes())
+    return h.hexdigest()
+
+
+def cache_key(*parts):
+    h = _hasher()
+    h.update(json.dumps([CACHE_VERSION, *parts], ensure_ascii=False, default=str).encode('utf-8'))
+    return h.hexdigest()
+
+
+class ResultCache:
+    # 写入时累计目录总大小，只有超出 max_bytes 时才遍历目录，删除到 low_water 比例以下，避免每次写入都扫描整个目录
+    # 累计值只包含本进程的写入；多个进程共用目录时各自在超限时重新扫描，扫描结果会校正累计值
+    def __init__(self, cache_dir='.result_cache', max_bytes=512 * 1024 * 1024, low_water=0.9):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self.hits = 0
+        self.misses = 0
+        self._total_bytes = None
+
+    def path(self, key, suffix='.pkl'):
+        return os.path.join(self.cache_dir, key[:2], key + suffix)
+
+    def _lookup(self, key, suffix):
+        # 刷新修改时间作为最近使用时间；是否命中由调用方在读取成功后计数
+        path = self.path(key, suffix)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def _discard(self, path):
+        # 损坏的条目直接删除，下次写入时重新生成
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        if self._total_bytes is not None:
+            self._total_bytes -= size
+
+    def _store(self, path, write):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_file = f'{path}.tmp{os.getpid()}'
+        try:
+            write(tmp_file)
+            size = os.path.getsize(tmp_file)
+            replaced = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_file, path)
+        except OSError as e:
+            print(f"写入结果缓存失败: {e}")
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            return
+        if self._total_bytes is None:
+            self._total_bytes = self._scan()[1]
+        else:
+            self._total_bytes += size - replaced
+        if self._total_bytes > self.max_bytes:
+            self.evict()
+
+    def get(self, key):
+        path = self._lookup(key, '.pkl')
+        if path is None:
+            self.misses += 1
+            return None
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except Exception:
+            # 截断或损坏的文件可能引发各种异常，一律按未命中处理
+            self.misses += 1
+            self._discard(path)
+            return None
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        def write(tmp_file):
+            with open(tmp_file, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._store(self.path(key, '.pkl'), write)
+
+    def get_file(self, key, output_file, suffix):
+        # 命中时把缓存的文件复制到 output_file
+        path = self._lookup(key, suffix)
+        if path is None:
+            self.misses += 1
+            return False
+        try:
+            shutil.copyfile(path, output_file)
+        except OSError:
+            self.misses += 1
+            return False
+        self.hits += 1
+        return True
+
+    def put_file(self, key, source_file, suffix):
+        self._store(self.path(key, suffix), lambda tmp_file: shutil.copyfile(source_file, tmp_file))
+
+    def _scan(self):
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if '.tmp' in name:
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+                total += stat.st_size
+        return entries, total
+
+    def evict(self):
+        # 超出容量时从最久未使用的条目开始删除，直到不超过 max_bytes * low_water
+        entries, total = self._scan()
+        removed = 0
+        if total > self.max_bytes:
+            target = self.max_bytes * self.low_water
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+        self._total_bytes = total
+        return removed
+
+
+def cache_from_args(args):
+    if getattr(args, 'no_cache', False):
+        return None
+    return ResultCache(args.cache_dir, int(args.cache_max_mb * 1024 * 1024))
@@ -0,0 +1,76 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+# 把一份日线数据的日期和数值列放进一块共享内存，进程池的 worker 只接收很小的句柄并直接映射这块内存，
+# 不再各自读取 CSV，也不再随每个任务传递 pickle 后的 DataFrame。布局: [日期 int64 × 行数][数值列 float64 × 列数 × 行数]
+# 每列在共享内存中连续存放，attach 得到的 DataFrame 直接以这块内存为数据，只读
+
+
+class SharedPriceData:
+    def __init__(self, data):
+        columns = [x for x in data.columns if pd.api.types.is_numeric_dtype(data[x])]
+        n_rows = len(data)
+        size = max(8 * n_rows * (1 + len(columns)), 1)
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        index = pd.DatetimeIndex(data.index)
+        # 共享内存中统一存纳秒，attach 时还原为原索引的时间精度
+        self.handle = (self.shm.name, n_rows, columns, index.name, str(index.dtype))
+
+        dates, values = _views(self.shm.buf, n_rows, len(columns))
+        dates[:] = index.to_numpy(dtype='datetime64[ns]').view(np.int64)
+        for i, column in enumerate(columns):
+            values[i] = data[column].to_numpy(dtype=float)
+
+    def close(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _views(buffer, n_rows, n_columns):
+    dates = np.ndarray((n_rows,), dtype=np.int64, buffer=buffer)
+    values = np.ndarray((n_columns, n_rows), dtype=np.float64, buffer=buffer, offset=8 * n_rows)
+    return dates, values
+
+
+def attach_price_data(handle):
+    # 返回 (DataFrame, SharedMemory)；调用方需持有 SharedMemory 对象直到不再使用该 DataFrame
+    name, n_rows, columns, index_name, index_dtype = handle
+    # 共享内存由创建者释放；进程池的 worker 与创建者共用同一个 resource_tracker，attach 时的重复登记不会导致提前删除
+    shm = shared_memory.SharedMemory(name=name)
+    dates, values = _views(shm.buf, n_rows, len(columns))
+    values.flags.writeable = False
+    index = pd.DatetimeIndex(dates.view('datetime64[ns]').astype(index_dtype), name=index_name)
+    return pd.DataFrame(values.T, index=index, columns=columns, copy=False), shm
+
+
+_worker_data = None
+_worker_shm = None
+
+
+def init_worker(handle):
+    # 进程池 initializer: 每个 worker 只 attach 一次，之后的任务都使用同一份数据
+    global _worker_data, _worker_shm
+    _worker_data, _worker_shm = attach_price_data(handle)
+
+
+def _call_with_shared_data(item):
+    func, task = item
+    return func(_worker_data, task)
+
+
+def map_with_shared_data(func, data, tasks, workers=None, chunksize=1):
+    # 在进程池中对每个任务调用 func(data, task)；data 只发布一次，func 需为模块级函数
+    with SharedPriceData(data) as shared:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(shared.handle,)) as pool:
+            return list(pool.map(_call_with_shared_data, [(func, task) for task in tasks], chunksize=chunksize))
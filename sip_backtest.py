@@ -0,0 +1,431 @@
+import os
+
+import numpy as np
+
+from price_panel import PricePanel, as_price_frame
+from profiling import stage
+from result_cache import cache_key, data_fingerprint, results_fingerprint, strategy_identity
+from sip_engine import build_month_index, summarize_rows
+from smart_sip import ma_topup_amounts, moving_average, pause_above_band_amounts, value_averaging_amounts
+from strategies import STRATEGY_REGISTRY, price_arrays, select_monthly_day_1, select_rows
+from xirr import xirr_from_records
+
+STRATEGIES = [
+    ("每月1日定投", 1),
+    ("每月15日定投", 15),
+    ("每月最后1日定投", -1),
+    ("每月最低点定投(理想)", 'lowest'),
+    ("每月最高点定投(最差)", 'highest'),
+]
+
+
+def backtest_sip(data, invest_day=1, month_index=None, monthly_investment=1000, profiler=None):
+    # data 为 DataFrame 或单只股票的 PricePanel；面板在这里经 as_price_frame 转为 float64 的 DataFrame，下同
+    data = as_price_frame(data)
+    if month_index is None:
+        with stage(profiler, 'month_grouping'):
+            month_index = build_month_index(data.index)
+    month_starts, month_ends = month_index
+    
+    total_invested = 0
+    total_shares = 0
+    investment_dates = []
+    day_stage = f'invest_day:{invest_day}'
+    
+    for start, end in zip(month_starts, month_ends):
+        with stage(profiler, 'month_grouping'):
+            month_data = data.iloc[start:end]
+        
+        with stage(profiler, day_stage):
+            if invest_day == 'lowest':
+                invest_idx = month_data['low'].idxmin()
+            elif invest_day == 'highest':
+                invest_idx = month_data['high'].idxmax()
+            else:
+                if invest_day == -1:
+                    invest_idx = month_data.index[-1]
+                else:
+                    invest_idx = min(invest_day - 1, len(month_data) - 1)
+                    if invest_idx < 0:
+                        continue
+                    invest_idx = month_data.index[invest_idx]
+        
+        if invest_idx not in month_data.index:
+            continue
+            
+        invest_price = month_data.loc[invest_idx, 'close']
+        
+        shares = monthly_investment / invest_price
+        
+        total_invested += monthly_investment
+        total_shares += shares
+        
+        investment_dates.append({
+            'date': invest_idx,
+            'price': invest_price,
+            'shares': shares
+        })
+    
+    with stage(profiler, 'metrics'):
+        final_value = total_shares * data['close'].iloc[-1]
+        total_profit = final_value - total_invested
+        profit_rate = (total_profit / total_invested) * 100 if total_invested > 0 else 0
+        
+        years = (data.index[-1] - data.index[0]).days / 365.25
+        annualized_return = ((final_value / total_invested) ** (1 / years) - 1) * 100 if years > 0 and total_invested > 0 else 0
+        xirr = xirr_from_records(investment_dates, data.index[-1], final_value, monthly_investment)
+    
+    return {
+        'total_invested': total_invested,
+        'final_value': final_value,
+        'total_profit': total_profit,
+        'profit_rate': profit_rate,
+        'annualized_return': annualized_return,
+        'xirr': xirr,
+        'investment_count': len(investment_dates),
+        'investment_dates': investment_dates
+    }
+
+
+def backtest_sip_with_open(data, invest_day=11, month_index=None, monthly_investment=1000, profiler=None,
+                           price_field='open'):
+    data = as_price_frame(data)
+    if month_index is None:
+        with stage(profiler, 'month_grouping'):
+            month_index = build_month_index(data.index)
+    month_starts, month_ends = month_index
+    day_of_month = data.index.day.to_numpy()
+    # price_field 可以是分钟数据导入的采样价(如 at_1000)，当天没有分钟数据时退回开盘价
+    open_prices = data[price_field].fillna(data['open']).to_numpy()
+    
+    total_invested = 0
+    total_shares = 0
+    investment_dates = []
+    day_stage = f'invest_day:{invest_day}'
+    
+    for start, end in zip(month_starts, month_ends):
+        if end <= start:
+            continue
+        
+        # 寻找11日或之后的第一个交易日；如果11日之后也没有（月末），就找该月最后一个交易日
+        with stage(profiler, day_stage):
+            offset = np.searchsorted(day_of_month[start:end], invest_day)
+            invest_pos = min(start + offset, end - 1)
+            invest_date = data.index[invest_pos]
+            invest_price = open_prices[invest_pos]
+        
+        shares = monthly_investment / invest_price
+        
+        total_invested += monthly_investment
+        total_shares += shares
+        
+        investment_dates.append({
+            'date': invest_date,
+            'price': invest_price,
+            'shares': shares
+        })
+    
+    with stage(profiler, 'metrics'):
+        final_value = total_shares * data['close'].iloc[-1]
+        total_profit = final_value - total_invested
+        profit_rate = (total_profit / total_invested) * 100 if total_invested > 0 else 0
+        
+        years = (data.index[-1] - data.index[0]).days / 365.25
+        annualized_return = ((final_value / total_invested) ** (1 / years) - 1) * 100 if years > 0 and total_invested > 0 else 0
+        xirr = xirr_from_records(investment_dates, data.index[-1], final_value, monthly_investment)
+    
+    return {
+        'total_invested': total_invested,
+        'final_value': final_value,
+        'total_profit': total_profit,
+        'profit_rate': profit_rate,
+        'annualized_return': annualized_return,
+        'xirr': xirr,
+        'investment_count': len(investment_dates),
+        'investment_dates': investment_dates
+    }
+
+
+class EnhancedSIPBacktest:
+    def __init__(self, data, monthly_investment=1000, profiler=None, cache=None, copy=True, month_index=None):
+        # copy=False 时直接使用传入的数据，例如 shared_prices 映射到共享内存中的只读数组；单只股票的 PricePanel 会先转为 DataFrame
+        if isinstance(data, PricePanel):
+            data, copy = data.to_frame(), False
+        self.data = data.copy() if copy else data
+        self.monthly_investment = monthly_investment
+        self.results = {}
+        # profiler 为 profiling.StageProfiler 时记录各阶段耗时和内存，为 None 时不做任何统计
+        self.profiler = profiler
+        # cache 为 result_cache.ResultCache 时，数据、策略和金额都相同的结果及图表直接从磁盘读取
+        self.cache = cache
+        self._data_key = None
+        # month_index 为调用方已经算好的 build_month_index(data.index)，例如 walk_forward 中由整段数据的月份边界切出的窗口
+        if month_index is None:
+            with stage(profiler, 'month_grouping'):
+                month_index = build_month_index(self.data.index)
+        self.month_starts, self.month_ends = month_index
+        self.prices = price_arrays(self.data)
+        
+    def _cache_key(self, *parts):
+        if self._data_key is None:
+            with stage(self.profiler, 'cache'):
+                self._data_key = data_fingerprint(self.data)
+        return cache_key(self._data_key, self.monthly_investment, *parts)
+    
+    def _cached_results(self, parts, compute):
+        # compute 返回 {策略名称: 结果}；命中缓存时跳过计算，结果同样写入 self.results
+        # parts 为空表示不使用缓存: 未设置缓存，或策略依赖无法按值哈希的对象(strategy_identity 为 None)
+        if self.cache is None or not parts:
+            return compute()
+        key = self._cache_key(*parts)
+        with stage(self.profiler, 'cache'):
+            results = self.cache.get(key)
+        if results is not None:
+            self.results.update(results)
+            return results
+        results = compute()
+        with stage(self.profiler, 'cache'):
+            self.cache.put(key, results)
+        return results
+    
+    def _identities(self, funcs):
+        # 任何一个策略无法按值哈希时返回 None
+        if self.cache is None:
+            return None
+        identities = [strategy_identity(x) for x in funcs]
+        return None if None in identities else identities
+    
+    def run_strategy(self, strategy_name, invest_func):
+        identities = self._identities([invest_func])
+        parts = ('run_strategy', strategy_name, identities[0]) if identities is not None else ()
+        return self._cached_results(parts, lambda: {
+            strategy_name: self._run_strategy(strategy_name, invest_func)})[strategy_name]
+    
+    def _run_strategy(self, strategy_name, invest_func):
+        investment_dates = []
+        func_stage = f"invest_func:{getattr(invest_func, '__name__', strategy_name)}"
+        
+        for start, end in zip(self.month_starts, self.month_ends):
+            with stage(self.profiler, 'month_grouping'):
+                month_data = self.data.iloc[start:end]
+            
+            with stage(self.profiler, func_stage):
+                invest_date, invest_price = invest_func(month_data)
+            
+            if invest_date is None or invest_price is None:
+                continue
+            
+            shares = self.monthly_investment / invest_price
+            
+            investment_dates.append({
+                'date': invest_date,
+                'price': invest_price,
+                'shares': shares
+            })
+        
+        with stage(self.profiler, 'metrics'):
+            self.results[strategy_name] = self.compute_metrics(investment_dates)
+        return self.results[strategy_name]
+    
+    def compute_metrics(self, investment_dates):
+        total_invested = 0
+        total_shares = 0
+        for record in investment_dates:
+            total_invested += self.monthly_investment
+            total_shares += record['shares']
+        
+        final_value = total_shares * self.data['close'].iloc[-1]
+        total_profit = final_value - total_invested
+        profit_rate = (total_profit / total_invested) * 100 if total_invested > 0 else 0
+        
+        years = (self.data.index[-1] - self.data.index[0]).days / 365.25
+        annualized_return = ((final_value / total_invested) ** (1 / years) - 1) * 100 if years > 0 and total_invested > 0 else 0
+        xirr = xirr_from_records(investment_dates, self.data.index[-1], final_value, self.monthly_investment)
+        
+        return {
+            'total_invested': total_invested,
+            'final_value': final_value,
+            'total_profit': total_profit,
+            'profit_rate': profit_rate,
+            'annualized_return': annualized_return,
+            'xirr': xirr,
+            'investment_count': len(investment_dates),
+            'investment_dates': investment_dates
+        }
+    
+    def run_vectorized(self, strategies=None):
+        # 向量化协议: strategies 为 {名称: 选行函数}，默认为 strategies.STRATEGY_REGISTRY 中注册的全部策略
+        # 所有策略先一起选出 月数 × 策略数 的买入行号，再一次性计算份额和指标，策略数增加几乎不增加耗时
+        strategies = STRATEGY_REGISTRY if strategies is None else strategies
+        identities = self._identities(strategies.values())
+        parts = ('run_vectorized', list(zip(strategies, identities))) if identities is not None else ()
+        return self._cached_results(parts, lambda: self._run_vectorized(strategies))
+    
+    def _run_vectorized(self, strategies):
+        with stage(self.profiler, 'select_rows'):
+            names, rows = select_rows(self.prices, (self.month_starts, self.month_ends), strategies)
+        with stage(self.profiler, 'metrics'):
+            summary = summarize_rows(self.data.index, self.prices['close'], rows, self.monthly_investment)
+            self._store_results(names, rows, summary)
+        return {name: self.results[name] for name in names}
+    
+    def run_smart_strategies(self, ma_window=60, topup_multiplier=2.0, band=0.1, va_growth=0.0, va_max_multiple=3.0,
+                             schedule=None):
+        # 金额随行情变化的定投: 价值平均、低于均线加倍、高于均线上轨暂停；买入日默认为每月第一个交易日
+        schedule = select_monthly_day_1 if schedule is None else schedule
+        identities = self._identities([schedule, value_averaging_amounts, ma_topup_amounts, pause_above_band_amounts])
+        parts = ('run_smart_strategies', ma_window, topup_multiplier, band, va_growth, va_max_multiple,
+                 identities) if identities is not None else ()
+        return self._cached_results(parts, lambda: self._run_smart_strategies(
+            ma_window, topup_multiplier, band, va_growth, va_max_multiple, schedule))
+    
+    def _run_smart_strategies(self, ma_window, topup_multiplier, band, va_growth, va_max_multiple, schedule):
+        with stage(self.profiler, 'select_rows'):
+            rows = schedule(self.prices, self.month_starts, self.month_ends)
+            rows = rows[rows >= 0]
+        with stage(self.profiler, 'smart_kernels'):
+            close = self.prices['close']
+            prices = close[rows]
+            ma = moving_average(close, ma_window)[rows]
+            amounts = {
+                "价值平均定投": value_averaging_amounts(prices, self.monthly_investment, growth=va_growth,
+                                                   max_multiple=va_max_multiple),
+                f"低于{ma_window}日均线加倍定投": ma_topup_amounts(prices, ma, self.monthly_investment,
+                                                            multiplier=topup_multiplier),
+                f"高于{ma_window}日均线{band * 100:g}%暂停定投": pause_above_band_amounts(prices, ma, self.monthly_investment,
+                                                                                  band=band),
+            }
+        with stage(self.profiler, 'metrics'):
+            names = list(amounts.keys())
+            rows = np.repeat(rows[:, None], len(names), axis=1)
+            summary = summarize_rows(self.data.index, close, rows, amounts=np.stack(list(amounts.values()), axis=1))
+            self._store_results(names, rows, summary)
+        return {name: self.results[name] for name in names}
+    
+    def _store_results(self, names, rows, summary):
+        for j, name in enumerate(names):
+            invested = np.flatnonzero(summary['invested'][:, j])
+            dates = self.data.index[rows[invested, j]]
+            investment_dates = [
+                {'date': date, 'price': price, 'shares': shares, 'amount': amount}
+                for date, price, shares, amount in zip(dates, summary['prices'][invested, j],
+                                                       summary['shares'][invested, j], summary['amounts'][invested, j])
+            ]
+            self.results[name] = {
+                'total_invested': summary['total_invested'][j],
+                'final_value': summary['final_value'][j],
+                'total_profit': summary['total_profit'][j],
+                'profit_rate': summary['profit_rate'][j],
+                'annualized_return': summary['annualized_return'][j],
+                'xirr': summary['xirr'][j],
+                'investment_count': len(investment_dates),
+                'investment_dates': investment_dates
+            }
+    
+    def strategy_monthly_day_1(self, month_data):
+        invest_idx = 0
+        if invest_idx >= len(month_data):
+            return None, None
+        return month_data.index[invest_idx], month_data['close'].iloc[invest_idx]
+    
+    def strategy_monthly_day_15(self, month_data):
+        invest_idx = min(14, len(month_data) - 1)
+        if invest_idx < 0:
+            return None, None
+        return month_data.index[invest_idx], month_data['close'].iloc[invest_idx]
+    
+    def strategy_monthly_last_day(self, month_data):
+        if len(month_data) == 0:
+            return None, None
+        return month_data.index[-1], month_data['close'].iloc[-1]
+    
+    def strategy_monthly_lowest(self, month_data):
+        if len(month_data) == 0:
+            return None, None
+        lowest_idx = month_data['low'].idxmin()
+        return lowest_idx, month_data.loc[lowest_idx, 'close']
+    
+    def strategy_monthly_highest(self, month_data):
+        if len(month_data) == 0:
+            return None, None
+        highest_idx = month_data['high'].idxmax()
+        return highest_idx, month_data.loc[highest_idx, 'close']
+    
+    def run_all_strategies(self, verbose=True, smart=False):
+        if verbose:
+            print("\n" + "=" * 80)
+            print("开始运行所有策略...")
+            print("=" * 80)
+        
+        self.run_vectorized()
+        if smart:
+            self.run_smart_strategies()
+        
+        return self.results
+    
+    def print_comparison(self):
+        print("\n" + "=" * 80)
+        print("策略对比结果")
+        print("=" * 80)
+        print(f"{'策略名称':<25} {'定投次数':<10} {'总投入(元)':<12} {'期末资产(元)':<15} {'总收益(元)':<12} {'收益率(%)':<12} {'年化(%)':<10} {'XIRR(%)':<10}")
+        print("-" * 100)
+        
+        sorted_strategies = sorted(self.results.items(), 
+                                   key=lambda x: x[1]['profit_rate'], 
+                                   reverse=True)
+        
+        for name, result in sorted_strategies:
+            print(f"{name:<25} "
+                  f"{result['investment_count']:<10} "
+                  f"{result['total_invested']:<12.2f} "
+                  f"{result['final_value']:<15.2f} "
+                  f"{result['total_profit']:<12.2f} "
+                  f"{result['profit_rate']:<12.2f} "
+                  f"{result['annualized_return']:<10.2f} "
+                  f"{result['xirr']:<10.2f}")
+        
+        print("\n" + "=" * 80)
+        best_strategy = sorted_strategies[0]
+        worst_strategy = sorted_strategies[-1]
+        print(f"最优策略: {best_strategy[0]} (收益率: {best_strategy[1]['profit_rate']:.2f}%)")
+        print(f"最差策略: {worst_strategy[0]} (收益率: {worst_strategy[1]['profit_rate']:.2f}%)")
+        print(f"策略差异: {best_strategy[1]['profit_rate'] - worst_strategy[1]['profit_rate']:.2f}%")
+        
+        one_time_shares = (best_strategy[1]['total_invested']) / self.data['close'].iloc[0]
+        one_time_value = one_time_shares * self.data['close'].iloc[-1]
+        one_time_profit = one_time_value - best_strategy[1]['total_invested']
+        one_time_profit_rate = (one_time_profit / best_strategy[1]['total_invested']) * 100
+        
+        print(f"\n一次性买入对比: {one_time_profit:.2f} 元 ({one_time_profit_rate:.2f}%)")
+        print("=" * 80)
+    
+    def plot_comparison(self, output_file='multi_strategy_comparison.png', title='青农商行(002958)', show=True,
+                        max_points=None, dpi=300, verbose=True, crosshair=False):
+        # 画图依赖只在真正画图时导入
+        # 只保存图片(不显示、无交互)时图表可以缓存，键包含全部策略的买入记录和绘图参数
+        figure_key = None
+        suffix = os.path.splitext(output_file)[1] or '.png'
+        if self.cache is not None and not show and not crosshair:
+            figure_key = self._cache_key('plot_comparison', results_fingerprint(self.results), title, max_points,
+                                         dpi, suffix)
+            with stage(self.profiler, 'cache'):
+                cached = self.cache.get_file(figure_key, output_file, suffix)
+            if cached:
+                if verbose:
+                    print(f"\n多策略对比图表已保存为: {output_file} (缓存)")
+                return None
+        
+        from sip_plots import close_figure, plot_strategy_comparison, show_figures
+        
+        with stage(self.profiler, 'plotting'):
+            fig = plot_strategy_comparison(self.data, self.results, output_file, title=title, max_points=max_points,
+                                           dpi=dpi, crosshair=crosshair)
+        if figure_key is not None:
+            with stage(self.profiler, 'cache'):
+                self.cache.put_file(figure_key, output_file, suffix)
+        if verbose:
+            print(f"\n多策略对比图表已保存为: {output_file}")
+        if show:
+            show_figures()
+        else:
+            close_figure(fig)
@@ -0,0 +1,245 @@
+import numpy as np
+import pandas as pd
+
+from xirr import batch_xirr
+
+
+def build_month_index(index):
+    # 按自然月切分行区间: 第 i 个月对应 data.iloc[starts[i]:ends[i]]，要求索引已按日期升序排列
+    index = pd.DatetimeIndex(index)
+    if len(index) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+
+    month_codes = index.year.to_numpy() * 12 + index.month.to_numpy()
+    starts = np.flatnonzero(np.r_[True, month_codes[1:] != month_codes[:-1]])
+    ends = np.r_[starts[1:], len(index)]
+    return starts, ends
+
+
+def _annualize(final_value, total_invested, years):
+    # 与各回测函数一致的年化口径: (期末资产/总投入)^(1/年数) - 1，年数为 0 时记为 0
+    final_value, total_invested, years = np.broadcast_arrays(
+        np.asarray(final_value, dtype=float), np.asarray(total_invested, dtype=float), np.asarray(years, dtype=float))
+    valid = (years > 0) & (total_invested > 0)
+    ratio = np.divide(final_value, total_invested, out=np.ones(final_value.shape), where=valid)
+    exponent = np.divide(1.0, years, out=np.zeros(years.shape), where=valid)
+    return np.where(valid, (ratio ** exponent - 1) * 100, 0.0)
+
+
+def build_equity_curves(index, close, results):
+    # 一次性生成所有策略的逐日曲线，每个矩阵均为 交易日 × 策略
+    index = pd.DatetimeIndex(index)
+    close = np.asarray(close, dtype=float)
+    names = list(results.keys())
+    n_days = len(index)
+
+    shares_bought = np.zeros((n_days, len(names)))
+    cash_in = np.zeros((n_days, len(names)))
+    for j, name in enumerate(names):
+        records = results[name]['investment_dates']
+        if len(records) == 0:
+            continue
+        positions = index.get_indexer(pd.DatetimeIndex([x['date'] for x in records]))
+        shares = np.array([x['shares'] for x in records], dtype=float)
+        amounts = np.array([x.get('amount', x['shares'] * x['price']) for x in records], dtype=float)
+        found = positions >= 0
+        np.add.at(shares_bought[:, j], positions[found], shares[found])
+        np.add.at(cash_in[:, j], positions[found], amounts[found])
+
+    shares = np.cumsum(shares_bought, axis=0)
+    invested = np.cumsum(cash_in, axis=0)
+    value = shares * close[:, None]
+    profit = value - invested
+
+    annualized_return = np.zeros_like(value)
+    if n_days > 0:
+        years = ((index - index[0]).days.to_numpy() / 365.25)[:, None]
+        valid = (years > 0) & (invested > 0) & (value > 0)
+        ratio = np.divide(value, invested, out=np.ones_like(value), where=valid)
+        exponent = np.divide(1.0, years, out=np.zeros_like(years), where=years > 0)
+        annualized_return = np.where(valid, (ratio ** exponent - 1) * 100, 0.0)
+
+    return {
+        'names': names,
+        'dates': index,
+        'shares': shares,
+        'invested': invested,
+        'value': value,
+        'profit': profit,
+        'annualized_return': annualized_return
+    }
+
+
+def summarize_rows(index, close, rows, monthly_investment=1000, amounts=None):
+    # rows 为 月数 × 策略数 的买入行号矩阵(-1 表示该月不投)，一次算出所有策略的汇总指标，口径与 run_strategy 一致
+    # amounts 为同形状的每次投入金额(负数为卖出，0 视为不投)，默认每次投入 monthly_investment
+    index = pd.DatetimeIndex(index)
+    close = np.asarray(close, dtype=float)
+    rows = np.asarray(rows, dtype=np.int64)
+    if amounts is None:
+        amounts = np.full(rows.shape, float(monthly_investment))
+    invested = (rows >= 0) & (amounts != 0)
+    # close 为二维 (交易日, 路径) 时 rows 的每一列对应一条路径
+    safe_rows = np.where(invested, rows, 0)
+    prices = close[safe_rows] if close.ndim == 1 else np.take_along_axis(close, safe_rows, axis=0)
+    amounts = np.where(invested, amounts, 0.0)
+    shares = np.where(invested, amounts / np.where(invested, prices, 1.0), 0.0)
+
+    investment_count = invested.sum(axis=0)
+    total_invested = amounts.sum(axis=0)
+    final_value = shares.sum(axis=0) * close[-1] if len(close) > 0 else np.zeros(rows.shape[1:])
+    total_profit = final_value - total_invested
+    profit_rate = np.divide(total_profit, total_invested, out=np.zeros(total_profit.shape),
+                            where=total_invested > 0) * 100
+    years = (index[-1] - index[0]).days / 365.25 if len(index) > 0 else 0.0
+    if len(index) > 0:
+        day_numbers = (index - index[0]).days.to_numpy()
+        xirr = batch_xirr(day_numbers[safe_rows], amounts, day_numbers[-1], final_value)
+    else:
+        xirr = np.full(rows.shape[1:], np.nan)
+
+    return {
+        'invested': invested,
+        'prices': prices,
+        'amounts': amounts,
+        'shares': shares,
+        'investment_count': investment_count,
+        'total_invested': total_invested,
+        'final_value': final_value,
+        'total_profit': total_profit,
+        'profit_rate': profit_rate,
+        'annualized_return': _annualize(final_value, total_invested, years),
+        'xirr': xirr
+    }
+
+
+def sweep_sip_with_open(data, invest_days=range(1, 32), price_fields=('open', 'close', 'low', 'high'),
+                        amounts=(1000,), month_index=None):
+    # 一次性计算 定投日 × 价格字段 × 每月金额 的全部组合；定投日当天不开盘则顺延，顺延到月末仍没有则取当月最后一个交易日
+    if month_index is None:
+        month_index = build_month_index(data.index)
+    month_starts, month_ends = month_index
+    invest_days = np.asarray(list(invest_days), dtype=np.int64)
+    price_fields = list(price_fields)
+    amounts = np.asarray(list(amounts), dtype=float)
+    n_months = len(month_starts)
+
+    shape = (len(invest_days), len(price_fields), len(amounts))
+    if n_months == 0:
+        zeros = np.zeros(shape)
+        return {
+            'invest_days': invest_days,
+            'price_fields': price_fields,
+            'amounts': amounts,
+            'total_invested': zeros,
+            'final_value': zeros,
+            'total_profit': zeros,
+            'profit_rate': zeros,
+            'annualized_return': zeros,
+            'investment_count': 0
+        }
+
+    # 每个月中日期小于定投日的交易日个数，即为该月定投日在月内的偏移
+    day_of_month = data.index.day.to_numpy()
+    before_day = day_of_month[:, None] < invest_days[None, :]
+    offsets = np.add.reduceat(before_day, month_starts, axis=0, dtype=np.int64)
+    invest_rows = np.minimum(month_starts[:, None] + offsets, month_ends[:, None] - 1)
+
+    prices = np.stack([data[field].to_numpy(dtype=float) for field in price_fields])
+    shares_per_yuan = (1.0 / prices[:, invest_rows]).sum(axis=1).T
+
+    total_shares = shares_per_yuan[:, :, None] * amounts[None, None, :]
+    total_invested = np.broadcast_to(amounts * n_months, shape).copy()
+    final_value = total_shares * data['close'].iloc[-1]
+    total_profit = final_value - total_invested
+    profit_rate = np.divide(total_profit, total_invested, out=np.zeros(shape), where=total_invested > 0) * 100
+
+    years = (data.index[-1] - data.index[0]).days / 365.25
+    annualized_return = _annualize(final_value, total_invested, years)
+
+    return {
+        'invest_days': invest_days,
+        'price_fields': price_fields,
+        'amounts': amounts,
+        'total_invested': total_invested,
+        'final_value': final_value,
+        'total_profit': total_profit,
+        'profit_rate': profit_rate,
+        'annualized_return': annualized_return,
+        'investment_count': n_months
+    }
+
+
+def calendar_day_rows(data, invest_day, month_index=None):
+    # 每月 invest_day 日(或之后第一个交易日)所在的行号；该日之后没有交易日则取当月最后一个交易日
+    if month_index is None:
+        month_index = build_month_index(data.index)
+    month_starts, month_ends = month_index
+    before_day = data.index.day.to_numpy() < invest_day
+    if len(month_starts) == 0:
+        return np.zeros(0, dtype=np.int64)
+    offsets = np.add.reduceat(before_day, month_starts, dtype=np.int64)
+    return np.minimum(month_starts + offsets, month_ends - 1)
+
+
+def rolling_start_analysis(data, invest_rows, price_field='close', monthly_investment=1000,
+                           month_index=None, windows=False):
+    # 对每一个可能的起始月份(以及可选的每一个 起始月 × 结束月 窗口)计算定投结果
+    # 用每月买入份额的前缀和代替逐个起点重跑回测，整体为 O(月数)，窗口矩阵为 O(月数²) 的纯数组运算
+    if month_index is None:
+        month_index = build_month_index(data.index)
+    month_starts, month_ends = month_index
+    invest_rows = np.asarray(invest_rows, dtype=np.int64)
+    n_months = len(invest_rows)
+
+    close = data['close'].to_numpy(dtype=float)
+    invest_prices = data[price_field].to_numpy(dtype=float)[invest_rows]
+    monthly_shares = monthly_investment / invest_prices
+    share_prefix = np.r_[0.0, np.cumsum(monthly_shares)]
+    day_numbers = (data.index - data.index[0]).days.to_numpy()
+
+    # 起始月份 s 一直定投到数据末尾
+    total_shares = share_prefix[-1] - share_prefix[:-1]
+    total_invested = monthly_investment * (n_months - np.arange(n_months, dtype=float))
+    final_value = total_shares * close[-1]
+    total_profit = final_value - total_invested
+    profit_rate = total_profit / total_invested * 100
+    years = (day_numbers[-1] - day_numbers[month_starts[:n_months]]) / 365.25
+    annualized_return = _annualize(final_value, total_invested, years)
+    # 起始月份 s 的现金流为第 s 个月及之后的每月投入，所有起点组成 月数 × 起点数 的矩阵一次求解
+    started = np.arange(n_months)[:, None] >= np.arange(n_months)[None, :]
+    xirr = batch_xirr(day_numbers[invest_rows][:, None], np.where(started, float(monthly_investment), 0.0),
+                      day_numbers[-1], final_value)
+
+    result = {
+        'start_dates': data.index[month_starts[:n_months]],
+        'total_invested': total_invested,
+        'final_value': final_value,
+        'total_profit': total_profit,
+        'profit_rate': profit_rate,
+        'annualized_return': annualized_return,
+        'xirr': xirr
+    }
+
+    if windows:
+        # 矩阵下标 [s, e]: 从第 s 个月开始定投，到第 e 个月最后一个交易日结束；s > e 的位置为 NaN
+        start = np.arange(n_months)[:, None]
+        end = np.arange(n_months)[None, :]
+        valid = end >= start
+        window_shares = share_prefix[1:][None, :] - share_prefix[:-1][:, None]
+        window_invested = monthly_investment * np.maximum(end - start + 1, 0).astype(float)
+        window_value = window_shares * close[month_ends[:n_months] - 1][None, :]
+        window_years = (day_numbers[month_ends[:n_months] - 1][None, :]
+                        - day_numbers[month_starts[:n_months]][:, None]) / 365.25
+        window_profit_rate = np.divide(window_value - window_invested, window_invested,
+                                       out=np.zeros(window_value.shape), where=valid) * 100
+        window_annualized = _annualize(window_value, window_invested, window_years)
+        result['window_final_value'] = np.where(valid, window_value, np.nan)
+        result['window_total_invested'] = np.where(valid, window_invested, np.nan)
+        result['window_profit_rate'] = np.where(valid, window_profit_rate, np.nan)
+        result['window_annualized_return'] = np.where(valid, window_annualized, np.nan)
+        result['end_dates'] = data.index[month_ends[:n_months] - 1]
+
+    return result
+
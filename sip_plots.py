@@ -0,0 +1,256 @@
+import platform
+
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib import font_manager
+
+from chart_utils import BlittedCrosshair, HoverIndex, decimate_series, make_format_coord
+from sip_engine import build_equity_curves
+
+
+def use_headless_backend():
+    plt.switch_backend('Agg')
+
+
+def chinese_font_name():
+    system_name = platform.system()
+    if system_name == 'Windows':
+        return 'SimHei'
+    elif system_name == 'Darwin':
+        return 'Arial Unicode MS'
+    return 'WenQuanYi Micro Hei'
+
+
+def setup_chinese_font(verbose=False):
+    system_name = platform.system()
+    if system_name == 'Windows':
+        font_names = ['SimHei', 'Microsoft YaHei', 'SimSun', 'FangSong', 'KaiTi']
+        found = False
+        for font_name in font_names:
+            try:
+                font_manager.FontProperties(family=font_name)
+                plt.rcParams['font.sans-serif'] = [font_name]
+                plt.rcParams['axes.unicode_minus'] = False
+                if verbose:
+                    print(f"使用字体: {font_name}")
+                found = True
+                break
+            except Exception:
+                continue
+        if not found and verbose:
+            print("未找到中文字体，使用默认字体")
+    elif system_name == 'Darwin':
+        plt.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'PingFang SC']
+        plt.rcParams['axes.unicode_minus'] = False
+    else:
+        plt.rcParams['font.sans-serif'] = ['WenQuanYi Micro Hei', 'SimHei']
+        plt.rcParams['axes.unicode_minus'] = False
+
+
+def show_figures():
+    plt.show()
+
+
+def close_figure(fig):
+    plt.close(fig)
+
+
+def plot_strategy_comparison(data, results, output_file, title='青农商行(002958)', max_points=None, dpi=300,
+                             crosshair=False):
+    fig, axes = plt.subplots(2, 2, figsize=(16, 12))
+
+    strategy_names = list(results.keys())
+    profit_rates = [results[name]['profit_rate'] for name in strategy_names]
+    colors = ['green' if x >= 0 else 'red' for x in profit_rates]
+
+    bars = axes[0, 0].barh(strategy_names, profit_rates, color=colors, alpha=0.7)
+    axes[0, 0].set_xlabel('收益率 (%)', fontsize=12)
+    axes[0, 0].set_title('各策略收益率对比', fontsize=14, fontweight='bold')
+    axes[0, 0].axvline(x=0, color='black', linestyle='-', linewidth=0.8)
+    axes[0, 0].grid(True, alpha=0.3, axis='x')
+
+    for i, bar in enumerate(bars):
+        width = bar.get_width()
+        axes[0, 0].text(width + (0.5 if width >= 0 else -3),
+                        bar.get_y() + bar.get_height()/2,
+                        f'{profit_rates[i]:.2f}%',
+                        va='center', fontsize=10)
+
+    annualized_returns = [results[name]['annualized_return'] for name in strategy_names]
+    colors = ['green' if x >= 0 else 'red' for x in annualized_returns]
+
+    bars2 = axes[0, 1].barh(strategy_names, annualized_returns, color=colors, alpha=0.7)
+    axes[0, 1].set_xlabel('年化收益率 (%)', fontsize=12)
+    axes[0, 1].set_title('各策略年化收益率对比', fontsize=14, fontweight='bold')
+    axes[0, 1].axvline(x=0, color='black', linestyle='-', linewidth=0.8)
+    axes[0, 1].grid(True, alpha=0.3, axis='x')
+
+    for i, bar in enumerate(bars2):
+        width = bar.get_width()
+        axes[0, 1].text(width + (0.1 if width >= 0 else -0.5),
+                        bar.get_y() + bar.get_height()/2,
+                        f'{annualized_returns[i]:.2f}%',
+                        va='center', fontsize=10)
+
+    axes[1, 0].plot(*decimate_series(data.index, data['close'], max_points), label='收盘价', linewidth=1.5, color='blue')
+    axes[1, 0].set_title(f'{title} 价格走势', fontsize=14, fontweight='bold')
+    axes[1, 0].set_ylabel('价格 (元)', fontsize=12)
+    axes[1, 0].legend(fontsize=10)
+    axes[1, 0].grid(True, alpha=0.3)
+
+    for name, result in results.items():
+        if len(result['investment_dates']) > 0:
+            dates = [x['date'] for x in result['investment_dates']]
+            prices = [x['price'] for x in result['investment_dates']]
+            if name == "每月最低点定投(理想)":
+                axes[1, 0].scatter(dates, prices, color='green', s=30, alpha=0.6, label=name)
+            elif name == "每月最高点定投(最差)":
+                axes[1, 0].scatter(dates, prices, color='red', s=30, alpha=0.6, label=name)
+
+    axes[1, 0].legend(fontsize=9, loc='best')
+
+    if results:
+        total_invested_ref = results['每月1日定投']['total_invested'] if '每月1日定投' in results else list(results.values())[0]['total_invested']
+        curves = build_equity_curves(data.index, data['close'], results)
+        for j, name in enumerate(curves['names']):
+            plot_dates, portfolio_values = decimate_series(data.index, curves['value'][:, j], max_points)
+
+            if name == "每月最低点定投(理想)":
+                axes[1, 1].plot(plot_dates, portfolio_values, label=name, linewidth=2, color='green')
+            elif name == "每月最高点定投(最差)":
+                axes[1, 1].plot(plot_dates, portfolio_values, label=name, linewidth=2, color='red')
+            else:
+                axes[1, 1].plot(plot_dates, portfolio_values, label=name, linewidth=1.5, alpha=0.7)
+
+        axes[1, 1].axhline(y=total_invested_ref, color='orange', linestyle='--', linewidth=2, label='累计投入')
+        axes[1, 1].set_title('各策略资产净值走势对比', fontsize=14, fontweight='bold')
+        axes[1, 1].set_xlabel('日期', fontsize=12)
+        axes[1, 1].set_ylabel('资产市值 (元)', fontsize=12)
+        axes[1, 1].legend(fontsize=9, loc='best')
+        axes[1, 1].grid(True, alpha=0.3)
+
+    hover = HoverIndex(data.index, close=data['close'])
+
+    def format_hover(pos, y=None):
+        text = f"date={hover.date_str(pos)}, 收盘价={hover['close'][pos]:.2f}元"
+        if y is None:
+            return text
+        return f'{text}, y={y:.2f}'
+
+    format_coord = make_format_coord(hover, format_hover)
+    axes[1, 0].format_coord = format_coord
+    axes[1, 1].format_coord = format_coord
+    if crosshair:
+        # 回调以弱引用保存，需挂在 fig 上防止被回收
+        fig.crosshair = BlittedCrosshair(fig, [axes[1, 0], axes[1, 1]], hover, format_hover)
+
+    plt.tight_layout()
+    plt.savefig(output_file, dpi=dpi, bbox_inches='tight')
+    return fig
+
+
+def plot_sip_result(df, result, output_file, title='青农商行(002958)', max_points=None, dpi=300, crosshair=False):
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(14, 10))
+
+    ax1.plot(*decimate_series(df.index, df['close'], max_points), label='收盘价', linewidth=1.5, color='blue')
+    if len(result['investment_dates']) > 0:
+        dates = [x['date'] for x in result['investment_dates']]
+        prices = [x['price'] for x in result['investment_dates']]
+        ax1.scatter(dates, prices, color='red', s=50, zorder=5, label='定投日')
+    ax1.set_title(f'{title} 价格走势与定投点', fontsize=14, fontweight='bold')
+    ax1.set_ylabel('价格 (元)', fontsize=12)
+    ax1.legend(fontsize=10)
+    ax1.grid(True, alpha=0.3)
+
+    curves = build_equity_curves(df.index, df['close'], {'定投': result})
+    portfolio_values = curves['value'][:, 0]
+    total_invested_list = curves['invested'][:, 0]
+    profit_list = curves['profit'][:, 0]
+    annualized_return_list = curves['annualized_return'][:, 0]
+
+    ax2.plot(*decimate_series(df.index, portfolio_values, max_points), label='资产市值', linewidth=2, color='green')
+    ax2.plot(*decimate_series(df.index, total_invested_list, max_points), label='累计投入', linewidth=2, color='orange', linestyle='--')
+    ax2.set_title('定投资产净值变化', fontsize=14, fontweight='bold')
+    ax2.set_xlabel('日期', fontsize=12)
+    ax2.set_ylabel('金额 (元)', fontsize=12)
+    ax2.legend(fontsize=10)
+    ax2.grid(True, alpha=0.3)
+
+    hover = HoverIndex(df.index, close=df['close'], profit=profit_list, annualized_return=annualized_return_list)
+
+    def format_hover(pos, y=None):
+        price = hover['close'][pos]
+        profit = hover['profit'][pos]
+        annualized_return = hover['annualized_return'][pos]
+        profit_color = '+' if profit >= 0 else ''
+        annualized_color = '+' if annualized_return >= 0 else ''
+        text = f'日期: {hover.date_str(pos)} | 收盘价: {price:.2f}元 | 盈亏: {profit_color}{profit:.2f}元 | 年化: {annualized_color}{annualized_return:.2f}%'
+        if y is None:
+            return text
+        return f'{text} | 当前y轴: {y:.2f}'
+
+    format_coord = make_format_coord(hover, format_hover)
+    ax1.format_coord = format_coord
+    ax2.format_coord = format_coord
+    if crosshair:
+        fig.crosshair = BlittedCrosshair(fig, [ax1, ax2], hover, format_hover)
+
+    plt.tight_layout()
+    plt.savefig(output_file, dpi=dpi, bbox_inches='tight')
+    return fig
+
+
+def plot_sweep_heatmap(sweep, output_file, dpi=300):
+    fig, axes = plt.subplots(1, len(sweep['amounts']), figsize=(6 * len(sweep['amounts']), 12), squeeze=False)
+    for k, amount in enumerate(sweep['amounts']):
+        ax = axes[0, k]
+        profit_rates = sweep['profit_rate'][:, :, k]
+        im = ax.imshow(profit_rates, aspect='auto', cmap='RdYlGn')
+        ax.set_xticks(range(len(sweep['price_fields'])))
+        ax.set_xticklabels(sweep['price_fields'])
+        ax.set_yticks(range(len(sweep['invest_days'])))
+        ax.set_yticklabels(sweep['invest_days'])
+        ax.set_xlabel('价格字段', fontsize=12)
+        ax.set_ylabel('定投日', fontsize=12)
+        ax.set_title(f'每月定投 {amount:.0f} 元 收益率(%)', fontsize=14, fontweight='bold')
+        for i in range(profit_rates.shape[0]):
+            for j in range(profit_rates.shape[1]):
+                ax.text(j, i, f'{profit_rates[i, j]:.1f}', ha='center', va='center', fontsize=7)
+        fig.colorbar(im, ax=ax)
+
+    plt.tight_layout()
+    plt.savefig(output_file, dpi=dpi, bbox_inches='tight')
+    return fig
+
+
+def plot_all_starts(rolling, output_file, dpi=300):
+    windows = 'window_annualized_return' in rolling
+    profit_rates = rolling['profit_rate']
+
+    fig, axes = plt.subplots(2 if windows else 1, 1, figsize=(14, 14 if windows else 7), squeeze=False)
+    ax = axes[0, 0]
+    ax.bar(rolling['start_dates'], profit_rates, width=20,
+           color=['green' if x >= 0 else 'red' for x in profit_rates], alpha=0.7)
+    ax.axhline(y=0, color='black', linewidth=0.8)
+    ax.set_title('不同起始月份定投至今的收益率', fontsize=14, fontweight='bold')
+    ax.set_xlabel('起始月份', fontsize=12)
+    ax.set_ylabel('收益率 (%)', fontsize=12)
+    ax.grid(True, alpha=0.3)
+
+    if windows:
+        ax = axes[1, 0]
+        im = ax.imshow(rolling['window_annualized_return'], aspect='auto', cmap='RdYlGn', origin='lower')
+        tick_step = max(1, len(profit_rates) // 12)
+        ticks = np.arange(0, len(profit_rates), tick_step)
+        ax.set_xticks(ticks)
+        ax.set_xticklabels([rolling['end_dates'][i].strftime('%Y-%m') for i in ticks], rotation=45)
+        ax.set_yticks(ticks)
+        ax.set_yticklabels([rolling['start_dates'][i].strftime('%Y-%m') for i in ticks])
+        ax.set_xlabel('结束月份', fontsize=12)
+        ax.set_ylabel('起始月份', fontsize=12)
+        ax.set_title('(起始月, 结束月) 窗口年化收益率(%)', fontsize=14, fontweight='bold')
+        fig.colorbar(im, ax=ax)
+
+    plt.tight_layout()
+    plt.savefig(output_file, dpi=dpi, bbox_inches='tight')
+    return fig
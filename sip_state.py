@@ -0,0 +1,300 @@
+import json
+import os
+
+import pandas as pd
+
+from data_loader import load_price_data, read_csv_tail
+from result_cache import data_fingerprint
+from xirr import xirr_from_records
+from universe_backtest import find_symbol_files
+
+# (策略名称, 类型, 参数)，与 EnhancedSIPBacktest 的五种策略及 backtest_sip_with_open 的口径一致
+# day: 每月第 N 个交易日收盘价(不足 N 个交易日取当月最后一个，-1 表示最后一个)；lowest/highest: 当月最低价/最高价那天的收盘价
+# open_day: 每月 N 日或之后第一个交易日的开盘价，当月没有则取最后一个交易日
+STREAMING_STRATEGIES = [
+    ("每月1日定投", 'day', 1),
+    ("每月15日定投", 'day', 15),
+    ("每月最后1日定投", 'day', -1),
+    ("每月最低点定投(理想)", 'lowest', None),
+    ("每月最高点定投(最差)", 'highest', None),
+]
+
+STATE_VERSION = 2
+# 状态文件记录最后 ANCHOR_ROWS 根已处理K线的指纹；这些K线被改写(例如增量刷新时前复权历史因分红整体重算)时状态作废，从头重建
+ANCHOR_ROWS = 5
+
+
+class SIPState:
+    # 逐根K线更新的定投状态: 每次 update 只做常数次运算，不回看历史；可序列化后在下次运行时继续
+    # 当月买入点在能够确定时立即成交；最后一日、最低/最高点这类要到月末才能确定的，在下个月第一根K线到来时按当月候选成交
+    def __init__(self, name, kind, param=None, monthly_investment=1000):
+        if kind not in ('day', 'lowest', 'highest', 'open_day'):
+            raise ValueError(f"未知的策略类型: {kind}")
+        self.name = name
+        self.kind = kind
+        self.param = param
+        self.monthly_investment = monthly_investment
+
+        self.total_shares = 0.0
+        self.total_invested = 0.0
+        self.investment_count = 0
+        self.last_investment = None
+        # 每笔买入的日期，用于计算 XIRR；每月一笔，数量随年数线性增长
+        self.investment_dates = []
+
+        self.first_date = None
+        self.last_date = None
+        self.last_close = None
+
+        self.month = None
+        self.bars_in_month = 0
+        self.candidate = None
+        self.month_done = False
+
+    def update(self, date, open_price, high, low, close):
+        date = pd.Timestamp(date)
+        if self.last_date is not None and date <= self.last_date:
+            return False
+
+        month = date.year * 12 + date.month
+        if month != self.month:
+            self._commit_candidate()
+            self.month = month
+            self.bars_in_month = 0
+            self.candidate = None
+            self.month_done = False
+        self.bars_in_month += 1
+
+        if not self.month_done:
+            self._consider(date, open_price, high, low, close)
+
+        if self.first_date is None:
+            self.first_date = date
+        self.last_date = date
+        self.last_close = float(close)
+        return True
+
+    def _consider(self, date, open_price, high, low, close):
+        if self.kind == 'day':
+            self.candidate = {'date': date, 'price': float(close)}
+            if self.param > 0 and self.bars_in_month >= self.param:
+                self._commit_candidate()
+        elif self.kind == 'open_day':
+            self.candidate = {'date': date, 'price': float(open_price)}
+            if date.day >= self.param:
+                self._commit_candidate()
+        elif self.kind == 'lowest':
+            # 严格小于才替换，与 idxmin 取第一次出现的最低点一致；NaN 不会成为候选
+            if low == low and (self.candidate is None or low < self.candidate['key']):
+                self.candidate = {'date': date, 'price': float(close), 'key': float(low)}
+        else:
+            if high == high and (self.candidate is None or high > self.candidate['key']):
+                self.candidate = {'date': date, 'price': float(close), 'key': float(high)}
+
+    def _commit_candidate(self):
+        if self.month_done or self.candidate is None:
+            return
+        shares = self.monthly_investment / self.candidate['price']
+        self.total_shares += shares
+        self.total_invested += self.monthly_investment
+        self.investment_count += 1
+        self.last_investment = {'date': self.candidate['date'], 'price': self.candidate['price'], 'shares': shares}
+        self.investment_dates.append(self.candidate['date'])
+        self.candidate = None
+        self.month_done = True
+
+    def result(self):
+        # 把当月尚未成交的候选按"数据到此为止"计入，与对同一段数据整体回测的结果一致
+        total_shares = self.total_shares
+        total_invested = self.total_invested
+        investment_count = self.investment_count
+        investment_dates = list(self.investment_dates)
+        if not self.month_done and self.candidate is not None:
+            total_shares += self.monthly_investment / self.candidate['price']
+            total_invested += self.monthly_investment
+            investment_count += 1
+            investment_dates.append(self.candidate['date'])
+
+        final_value = total_shares * self.last_close if self.last_close is not None else 0.0
+        total_profit = final_value - total_invested
+        profit_rate = (total_profit / total_invested) * 100 if total_invested > 0 else 0
+        years = (self.last_date - self.first_date).days / 365.25 if self.first_date is not None else 0
+        annualized_return = ((final_value / total_invested) ** (1 / years) - 1) * 100 if years > 0 and total_invested > 0 else 0
+        xirr = xirr_from_records([{'date': x} for x in investment_dates], self.last_date, final_value,
+                                 self.monthly_investment)
+
+        return {
+            'total_invested': total_invested,
+            'final_value': final_value,
+            'total_profit': total_profit,
+            'profit_rate': profit_rate,
+            'annualized_return': annualized_return,
+            'xirr': xirr,
+            'investment_count': investment_count,
+            'total_shares': total_shares,
+            'last_date': self.last_date
+        }
+
+    def to_dict(self):
+        def encode(record):
+            if record is None:
+                return None
+            return {**record, 'date': record['date'].isoformat()}
+
+        return {
+            'version': STATE_VERSION,
+            'name': self.name,
+            'kind': self.kind,
+            'param': self.param,
+            'monthly_investment': self.monthly_investment,
+            'total_shares': self.total_shares,
+            'total_invested': self.total_invested,
+            'investment_count': self.investment_count,
+            'last_investment': encode(self.last_investment),
+            'investment_dates': [x.strftime('%Y-%m-%d') for x in self.investment_dates],
+            'first_date': self.first_date.isoformat() if self.first_date is not None else None,
+            'last_date': self.last_date.isoformat() if self.last_date is not None else None,
+            'last_close': self.last_close,
+            'month': self.month,
+            'bars_in_month': self.bars_in_month,
+            'candidate': encode(self.candidate),
+            'month_done': self.month_done
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        if d.get('version') != STATE_VERSION:
+            raise ValueError(f"不支持的状态版本: {d.get('version')}")
+
+        def decode(record):
+            if record is None:
+                return None
+            return {**record, 'date': pd.Timestamp(record['date'])}
+
+        state = cls(d['name'], d['kind'], d['param'], d['monthly_investment'])
+        state.total_shares = d['total_shares']
+        state.total_invested = d['total_invested']
+        state.investment_count = d['investment_count']
+        state.last_investment = decode(d['last_investment'])
+        state.investment_dates = [pd.Timestamp(x) for x in d['investment_dates']]
+        state.first_date = pd.Timestamp(d['first_date']) if d['first_date'] is not None else None
+        state.last_date = pd.Timestamp(d['last_date']) if d['last_date'] is not None else None
+        state.last_close = d['last_close']
+        state.month = d['month']
+        state.bars_in_month = d['bars_in_month']
+        state.candidate = decode(d['candidate'])
+        state.month_done = d['month_done']
+        return state
+
+
+def new_states(monthly_investment=1000, strategies=None):
+    strategies = STREAMING_STRATEGIES if strategies is None else strategies
+    return {name: SIPState(name, kind, param, monthly_investment) for name, kind, param in strategies}
+
+
+def update_states(states, data):
+    # 只喂入比状态里最后日期更新的行；同一批状态按日期推进，返回新增的K线数
+    # 有尚未处理过任何K线的状态时从头喂入，已处理过的状态在 update 中跳过旧K线
+    last_dates = [x.last_date for x in states.values()]
+    if last_dates and None not in last_dates:
+        data = data.iloc[data.index.searchsorted(min(last_dates), side='right'):]
+    columns = [data[x].to_numpy(dtype=float) for x in ('open', 'high', 'low', 'close')]
+    for i, date in enumerate(data.index):
+        bar = [column[i] for column in columns]
+        for state in states.values():
+            state.update(date, *bar)
+    return len(data)
+
+
+def data_anchor(data, last_date):
+    # last_date 及之前最后 ANCHOR_ROWS 根K线的 开/高/低/收 指纹
+    rows = data.loc[:last_date, ['open', 'high', 'low', 'close']].iloc[-ANCHOR_ROWS:]
+    if len(rows) == 0:
+        return None
+    return {'last_date': rows.index[-1].isoformat(), 'rows': len(rows), 'fingerprint': data_fingerprint(rows)}
+
+
+def save_states(states, path, anchor=None):
+    tmp_file = path + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump({'anchor': anchor, 'states': {name: state.to_dict() for name, state in states.items()}}, f,
+                  ensure_ascii=False)
+    os.replace(tmp_file, path)
+
+
+def load_state_file(path):
+    # 返回 (状态, 指纹)；旧格式的文件没有指纹，指纹为 None
+    with open(path, encoding='utf-8') as f:
+        saved = json.load(f)
+    if 'states' not in saved:
+        saved = {'anchor': None, 'states': saved}
+    return {name: SIPState.from_dict(d) for name, d in saved['states'].items()}, saved['anchor']
+
+
+def load_states(path):
+    return load_state_file(path)[0]
+
+
+def _matches_anchor(data, anchor):
+    return data_anchor(data, pd.Timestamp(anchor['last_date'])) == anchor
+
+
+def refresh_symbol_states(csv_path, state_path, monthly_investment=1000, tail_rows=30):
+    # 已有状态时只读取CSV末尾 tail_rows 行；末尾不够覆盖上次之后的新数据(长时间未运行)时退回读取全部数据
+    # 上次处理过的最后几根K线与文件中不一致时说明历史被改写，按全部数据重新建立状态
+    states, anchor = None, None
+    if os.path.exists(state_path):
+        try:
+            states, anchor = load_state_file(state_path)
+        except ValueError:
+            # 旧版本的状态文件(例如没有记录买入日期，无法计算 XIRR)按全部数据重建
+            pass
+    data = None
+    if states is not None and anchor is not None:
+        last_date = pd.Timestamp(anchor['last_date'])
+        tail = read_csv_tail(csv_path, tail_rows)
+        tail['date'] = pd.to_datetime(tail['date'])
+        tail = tail.set_index('date')
+        # 末尾需要包含指纹对应的全部K线，否则无法核对
+        if len(tail) < tail_rows or (tail.index <= last_date).sum() >= anchor['rows']:
+            data = tail
+        else:
+            data = load_price_data(csv_path)
+        if not _matches_anchor(data, anchor):
+            data = None
+    if data is None:
+        if states:
+            monthly_investment = next(iter(states.values())).monthly_investment
+        states = new_states(monthly_investment)
+        data = load_price_data(csv_path)
+    new_bars = update_states(states, data)
+    last_dates = [x.last_date for x in states.values() if x.last_date is not None]
+    save_states(states, state_path, data_anchor(data, max(last_dates)) if last_dates else None)
+    return states, new_bars
+
+
+def run(args):
+    os.makedirs(args.state_dir, exist_ok=True)
+    symbol_files = find_symbol_files(args.data_dir, args.pattern)
+    print(f"共找到 {len(symbol_files)} 个股票数据文件，开始更新定投状态...")
+    rows = []
+    for symbol, csv_path in symbol_files:
+        state_path = os.path.join(args.state_dir, f'{symbol}.json')
+        try:
+            states, new_bars = refresh_symbol_states(csv_path, state_path, args.monthly_investment, args.tail_rows)
+        except Exception as e:
+            print(f"{symbol}: 更新失败 ({type(e).__name__}: {e})")
+            continue
+        for name, state in states.items():
+            rows.append({'symbol': symbol, 'strategy': name, 'new_bars': new_bars, **state.result()})
+
+    table = pd.DataFrame(rows)
+    if len(table) > 0:
+        table.to_csv(args.output, index=False, encoding='utf-8-sig')
+        print(f"更新完成，新增K线合计 {table.groupby('symbol')['new_bars'].first().sum()} 根，结果已保存为: {args.output}")
+
+
+if __name__ == '__main__':
+    import sys
+    from cli import main
+    main(['live'] + sys.argv[1:])
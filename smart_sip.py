@@ -0,0 +1,56 @@
+import numpy as np
+
+# 路径相关的"智能定投"规则。核心函数只接受每月买入日的价格/均线数组，形状为 (月数,) 或 (月数, 序列数)，
+# 后者可以一次计算多只股票或多组参数；均线触发类规则完全向量化，价值平均按月推进但每一步对所有序列同时计算
+
+
+def moving_average(values, window):
+    # 截至当日(含当日)的 window 日简单均线，沿第 0 维计算，不足 window 日的位置为 NaN
+    values = np.asarray(values, dtype=float)
+    result = np.full(values.shape, np.nan)
+    if window <= 0 or len(values) < window:
+        return result
+    cumulative = np.concatenate([np.zeros((1,) + values.shape[1:]), np.cumsum(values, axis=0)])
+    result[window - 1:] = (cumulative[window:] - cumulative[:-window]) / window
+    return result
+
+
+def ma_topup_amounts(prices, ma, monthly_investment=1000, multiplier=2.0, threshold=0.0):
+    # 买入日价格低于均线 (1 - threshold) 倍时投入 multiplier 倍金额，否则正常投入；均线尚未形成时正常投入
+    prices, ma = np.broadcast_arrays(np.asarray(prices, dtype=float), np.asarray(ma, dtype=float))
+    return np.where(prices < ma * (1 - threshold), monthly_investment * multiplier, float(monthly_investment))
+
+
+def pause_above_band_amounts(prices, ma, monthly_investment=1000, band=0.1):
+    # 买入日价格高于均线 (1 + band) 倍时暂停当月定投
+    prices, ma = np.broadcast_arrays(np.asarray(prices, dtype=float), np.asarray(ma, dtype=float))
+    return np.where(prices > ma * (1 + band), 0.0, float(monthly_investment))
+
+
+def value_averaging_amounts(prices, monthly_investment=1000, growth=0.0, max_multiple=None, allow_sell=False):
+    # 价值平均: 目标市值每月 target = target * (1 + growth) + monthly_investment，每月投入 目标市值 - 当前持仓市值
+    # 不允许卖出时差额为负则当月不投；max_multiple 限制单月最多投入 monthly_investment 的倍数
+    prices = np.asarray(prices, dtype=float)
+    n_months = len(prices)
+    targets = np.empty(prices.shape)
+    target = 0.0
+    for k in range(n_months):
+        target = target * (1 + growth) + monthly_investment
+        targets[k] = target
+
+    if allow_sell and max_multiple is None:
+        # 没有约束时每月都恰好补到目标市值，持仓份额为 target / price，可直接算出
+        held_value = np.zeros(prices.shape)
+        held_value[1:] = targets[:-1] / prices[:-1] * prices[1:]
+        return targets - held_value
+
+    cap = np.inf if max_multiple is None else monthly_investment * max_multiple
+    amounts = np.empty(prices.shape)
+    shares = np.zeros(prices.shape[1:])
+    for k in range(n_months):
+        held_value = shares * prices[k]
+        amount = np.clip(targets[k] - held_value, -held_value if allow_sell else 0.0, cap)
+        shares = shares + amount / prices[k]
+        amounts[k] = amount
+    return amounts
+
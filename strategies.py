@@ -0,0 +1,81 @@
+import numpy as np
+
+# 向量化策略协议: func(prices, month_starts, month_ends) -> 长度为月数的 int 数组，每个元素为该月买入的行号，-1 表示该月不投
+# prices 为 price_arrays() 返回的 {列名: 整段 numpy 数组}，month_starts/month_ends 来自 build_month_index(各月区间首尾相接)
+# 与 EnhancedSIPBacktest.run_strategy 的回调形式不同，策略只被调用一次，不需要逐月切片 DataFrame
+
+STRATEGY_REGISTRY = {}
+
+
+def register_strategy(name, func=None, registry=None):
+    # 可直接调用 register_strategy(name, func)，也可作为装饰器 @register_strategy(name)
+    registry = STRATEGY_REGISTRY if registry is None else registry
+
+    def decorator(f):
+        registry[name] = f
+        return f
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def price_arrays(data):
+    prices = {}
+    for column in data.columns:
+        if np.issubdtype(data[column].dtype, np.number):
+            prices[column] = data[column].to_numpy(dtype=float)
+    prices['day'] = data.index.day.to_numpy()
+    return prices
+
+
+def month_argextreme(values, month_starts, month_ends, reduce=np.fmin):
+    # 每月第一个取到最小(reduce=np.fmin)或最大(np.fmax)值的行号，与 idxmin/idxmax 一致；NaN 被忽略，整月为 NaN 时返回 -1
+    # values 可以是二维 (交易日, 路径)，此时返回 (月数, 路径) 的行号
+    values = np.asarray(values, dtype=float)
+    if len(month_starts) == 0:
+        return np.full((0,) + values.shape[1:], -1, dtype=np.int64)
+    first, last = month_starts[0], month_ends[-1]
+    values = values[first:last]
+    offsets = month_starts - first
+    extreme = reduce.reduceat(values, offsets, axis=0)
+    hit = values == np.repeat(extreme, month_ends - month_starts, axis=0)
+    # 越靠前的命中得分越高，按月取最大得分即第一次命中的位置
+    score = np.where(hit, (len(values) - np.arange(len(values))).reshape((-1,) + (1,) * (values.ndim - 1)), 0)
+    best = np.maximum.reduceat(score, offsets, axis=0)
+    return np.where(best > 0, first + len(values) - best, -1).astype(np.int64)
+
+
+@register_strategy("每月1日定投")
+def select_monthly_day_1(prices, month_starts, month_ends):
+    return np.where(month_ends > month_starts, month_starts, -1)
+
+
+@register_strategy("每月15日定投")
+def select_monthly_day_15(prices, month_starts, month_ends):
+    return np.where(month_ends > month_starts, np.minimum(month_starts + 14, month_ends - 1), -1)
+
+
+@register_strategy("每月最后1日定投")
+def select_monthly_last_day(prices, month_starts, month_ends):
+    return np.where(month_ends > month_starts, month_ends - 1, -1)
+
+
+@register_strategy("每月最低点定投(理想)")
+def select_monthly_lowest(prices, month_starts, month_ends):
+    return month_argextreme(prices['low'], month_starts, month_ends, np.fmin)
+
+
+@register_strategy("每月最高点定投(最差)")
+def select_monthly_highest(prices, month_starts, month_ends):
+    return month_argextreme(prices['high'], month_starts, month_ends, np.fmax)
+
+
+def select_rows(prices, month_index, strategies=None):
+    # 所有策略共用同一份数组和月份边界，得到 月数 × 策略数 的行号矩阵，之后的计算对所有策略一次完成
+    strategies = STRATEGY_REGISTRY if strategies is None else strategies
+    month_starts, month_ends = month_index
+    rows = np.full((len(month_starts), len(strategies)), -1, dtype=np.int64)
+    for j, func in enumerate(strategies.values()):
+        rows[:, j] = func(prices, month_starts, month_ends)
+    return list(strategies.keys()), rows
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+# 仓库为平铺的顶层模块，测试从任意目录运行时都能直接导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import synthetic_ohlcv  # noqa: E402
+
+
+@pytest.fixture
+def gappy_prices():
+    # 约一年半的合成日线: 随机缺失交易日和停牌，2019年3月只保留一个交易日，并在4月制造两个相同的最低价
+    df = synthetic_ohlcv(years=1.5, seed=7, gap_prob=0.1, suspension_prob=0.01)
+    march = df.index[(df.index.year == 2019) & (df.index.month == 3)]
+    df = df.drop(march[1:])
+    april = df.index[(df.index.year == 2019) & (df.index.month == 4)]
+    df.loc[april[-1], 'low'] = df.loc[april[0], 'low'] = df.loc[april, 'low'].min() - 0.01
+    return df
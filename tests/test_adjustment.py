@@ -0,0 +1,65 @@
+import functools
+
+import numpy as np
+import pandas as pd
+
+import cli
+import get_qrcb_data
+from adjustment import ADJUST_MODES, adjust_prices, normalize_factors
+from data_loader import read_price_csv
+from paths import DATA_DIR, RAW_DATA_DIR
+
+
+def fake_fetch(symbol, start_date, end_date, adjust):
+    assert adjust == ''
+    dates = pd.bdate_range('2024-01-02', periods=40)
+    close = np.linspace(10, 12, len(dates)).round(2)
+    return pd.DataFrame({'date': dates.strftime('%Y-%m-%d'), 'open': close, 'close': close, 'high': close + 0.1,
+                         'low': close - 0.1, 'amount': 1e6})
+
+
+def fake_factors(symbol):
+    # 2024-01-15 除权一次
+    return pd.DataFrame({'date': ['2024-01-02', '2024-01-15'], 'hfq_factor': [1.0, 1.25]})
+
+
+def test_fetch_raw_store_then_adjust_with_default_directories(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(get_qrcb_data, 'install_http_patch', lambda: None)
+    monkeypatch.setattr(get_qrcb_data, 'configure_http', lambda **kwargs: None)
+    monkeypatch.setattr(get_qrcb_data, 'download_symbols', functools.partial(
+        get_qrcb_data.download_symbols, fetch=fake_fetch, fetch_factors=fake_factors))
+
+    cli.main(['fetch', '--symbols', 'sz000001', '--raw-store'])
+    assert (tmp_path / RAW_DATA_DIR / 'sz000001.csv').exists()
+    assert (tmp_path / RAW_DATA_DIR / 'factors' / 'sz000001.csv').exists()
+    assert not (tmp_path / DATA_DIR).exists()
+
+    cli.main(['adjust'])
+    raw = read_price_csv(str(tmp_path / RAW_DATA_DIR / 'sz000001.csv'))
+    qfq = read_price_csv(str(tmp_path / DATA_DIR / 'sz000001.csv'))
+    factor = np.where(raw.index < '2024-01-15', 1.0 / 1.25, 1.0)
+    np.testing.assert_allclose(qfq['close'], raw['close'] * factor)
+    # 原始价格不被复权数据覆盖
+    pd.testing.assert_frame_equal(read_price_csv(str(tmp_path / RAW_DATA_DIR / 'sz000001.csv')), raw)
+
+
+def test_fetch_without_raw_store_defaults_to_data_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(get_qrcb_data, 'install_http_patch', lambda: None)
+    monkeypatch.setattr(get_qrcb_data, 'configure_http', lambda **kwargs: None)
+    monkeypatch.setattr(get_qrcb_data, 'download_symbols', functools.partial(
+        get_qrcb_data.download_symbols, fetch=lambda symbol, start, end, adjust: fake_fetch(symbol, start, end, '')))
+
+    cli.main(['fetch', '--symbols', 'sz000001'])
+    assert (tmp_path / DATA_DIR / 'sz000001.csv').exists()
+    assert not (tmp_path / RAW_DATA_DIR).exists()
+
+
+def test_adjust_prices_without_factors_keeps_raw_prices():
+    dates = pd.bdate_range('2024-01-02', periods=5)
+    raw = pd.DataFrame({'open': 10.0, 'close': 10.5, 'high': 11.0, 'low': 9.5, 'amount': 1e6},
+                       index=pd.DatetimeIndex(dates, name='date'))
+    factors = normalize_factors(pd.DataFrame({'date': [], 'hfq_factor': []}))
+    for adjust in ADJUST_MODES:
+        pd.testing.assert_frame_equal(adjust_prices(raw, factors, adjust), raw)
@@ -0,0 +1,95 @@
+import json
+import os
+import ssl
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+import requests
+
+import cli
+
+# 本地替身服务器，模拟腾讯行情接口: sz000001 正常，sz000002 第一次返回 503，sz000003 一直返回 500
+KLINE_PATH = '/ifzqgtimg/appstock/app/newfqkline/get'
+START_PATH = '/other/klineweb/klineWeb/weekTrends'
+ROWS = [[f'2024-01-{d:02d}', '10.00', '10.10', '10.20', '9.90', '1000', {}, '0.5', '12.3'] for d in (2, 3, 4, 5)]
+
+
+class FakeQuoteHandler(BaseHTTPRequestHandler):
+    requests = Counter()
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.end_headers()
+        self.wfile.write(body.encode('utf-8'))
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        if url.path == START_PATH:
+            self.reply(200, 'trend_qfq=' + json.dumps({'data': [['2024-01-02', '10.00']]}))
+            return
+        if url.path != KLINE_PATH:
+            self.reply(404, 'not found')
+            return
+        symbol = query['param'][0].split(',')[0]
+        with self.lock:
+            FakeQuoteHandler.requests[symbol] += 1
+            count = FakeQuoteHandler.requests[symbol]
+        if symbol == 'sz000003' or (symbol == 'sz000002' and count == 1):
+            self.reply(500 if symbol == 'sz000003' else 503, 'server error')
+            return
+        body = {'data': {symbol: {'day': ROWS}}}
+        self.reply(200, query['_var'][0] + '=' + json.dumps(body))
+
+
+@pytest.fixture
+def fake_server(monkeypatch):
+    # install_http_patch 会替换 requests.get 并修改证书相关设置，测试结束后恢复
+    monkeypatch.setattr(requests, 'get', requests.get)
+    monkeypatch.setattr(ssl, '_create_default_https_context', ssl._create_default_https_context)
+    for name in ('CURL_CA_BUNDLE', 'REQUESTS_CA_BUNDLE', 'SSL_CERT_FILE'):
+        if name in os.environ:
+            monkeypatch.setenv(name, os.environ[name])
+        else:
+            monkeypatch.delenv(name, raising=False)
+    FakeQuoteHandler.requests.clear()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeQuoteHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+def test_bulk_download_against_local_server(fake_server, tmp_path):
+    pytest.importorskip('akshare')
+    output_dir = tmp_path / 'out'
+    cli.main(['fetch', '--symbols', 'sz000001,sz000002,sz000003', '--output-dir', str(output_dir),
+              '--start-date', '20240101', '--end-date', '20241231', '--retries', '3', '--backoff', '0',
+              '--rate-limit', '0', '--workers', '3', '--base-url', fake_server])
+
+    with open(output_dir / 'manifest.json', encoding='utf-8') as f:
+        manifest = {x['symbol']: x for x in json.load(f)}
+    assert list(manifest) == ['sz000001', 'sz000002', 'sz000003']
+
+    assert manifest['sz000001']['status'] == 'ok'
+    assert (manifest['sz000001']['attempts'], manifest['sz000001']['rows']) == (1, len(ROWS))
+    assert manifest['sz000002']['status'] == 'ok'
+    assert manifest['sz000002']['attempts'] == 2
+    assert manifest['sz000003']['status'] == 'failed'
+    assert manifest['sz000003']['attempts'] == 3
+    assert '500' in manifest['sz000003']['error']
+    assert (output_dir / 'sz000001.csv').exists() and not (output_dir / 'sz000003.csv').exists()
+
+    # 只有一层重试: 失败的代码恰好请求 --retries 次，而不是 --retries × (Session 重试次数 + 1)
+    assert FakeQuoteHandler.requests['sz000003'] == 3
+    # akshare 按年份分别请求；503 只让第一次请求失败，第二次尝试的请求数与正常代码相同
+    assert FakeQuoteHandler.requests['sz000002'] == 1 + FakeQuoteHandler.requests['sz000001']
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_loader import read_price_csv
+from minute_ingest import ingest_minute_bars, write_daily_store
+
+
+@pytest.fixture
+def minute_bars():
+    # 三个交易日，每天 09:31-11:30 与 13:01-15:00 各 120 根分钟K线
+    days = pd.to_datetime(['2024-01-02', '2024-01-03', '2024-01-05'])
+    minutes = np.r_[np.arange(9 * 60 + 31, 11 * 60 + 31), np.arange(13 * 60 + 1, 15 * 60 + 1)]
+    times = pd.DatetimeIndex([day + pd.Timedelta(minutes=int(m)) for day in days for m in minutes])
+    rng = np.random.default_rng(0)
+    close = np.round(10 + np.cumsum(rng.normal(0, 0.01, len(times))), 2)
+    return pd.DataFrame({'datetime': times, 'open': close, 'high': close + 0.01, 'low': close - 0.01,
+                         'close': close, 'volume': rng.integers(100, 1000, len(times))})
+
+
+def write(df, path):
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+def test_split_date_and_time_columns(minute_bars, tmp_path):
+    combined = write(minute_bars.rename(columns={'datetime': '时间', 'open': '开盘', 'high': '最高', 'low': '最低',
+                                                 'close': '收盘', 'volume': '成交量'}), tmp_path / 'combined.csv')
+    split = minute_bars.drop(columns='datetime')
+    split.insert(0, 'time', minute_bars['datetime'].dt.strftime('%H:%M:%S'))
+    split.insert(0, 'date', minute_bars['datetime'].dt.strftime('%Y-%m-%d'))
+    split = write(split, tmp_path / 'split.csv')
+
+    expected = ingest_minute_bars([combined], ('10:00', '14:30'), chunksize=100)
+    actual = ingest_minute_bars([split], ('10:00', '14:30'), chunksize=100)
+    assert len(expected) == 3
+    pd.testing.assert_frame_equal(actual, expected)
+    assert expected['high'].iloc[0] == pytest.approx(minute_bars['high'].iloc[:240].max())
+
+
+def test_write_daily_store_adds_missing_days(minute_bars, tmp_path):
+    daily = ingest_minute_bars([write(minute_bars, tmp_path / 'm.csv')], ('10:00',), chunksize=100)
+    # 已有日线只有前两个交易日，价格为分钟原始价的 0.9 倍(前复权)，另有一个分钟数据之前的交易日
+    store = (daily.iloc[:2][['open', 'high', 'low', 'close']] * 0.9).assign(amount=1.0)
+    earlier = pd.DataFrame({'open': 1.0, 'high': 1.0, 'low': 1.0, 'close': 1.0, 'amount': 1.0},
+                           index=pd.DatetimeIndex(['2023-12-29'], name='date'))
+    store = pd.concat([earlier, store])
+    csv_path = str(tmp_path / 'daily.csv')
+    store.reset_index().assign(date=lambda x: x['date'].dt.strftime('%Y-%m-%d')).to_csv(csv_path, index=False)
+
+    assert write_daily_store(daily, csv_path, ('10:00',)) == (2, 1)
+    result = read_price_csv(csv_path)
+    assert list(result.index) == [pd.Timestamp('2023-12-29')] + list(daily.index)
+    # 已有交易日的原有列不变，采样价换算到日线口径
+    np.testing.assert_allclose(result['close'].iloc[1:3], store['close'].iloc[1:3])
+    np.testing.assert_allclose(result['at_1000'].iloc[1:3], daily['at_1000'].iloc[:2] * 0.9)
+    assert np.isnan(result['at_1000'].iloc[0])
+    # 新增的交易日沿用最近一个重叠日的比值
+    for column in ('open', 'high', 'low', 'close', 'at_1000'):
+        np.testing.assert_allclose(result[column].iloc[3], daily[column].iloc[2] * 0.9)
+    assert np.isnan(result['amount'].iloc[3])
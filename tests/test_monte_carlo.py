@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from monte_carlo import PRICE_FIELDS, bar_ratios, block_bootstrap_paths, evaluate_paths, run_monte_carlo
+from sip_backtest import EnhancedSIPBacktest
+from sip_engine import build_month_index
+
+
+class FixedStarts(np.random.Generator):
+    # 所有块都从 start 开始抽样
+    def __init__(self, start=0):
+        super().__init__(np.random.PCG64(0))
+        self.start = start
+
+    def integers(self, low, high=None, size=None, **kwargs):
+        return np.full(size, self.start, dtype=np.int64)
+
+
+def test_full_length_block_reproduces_history(gappy_prices):
+    n_returns = len(gappy_prices) - 1
+    paths = block_bootstrap_paths(gappy_prices, 3, block_size=n_returns, rng=FixedStarts(0))
+    for field in PRICE_FIELDS:
+        assert paths[field].shape == (len(gappy_prices), 3)
+        for j in range(3):
+            np.testing.assert_allclose(paths[field][:, j], gappy_prices[field].to_numpy(), rtol=1e-12)
+
+
+def test_full_length_block_is_a_rotation_of_history(gappy_prices):
+    # 起点不为 0 时整条路径是历史日线比值的循环移位
+    ratios = bar_ratios(gappy_prices)
+    paths = block_bootstrap_paths(gappy_prices, 1, block_size=len(ratios), rng=FixedStarts(7))
+    close = paths['close'][:, 0]
+    np.testing.assert_allclose(close[1:] / close[:-1], np.roll(ratios[:, 3], -7), rtol=1e-9)
+    np.testing.assert_allclose(paths['open'][1:, 0] / close[:-1], np.roll(ratios[:, 0], -7), rtol=1e-9)
+
+
+def test_bars_stay_consistent(gappy_prices):
+    paths = block_bootstrap_paths(gappy_prices, 50, block_size=10, rng=3)
+    assert (paths['low'] <= np.minimum(paths['open'], paths['close']) + 1e-9).all()
+    assert (paths['high'] >= np.maximum(paths['open'], paths['close']) - 1e-9).all()
+
+
+def test_single_path_matches_backtest(gappy_prices):
+    paths = block_bootstrap_paths(gappy_prices, 2, block_size=15, rng=5)
+    outcomes = evaluate_paths(paths, gappy_prices.index, build_month_index(gappy_prices.index))
+    for j in range(2):
+        frame = pd.DataFrame({x: paths[x][:, j] for x in PRICE_FIELDS}, index=gappy_prices.index)
+        expected = EnhancedSIPBacktest(frame).run_all_strategies(verbose=False)
+        for name, result in expected.items():
+            for field in ('final_value', 'profit_rate', 'annualized_return', 'xirr'):
+                assert outcomes[name][field][j] == pytest.approx(result[field], rel=1e-9), (name, field)
+
+
+def test_results_do_not_depend_on_workers(gappy_prices):
+    serial = run_monte_carlo(gappy_prices, n_paths=60, batch_size=20, seed=9, workers=1)
+    parallel = run_monte_carlo(gappy_prices, n_paths=60, batch_size=20, seed=9, workers=2)
+    for name in serial:
+        for field, values in serial[name].items():
+            np.testing.assert_array_equal(values, parallel[name][field])
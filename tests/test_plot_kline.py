@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+import plot_kline
+from benchmark import synthetic_ohlcv, write_synthetic_csv
+from plot_kline import aggregate_bars, pick_resolution
+
+
+def small_frame():
+    # 2024-01-24(周三) 至 2024-02-06(周二) 的 10 个交易日，跨两个月、三周
+    dates = pd.bdate_range('2024-01-24', periods=10, name='date')
+    close = np.arange(10, 20, dtype=float)
+    return pd.DataFrame({'open': close - 0.5, 'high': close + 1, 'low': close - 1, 'close': close,
+                         'amount': np.arange(1, 11) * 100.0}, index=dates)
+
+
+def test_aggregate_weekly_bars():
+    bars = aggregate_bars(small_frame(), 'W-FRI')
+    assert list(bars.index.strftime('%Y-%m-%d')) == ['2024-01-26', '2024-02-02', '2024-02-06']
+    assert bars.index.name == 'date'
+    assert bars['open'].tolist() == [9.5, 12.5, 17.5]
+    assert bars['close'].tolist() == [12.0, 17.0, 19.0]
+    assert bars['high'].tolist() == [13.0, 18.0, 20.0]
+    assert bars['low'].tolist() == [9.0, 12.0, 17.0]
+    assert bars['amount'].tolist() == [600.0, 3000.0, 1900.0]
+
+
+def test_aggregate_monthly_bars_use_last_trading_day():
+    df = small_frame().drop(pd.Timestamp('2024-01-31'))
+    bars = aggregate_bars(df, 'M')
+    assert list(bars.index.strftime('%Y-%m-%d')) == ['2024-01-30', '2024-02-06']
+    assert bars['close'].tolist() == [14.0, 19.0]
+    assert bars['amount'].sum() == df['amount'].sum()
+
+
+def test_pick_resolution():
+    levels = {'D': small_frame()}
+    for level, (_, freq) in plot_kline.LEVELS.items():
+        if freq is not None:
+            levels[level] = aggregate_bars(levels['D'], freq)
+    assert pick_resolution(levels, '2024-01-24', '2024-02-06', max_candles=10) == 'D'
+    assert pick_resolution(levels, '2024-01-24', '2024-02-06', max_candles=3) == 'W'
+    assert pick_resolution(levels, '2024-01-24', '2024-02-06', max_candles=2) == 'M'
+    assert pick_resolution(levels, '2024-01-24', '2024-01-26', max_candles=3) == 'D'
+    # 最粗级别也放不下时仍返回最粗级别
+    assert pick_resolution(levels, '2024-01-24', '2024-02-06', max_candles=0) == 'Q'
+
+
+def test_load_kline_levels_matches_aggregation(tmp_path, monkeypatch):
+    monkeypatch.setattr(plot_kline, '_levels_cache', {})
+    csv_path = str(tmp_path / 'prices.csv')
+    write_synthetic_csv(synthetic_ohlcv(years=2, seed=4), csv_path)
+    levels = plot_kline.load_kline_levels(csv_path)
+    assert set(levels) == set(plot_kline.LEVELS)
+    for level, (_, freq) in plot_kline.LEVELS.items():
+        if freq is not None:
+            pd.testing.assert_frame_equal(levels[level], aggregate_bars(levels['D'], freq), check_freq=False,
+                                          check_index_type=False)
+    assert plot_kline.load_kline_levels(csv_path) is levels
@@ -0,0 +1,30 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from price_panel import PricePanel, as_price_frame
+
+
+def test_save_load_round_trip(tmp_path, gappy_prices):
+    other = gappy_prices.iloc[::2] * 2
+    # 非数值列不进入面板
+    panel = PricePanel.from_frames({'a': gappy_prices.assign(name='x'), 'b': other.assign(name='y')})
+    assert 'name' not in panel.columns
+    panel.save(str(tmp_path))
+    assert not [x for x in os.listdir(tmp_path) if x.endswith('.tmp')]
+
+    # 覆盖已被内存映射的旧面板
+    loaded = PricePanel.load(str(tmp_path))
+    PricePanel.from_frames({'b': other}).save(str(tmp_path))
+    assert loaded.symbols == ['a', 'b']
+    np.testing.assert_array_equal(loaded.valid, panel.valid)
+    for name in panel.fields:
+        np.testing.assert_array_equal(loaded.fields[name], panel.fields[name])
+
+    reloaded = PricePanel.load(str(tmp_path))
+    assert reloaded.symbols == ['b']
+    frame = as_price_frame(reloaded)
+    pd.testing.assert_frame_equal(frame[['open', 'close', 'high', 'low']],
+                                  other[['open', 'close', 'high', 'low']].round(2), check_freq=False, check_index_type=False,
+                                  check_names=False)
@@ -0,0 +1,129 @@
+import functools
+import textwrap
+import threading
+
+import numpy as np
+
+from result_cache import ResultCache, strategy_identity
+from sip_backtest import EnhancedSIPBacktest
+
+
+def define(source, name='pick'):
+    # 在独立的命名空间中定义函数，模块名和限定名都相同，模拟同一个策略在两次运行之间被修改
+    namespace = {'__name__': 'user_strategies'}
+    exec(textwrap.dedent(source), namespace)
+    return namespace[name]
+
+
+LOWEST = """
+def pick(month_data):
+    idx = month_data['low'].idxmin()
+    return idx, month_data.loc[idx, 'close']
+"""
+
+
+def test_identity_is_stable_for_identical_source():
+    assert strategy_identity(define(LOWEST)) == strategy_identity(define(LOWEST))
+
+
+def test_identity_changes_with_called_attribute():
+    highest = LOWEST.replace("['low'].idxmin()", "['low'].idxmax()")
+    assert strategy_identity(define(LOWEST)) != strategy_identity(define(highest))
+
+
+def test_identity_changes_with_closure_value():
+    def make(offset):
+        def pick(month_data):
+            i = min(offset, len(month_data) - 1)
+            return month_data.index[i], month_data['close'].iloc[i]
+        return pick
+
+    assert strategy_identity(make(4)) == strategy_identity(make(4))
+    assert strategy_identity(make(4)) != strategy_identity(make(9))
+
+
+def test_identity_changes_with_referenced_global_helper():
+    source = """
+    def helper(month_data):
+        return {body}
+
+    def pick(month_data):
+        i = helper(month_data)
+        return month_data.index[i], month_data['close'].iloc[i]
+    """
+    first = define(source.format(body='0'))
+    last = define(source.format(body='len(month_data) - 1'))
+    assert strategy_identity(first) != strategy_identity(last)
+
+
+def nth_day(month_data, n, field='close'):
+    i = min(n, len(month_data) - 1)
+    return month_data.index[i], month_data[field].iloc[i]
+
+
+def test_partial_is_keyed_by_value():
+    assert strategy_identity(functools.partial(nth_day, n=3)) == strategy_identity(functools.partial(nth_day, n=3))
+    assert strategy_identity(functools.partial(nth_day, n=3)) != strategy_identity(functools.partial(nth_day, n=4))
+    assert strategy_identity(functools.partial(nth_day, n=3)) != \
+        strategy_identity(functools.partial(nth_day, n=3, field='open'))
+    assert '0x' not in strategy_identity(functools.partial(nth_day, n=3))
+
+
+def test_unpicklable_dependency_disables_caching(gappy_prices, tmp_path):
+    lock = threading.Lock()
+
+    def pick(month_data):
+        with lock:
+            return month_data.index[0], month_data['close'].iloc[0]
+
+    assert strategy_identity(pick) is None
+    cache = ResultCache(str(tmp_path))
+    EnhancedSIPBacktest(gappy_prices, cache=cache).run_strategy('first', pick)
+    assert cache.hits == cache.misses == 0
+
+
+def test_modified_strategy_misses_cache(gappy_prices, tmp_path):
+    cache = ResultCache(str(tmp_path))
+    lowest = define(LOWEST)
+    highest = define(LOWEST.replace("['low'].idxmin()", "['high'].idxmax()"))
+
+    first = EnhancedSIPBacktest(gappy_prices, cache=cache).run_strategy('mine', lowest)
+    again = EnhancedSIPBacktest(gappy_prices, cache=cache).run_strategy('mine', define(LOWEST))
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert again['final_value'] == first['final_value']
+
+    edited = EnhancedSIPBacktest(gappy_prices, cache=cache).run_strategy('mine', highest)
+    assert (cache.hits, cache.misses) == (1, 2)
+    expected = EnhancedSIPBacktest(gappy_prices).run_strategy('mine', highest)
+    assert edited['final_value'] == expected['final_value'] != first['final_value']
+    assert np.isfinite(edited['xirr'])
+
+
+def test_put_scans_directory_only_when_over_capacity(tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path), max_bytes=100000)
+    scans = []
+    scan = cache._scan
+    monkeypatch.setattr(cache, '_scan', lambda: scans.append(1) or scan())
+    payload = b'x' * 1000
+    for i in range(300):
+        cache.put(f'{i:040x}', payload)
+    # 第一次写入扫描一次，之后超限时扫描并删到 90% 以下，约每写入容量的 10% 才扫描一次，而不是每次写入都扫描
+    assert len(scans) <= 30
+    _, total = scan()
+    assert total <= cache.max_bytes
+    assert cache.get(f'{299:040x}') == payload
+    assert cache.get(f'{0:040x}') is None
+
+
+def test_corrupt_entry_counts_as_miss_and_is_removed(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    key = 'ab' * 20
+    cache.put(key, {'a': 1})
+    with open(cache.path(key), 'wb') as f:
+        f.write(b'\x80\x05truncated')
+    assert cache.get(key) is None
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert not (tmp_path / key[:2] / f'{key}.pkl').exists()
+    cache.put(key, {'a': 2})
+    assert cache.get(key) == {'a': 2}
+    assert (cache.hits, cache.misses) == (1, 1)
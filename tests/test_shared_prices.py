@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import walk_forward
+from benchmark import synthetic_ohlcv
+from shared_prices import SharedPriceData, attach_price_data, map_with_shared_data
+
+
+def column_sum(data, column):
+    return float(data[column].sum()), len(data)
+
+
+def test_attach_round_trip(gappy_prices):
+    data = gappy_prices.assign(name='x')
+    with SharedPriceData(data) as shared:
+        attached, shm = attach_price_data(shared.handle)
+        try:
+            # 非数值列不进入共享内存，其余列与日期原样还原
+            pd.testing.assert_frame_equal(attached, gappy_prices.astype(float), check_freq=False)
+            with pytest.raises(ValueError):
+                attached.iloc[0, 0] = 0.0
+        finally:
+            del attached
+            shm.close()
+
+
+def test_empty_frame_round_trip():
+    data = pd.DataFrame({'close': []}, index=pd.DatetimeIndex([], name='date'))
+    with SharedPriceData(data) as shared:
+        attached, shm = attach_price_data(shared.handle)
+        assert len(attached) == 0 and list(attached.columns) == ['close']
+        del attached
+        shm.close()
+
+
+def test_map_with_shared_data_matches_serial():
+    data = synthetic_ohlcv(years=4, seed=11)
+    columns = ['open', 'close', 'high', 'low']
+    assert map_with_shared_data(column_sum, data, columns, workers=2) == [column_sum(data, x) for x in columns]
+
+    parallel = walk_forward.walk_forward(data, train_months=12, test_months=12, workers=2)
+    serial = walk_forward.walk_forward(data, train_months=12, test_months=12, workers=1)
+    pd.testing.assert_frame_equal(parallel, serial)
+    assert np.isfinite(serial['chosen_test']).all()
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from sip_backtest import backtest_sip_with_open
+from sip_engine import build_month_index, calendar_day_rows, rolling_start_analysis, sweep_sip_with_open
+
+FIELDS = ['total_invested', 'final_value', 'total_profit', 'profit_rate', 'annualized_return']
+
+
+def test_sweep_matches_single_backtests(gappy_prices):
+    price_fields = ('open', 'close', 'low', 'high')
+    amounts = (1000, 2500)
+    sweep = sweep_sip_with_open(gappy_prices, range(1, 32), price_fields, amounts)
+    assert sweep['total_invested'].shape == (31, 4, 2)
+    for i, day in enumerate(sweep['invest_days']):
+        for j, field in enumerate(price_fields):
+            for k, amount in enumerate(amounts):
+                expected = backtest_sip_with_open(gappy_prices, day, monthly_investment=amount, price_field=field)
+                assert sweep['investment_count'] == expected['investment_count']
+                for name in FIELDS:
+                    assert sweep[name][i, j, k] == pytest.approx(expected[name], rel=1e-12), (day, field, amount, name)
+
+
+def test_calendar_day_rows_match_backtest_dates(gappy_prices):
+    for day in (1, 11, 29, 31):
+        rows = calendar_day_rows(gappy_prices, day)
+        dates = [x['date'] for x in backtest_sip_with_open(gappy_prices, day)['investment_dates']]
+        assert list(gappy_prices.index[rows]) == dates
+
+
+@pytest.mark.parametrize('invest_day', [1, 15, 31])
+def test_rolling_start_matches_sliced_reruns(gappy_prices, invest_day):
+    month_starts, month_ends = build_month_index(gappy_prices.index)
+    rows = calendar_day_rows(gappy_prices, invest_day)
+    rolling = rolling_start_analysis(gappy_prices, rows, price_field='close', windows=True)
+    n_months = len(month_starts)
+    assert len(rolling['start_dates']) == n_months
+
+    for s in range(n_months):
+        # 从第 s 个月开始一直定投到数据末尾
+        expected = backtest_sip_with_open(gappy_prices.iloc[month_starts[s]:], invest_day, price_field='close')
+        assert rolling['start_dates'][s] == gappy_prices.index[month_starts[s]]
+        for name in FIELDS + ['xirr']:
+            # 只在最后一天买入一次时 XIRR 无解，两边都为 NaN
+            assert rolling[name][s] == pytest.approx(expected[name], rel=1e-9, nan_ok=True), (s, name)
+
+        for e in range(n_months):
+            if e < s:
+                assert np.isnan(rolling['window_final_value'][s, e])
+                continue
+            # 从第 s 个月定投到第 e 个月最后一个交易日
+            window = backtest_sip_with_open(gappy_prices.iloc[month_starts[s]:month_ends[e]], invest_day,
+                                            price_field='close')
+            assert rolling['window_total_invested'][s, e] == window['total_invested']
+            assert rolling['window_final_value'][s, e] == pytest.approx(window['final_value'], rel=1e-12)
+            assert rolling['window_profit_rate'][s, e] == pytest.approx(window['profit_rate'], rel=1e-9, abs=1e-9)
+            assert rolling['window_annualized_return'][s, e] == pytest.approx(window['annualized_return'],
+                                                                               rel=1e-9, abs=1e-9)
@@ -0,0 +1,136 @@
+import json
+
+import pytest
+
+import sip_state
+from benchmark import write_synthetic_csv
+from sip_backtest import EnhancedSIPBacktest, backtest_sip_with_open
+from sip_state import SIPState, load_states, new_states, refresh_symbol_states, save_states, update_states
+
+FIELDS = ['total_invested', 'final_value', 'total_profit', 'profit_rate', 'annualized_return', 'xirr',
+          'investment_count']
+
+
+def assert_matches_batch(states, data):
+    batch = EnhancedSIPBacktest(data).run_all_strategies(verbose=False)
+    for name, state in states.items():
+        result = state.result()
+        for field in FIELDS:
+            assert result[field] == pytest.approx(batch[name][field], rel=1e-12), (name, field)
+        assert result['last_date'] == data.index[-1]
+
+
+def round_trip(states):
+    # 与 save_states / load_states 相同，经过一次 JSON 文本
+    text = json.dumps({name: state.to_dict() for name, state in states.items()})
+    return {name: SIPState.from_dict(d) for name, d in json.loads(text).items()}
+
+
+def test_streaming_matches_batch(gappy_prices):
+    states = new_states()
+    assert update_states(states, gappy_prices) == len(gappy_prices)
+    assert_matches_batch(states, gappy_prices)
+
+
+@pytest.mark.parametrize('split', [1, 20, 41, 200, -1])
+def test_resume_after_round_trip_matches_batch(gappy_prices, split):
+    # 在任意一根K线之后保存并恢复状态(包括月中、当月候选尚未成交时)，继续喂入剩余数据的结果与整体回测一致
+    states = new_states()
+    update_states(states, gappy_prices.iloc[:split])
+    restored = round_trip(states)
+    assert [x.to_dict() for x in restored.values()] == [x.to_dict() for x in states.values()]
+    # 重复喂入已处理过的K线不会重复计入
+    assert update_states(restored, gappy_prices) == len(gappy_prices.iloc[split:])
+    assert_matches_batch(restored, gappy_prices)
+
+
+def test_open_day_matches_backtest_sip_with_open(gappy_prices):
+    for invest_day in (1, 11, 31):
+        state = SIPState('open', 'open_day', invest_day)
+        update_states({'open': state}, gappy_prices)
+        batch = backtest_sip_with_open(gappy_prices, invest_day=invest_day)
+        result = state.result()
+        for field in FIELDS:
+            assert result[field] == pytest.approx(batch[field], rel=1e-12), (invest_day, field)
+
+
+def test_from_dict_rejects_other_versions():
+    d = new_states()["每月1日定投"].to_dict()
+    d['version'] += 1
+    with pytest.raises(ValueError):
+        SIPState.from_dict(d)
+
+
+def test_refresh_reads_tail_and_matches_batch(gappy_prices, tmp_path, monkeypatch):
+    csv_path = str(tmp_path / 'sim.csv')
+    state_path = str(tmp_path / 'sim.json')
+    write_synthetic_csv(gappy_prices.iloc[:-10], csv_path)
+    states, new_bars = refresh_symbol_states(csv_path, state_path)
+    assert new_bars == len(gappy_prices) - 10
+
+    # 追加的K线少于 tail_rows 时只读取文件末尾，不再整体加载
+    write_synthetic_csv(gappy_prices, csv_path)
+    monkeypatch.setattr(sip_state, 'load_price_data', lambda path: pytest.fail("不应读取全部数据"))
+    states, new_bars = refresh_symbol_states(csv_path, state_path, tail_rows=30)
+    assert new_bars == 10
+    assert_matches_batch(load_states(state_path), gappy_prices)
+    assert_matches_batch(states, gappy_prices)
+
+
+def test_refresh_falls_back_to_full_read_when_tail_is_too_short(gappy_prices, tmp_path):
+    csv_path = str(tmp_path / 'sim.csv')
+    state_path = str(tmp_path / 'sim.json')
+    write_synthetic_csv(gappy_prices.iloc[:100], csv_path)
+    refresh_symbol_states(csv_path, state_path)
+
+    write_synthetic_csv(gappy_prices, csv_path)
+    states, new_bars = refresh_symbol_states(csv_path, state_path, tail_rows=30)
+    assert new_bars == len(gappy_prices) - 100
+    assert_matches_batch(states, gappy_prices)
+
+
+def test_new_states_replay_from_start(gappy_prices, tmp_path):
+    # 状态文件中的状态都还没有处理过任何K线(例如上次运行时CSV为空)
+    csv_path = str(tmp_path / 'sim.csv')
+    state_path = str(tmp_path / 'sim.json')
+    write_synthetic_csv(gappy_prices, csv_path)
+    save_states(new_states(), state_path)
+    states, new_bars = refresh_symbol_states(csv_path, state_path)
+    assert new_bars == len(gappy_prices)
+    assert_matches_batch(states, gappy_prices)
+
+
+def test_mixed_new_and_existing_states(gappy_prices):
+    states = new_states()
+    update_states(states, gappy_prices.iloc[:100])
+    states["每月1日定投"] = SIPState("每月1日定投", 'day', 1)
+    update_states(states, gappy_prices)
+    assert_matches_batch(states, gappy_prices)
+
+
+def test_rewritten_history_rebuilds_state(gappy_prices, tmp_path):
+    # 增量刷新后前复权历史整体按新的因子重算: 已保存的状态作废，按新数据从头计算
+    csv_path = str(tmp_path / 'sim.csv')
+    state_path = str(tmp_path / 'sim.json')
+    write_synthetic_csv(gappy_prices.iloc[:-5], csv_path)
+    refresh_symbol_states(csv_path, state_path)
+
+    rewritten = gappy_prices.copy()
+    rewritten[['open', 'high', 'low', 'close']] = (rewritten[['open', 'high', 'low', 'close']] * 0.9).round(2)
+    write_synthetic_csv(rewritten, csv_path)
+    states, new_bars = refresh_symbol_states(csv_path, state_path)
+    assert new_bars == len(rewritten)
+    assert_matches_batch(states, rewritten)
+
+
+def test_state_file_without_anchor_is_rebuilt(gappy_prices, tmp_path):
+    csv_path = str(tmp_path / 'sim.csv')
+    state_path = str(tmp_path / 'sim.json')
+    write_synthetic_csv(gappy_prices, csv_path)
+    states = new_states(monthly_investment=500)
+    update_states(states, gappy_prices.iloc[:50])
+    with open(state_path, 'w', encoding='utf-8') as f:
+        json.dump({name: state.to_dict() for name, state in states.items()}, f)
+    states, new_bars = refresh_symbol_states(csv_path, state_path)
+    assert new_bars == len(gappy_prices)
+    assert all(x.monthly_investment == 500 for x in states.values())
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from benchmark import synthetic_ohlcv
+from sip_backtest import EnhancedSIPBacktest
+from smart_sip import moving_average, value_averaging_amounts
+
+
+def reference_smart_sip(data, month_index, kind, monthly_investment=1000, ma_window=60, multiplier=2.0, threshold=0.0,
+                        band=0.1, growth=0.0, max_multiple=None, allow_sell=False):
+    # 逐月切片、逐笔累加的参考实现；每月在第一个交易日按收盘价操作
+    # 均线与数组版本共用 moving_average，避免价格恰好等于均线时两种求和方式的舍入差异改变判断
+    ma = moving_average(data['close'].to_numpy(), ma_window)
+    month_starts, month_ends = month_index
+    target = 0.0
+    shares = 0.0
+    amounts = []
+    for start, end in zip(month_starts, month_ends):
+        month_data = data.iloc[start:end]
+        price = month_data['close'].iloc[0]
+        average = ma[start]
+        if kind == 'value_averaging':
+            target = target * (1 + growth) + monthly_investment
+            amount = target - shares * price
+            if max_multiple is not None:
+                amount = min(amount, monthly_investment * max_multiple)
+            amount = max(amount, -shares * price) if allow_sell else max(amount, 0.0)
+        elif kind == 'ma_topup':
+            amount = monthly_investment * multiplier if average == average and price < average * (1 - threshold) else monthly_investment
+        elif kind == 'pause_above_band':
+            amount = 0.0 if average == average and price > average * (1 + band) else monthly_investment
+        else:
+            raise ValueError(f"未知的策略类型: {kind}")
+        shares += amount / price
+        amounts.append(float(amount))
+    return np.array(amounts)
+
+
+@pytest.fixture
+def prices():
+    return synthetic_ohlcv(years=4, seed=11, volatility=0.03, gap_prob=0.05)
+
+
+def monthly_amounts(backtest, result):
+    # 把结果中的买入记录还原为每月金额，当月不投为 0
+    by_date = {x['date']: x['amount'] for x in result['investment_dates']}
+    return np.array([by_date.get(date, 0.0) for date in backtest.data.index[backtest.month_starts]])
+
+
+@pytest.mark.parametrize('va_max_multiple', [3.0, 1.5, None])
+def test_run_smart_strategies_matches_reference(prices, va_max_multiple):
+    backtest = EnhancedSIPBacktest(prices, monthly_investment=1000)
+    results = backtest.run_smart_strategies(ma_window=60, topup_multiplier=2.0, band=0.1, va_growth=0.01,
+                                            va_max_multiple=va_max_multiple)
+    month_index = (backtest.month_starts, backtest.month_ends)
+    expected = {
+        "价值平均定投": reference_smart_sip(prices, month_index, 'value_averaging', growth=0.01,
+                                      max_multiple=va_max_multiple),
+        "低于60日均线加倍定投": reference_smart_sip(prices, month_index, 'ma_topup', multiplier=2.0),
+        "高于60日均线10%暂停定投": reference_smart_sip(prices, month_index, 'pause_above_band', band=0.1),
+    }
+    assert list(results) == list(expected)
+    for name, amounts in expected.items():
+        np.testing.assert_allclose(monthly_amounts(backtest, results[name]), amounts, rtol=1e-9, atol=1e-9,
+                                   err_msg=name)
+        assert results[name]['total_invested'] == pytest.approx(amounts.sum(), rel=1e-9)
+
+    # 每种规则至少触发一次，否则比较不到分支
+    assert (expected["低于60日均线加倍定投"] == 2000).any()
+    assert (expected["高于60日均线10%暂停定投"] == 0).any()
+    if va_max_multiple is not None:
+        assert (expected["价值平均定投"] == 1000 * va_max_multiple).any()
+
+
+@pytest.mark.parametrize('max_multiple', [None, 2.0])
+def test_value_averaging_allow_sell_matches_reference(prices, max_multiple):
+    # max_multiple 为 None 时走闭式解，否则逐月推进
+    backtest = EnhancedSIPBacktest(prices)
+    month_index = (backtest.month_starts, backtest.month_ends)
+    expected = reference_smart_sip(prices, month_index, 'value_averaging', growth=0.02, max_multiple=max_multiple,
+                                   allow_sell=True)
+    month_prices = prices['close'].to_numpy()[backtest.month_starts]
+    actual = value_averaging_amounts(month_prices, 1000, growth=0.02, max_multiple=max_multiple, allow_sell=True)
+    np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-6)
+    assert (expected < 0).any()
+
+
+def test_value_averaging_columns_are_independent(prices):
+    backtest = EnhancedSIPBacktest(prices)
+    month_prices = prices['close'].to_numpy()[backtest.month_starts]
+    stacked = np.stack([month_prices, month_prices[::-1]], axis=1)
+    for allow_sell in (False, True):
+        batch = value_averaging_amounts(stacked, 1000, growth=0.01, allow_sell=allow_sell)
+        for j in range(stacked.shape[1]):
+            np.testing.assert_allclose(batch[:, j], value_averaging_amounts(stacked[:, j], 1000, growth=0.01,
+                                                                            allow_sell=allow_sell))
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmark import STRATEGY_METHODS
+from sip_backtest import EnhancedSIPBacktest
+
+FIELDS = ['total_invested', 'final_value', 'total_profit', 'profit_rate', 'annualized_return', 'xirr',
+          'investment_count']
+
+
+def callback_results(data):
+    backtest = EnhancedSIPBacktest(data)
+    return {name: backtest.run_strategy(name, getattr(backtest, method)) for name, method in STRATEGY_METHODS}
+
+
+def test_fixture_has_single_row_month(gappy_prices):
+    counts = gappy_prices.groupby(gappy_prices.index.to_period('M')).size()
+    assert counts[pd.Period('2019-03', 'M')] == 1
+    assert (counts < 15).any()
+
+
+def test_run_all_strategies_matches_callback_path(gappy_prices):
+    expected = callback_results(gappy_prices)
+    actual = EnhancedSIPBacktest(gappy_prices).run_all_strategies(verbose=False)
+    assert list(actual) == list(expected)
+    for name, result in expected.items():
+        for field in FIELDS:
+            assert actual[name][field] == pytest.approx(result[field], rel=1e-12), (name, field)
+        dates = [x['date'] for x in actual[name]['investment_dates']]
+        assert dates == [x['date'] for x in result['investment_dates']], name
+        for field in ('price', 'shares'):
+            np.testing.assert_allclose([x[field] for x in actual[name]['investment_dates']],
+                                       [x[field] for x in result['investment_dates']], rtol=1e-12)
+
+
+def test_lowest_picks_first_of_tied_lows(gappy_prices):
+    result = EnhancedSIPBacktest(gappy_prices).run_all_strategies(verbose=False)["每月最低点定投(理想)"]
+    april = [x['date'] for x in result['investment_dates'] if (x['date'].year, x['date'].month) == (2019, 4)]
+    assert april == [gappy_prices.index[(gappy_prices.index.year == 2019) & (gappy_prices.index.month == 4)][0]]
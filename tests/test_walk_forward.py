@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import walk_forward
+from benchmark import synthetic_ohlcv
+from walk_forward import ranking_stability
+
+
+def test_all_nan_windows_are_skipped(monkeypatch):
+    data = synthetic_ohlcv(years=4, seed=3)
+    real_metrics = walk_forward.window_metrics
+
+    def metrics(data, month_index, first, last, *args):
+        # 第一个窗口的训练区间指标全为 NaN(例如 --metric xirr 无解)，其余窗口正常
+        result = real_metrics(data, month_index, first, last, *args)
+        return result * np.nan if first == 0 else result
+
+    monkeypatch.setattr(walk_forward, 'window_metrics', metrics)
+    table = walk_forward.walk_forward(data, train_months=12, test_months=6, workers=1)
+    expected = walk_forward.window_bounds(len(walk_forward.build_month_index(data.index)[0]), 12, 6)
+    assert len(table) == len(expected) - 1
+    assert table['train_start'].iloc[0] > data.index[0]
+    assert ranking_stability(table)['windows'] == len(table)
+
+
+def test_chosen_strategy_without_test_value_has_no_rank(monkeypatch):
+    train = pd.Series({'a': 2.0, 'b': 1.0, 'c': 0.5})
+    test = pd.Series({'a': np.nan, 'b': 3.0, 'c': 4.0})
+    calls = iter([train, test])
+    monkeypatch.setattr(walk_forward, 'window_metrics', lambda *args: next(calls))
+    data = synthetic_ohlcv(years=1, seed=1)
+    month_index = walk_forward.build_month_index(data.index)
+    row = walk_forward.evaluate_window(data, (month_index, (0, 6, 12), 1000, 'xirr', False, ()))
+    assert row['chosen'] == 'a'
+    assert np.isnan(row['chosen_test_rank'])
+    assert row['test_best'] == 'c'
+    stability = ranking_stability(pd.DataFrame([row]))
+    assert np.isnan(stability['mean_chosen_test_rank'])
+    assert stability['winner_persistence'] == 0
+
+
+def test_window_bounds():
+    assert walk_forward.window_bounds(48, 24, 12) == [(0, 24, 36), (12, 36, 48)]
+    assert walk_forward.window_bounds(40, 24, 12, step_months=2) == [(0, 24, 36), (2, 26, 38), (4, 28, 40)]
+    assert walk_forward.window_bounds(35, 24, 12) == []
+
+
+def test_windows_match_standalone_backtests():
+    data = synthetic_ohlcv(years=4, seed=5)
+    table = walk_forward.walk_forward(data, train_months=12, test_months=12, workers=1)
+    assert len(table) == len(walk_forward.window_bounds(len(walk_forward.build_month_index(data.index)[0]), 12, 12))
+    for _, row in table.iterrows():
+        # 窗口共用整段数据的月份边界，结果应与单独回测测试区间相同
+        test = data.loc[row['test_start']:row['test_end']]
+        results = walk_forward.EnhancedSIPBacktest(test).run_all_strategies(verbose=False)
+        assert results[row['chosen']]['profit_rate'] == pytest.approx(row['chosen_test'])
+        assert row['strategies'] == len(results) - len(walk_forward.HINDSIGHT_STRATEGIES)
+
+
+def test_ranking_stability_summary():
+    table = pd.DataFrame({
+        'chosen': ['a', 'a', 'b', 'a'],
+        'test_best': ['a', 'b', 'b', 'c'],
+        'chosen_test_rank': [1.0, 2.0, 1.0, 3.0],
+        'chosen_test': [5.0, 1.0, 4.0, -1.0],
+        'test_median': [2.0, 2.0, 1.0, 1.0],
+        'rank_correlation': [1.0, 0.5, 0.0, -0.5],
+    })
+    stability = ranking_stability(table)
+    assert stability['windows'] == 4
+    assert stability['winner_persistence'] == 50.0
+    assert stability['mean_chosen_test_rank'] == 1.75
+    assert stability['mean_excess_over_median'] == 0.75
+    assert stability['mean_rank_correlation'] == 0.25
+    assert stability['chosen_counts'] == {'a': 3, 'b': 1}
+    assert ranking_stability(table.iloc[:0]) == {}
@@ -0,0 +1,92 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from xirr import DAYS_PER_YEAR, batch_xirr, xirr_from_records
+
+
+def reference_xirr(days, amounts, terminal_day, terminal_value):
+    # 逐个序列的二分法参考实现，在 r 上直接求解 sum(a * (1+r)^t) = V
+    years = [(terminal_day - d) / DAYS_PER_YEAR for d in days]
+
+    def f(r):
+        return terminal_value - sum(a * (1 + r) ** t for a, t in zip(amounts, years))
+
+    lo, hi = -1 + 1e-12, 1e3
+    if f(lo) * f(hi) > 0:
+        return math.nan
+    for _ in range(400):
+        mid = (lo + hi) / 2
+        if (f(mid) > 0) == (f(lo) > 0):
+            lo = mid
+        else:
+            hi = mid
+    return (lo + hi) / 2 * 100
+
+
+def monthly_flows(rng, n_months, amount=1000.0):
+    days = np.sort(rng.choice(np.arange(n_months * 30), n_months, replace=False)).astype(float)
+    return days, np.full(n_months, amount)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_matches_bisection_reference(seed):
+    rng = np.random.default_rng(seed)
+    days, amounts = monthly_flows(rng, int(rng.integers(2, 120)))
+    terminal_day = days[-1] + rng.integers(0, 60)
+    terminal_value = amounts.sum() * rng.uniform(0.2, 3.0)
+    expected = reference_xirr(days, amounts, terminal_day, terminal_value)
+    assert batch_xirr(days, amounts, terminal_day, terminal_value) == pytest.approx(expected, rel=1e-7, abs=1e-7)
+
+
+def test_batch_matches_per_series():
+    rng = np.random.default_rng(42)
+    n_flows, n_series = 36, 25
+    days = np.sort(rng.uniform(0, 1100, (n_flows, n_series)), axis=0)
+    amounts = rng.uniform(0, 2000, (n_flows, n_series))
+    amounts[rng.random((n_flows, n_series)) < 0.2] = 0
+    values = amounts.sum(axis=0) * rng.uniform(0.1, 4, n_series)
+    batch = batch_xirr(days, amounts, 1100.0, values)
+    for j in range(n_series):
+        assert batch[j] == pytest.approx(reference_xirr(days[:, j], amounts[:, j], 1100.0, values[j]),
+                                         rel=1e-7, abs=1e-7)
+
+
+def test_same_day_flows_equal_merged_flow():
+    days = np.array([0, 30, 30, 30, 60, 365])
+    amounts = np.array([1000, 500, 250, 250, 1000, 1000])
+    merged = batch_xirr([0, 30, 60, 365], [1000, 1000, 1000, 1000], 400, 4500)
+    assert batch_xirr(days, amounts, 400, 4500) == pytest.approx(merged, rel=1e-9)
+    assert merged == pytest.approx(reference_xirr([0, 30, 60, 365], [1000] * 4, 400, 4500), rel=1e-7)
+
+
+def test_flow_on_terminal_day():
+    # 期末当天的投入不产生收益，只影响其余投入的收益率
+    expected = reference_xirr([0, DAYS_PER_YEAR], [1000, 1000], DAYS_PER_YEAR, 2100)
+    assert batch_xirr([0, DAYS_PER_YEAR], [1000, 1000], DAYS_PER_YEAR, 2100) == pytest.approx(expected, rel=1e-7)
+    assert expected == pytest.approx(10.0, rel=1e-9)
+
+
+def test_total_loss_is_minus_100_percent():
+    days, amounts = monthly_flows(np.random.default_rng(0), 24)
+    assert batch_xirr(days, amounts, days[-1] + 10, 0.0) == -100.0
+    batch = batch_xirr(np.stack([days, days], axis=1), np.stack([amounts, amounts], axis=1), days[-1] + 10,
+                       [0.0, amounts.sum()])
+    assert batch[0] == -100.0 and np.isfinite(batch[1]) and batch[1] > -100
+
+
+def test_no_root_is_nan():
+    # 所有投入都在期末当天，期末市值与投入不等: 任何收益率都无法满足
+    assert np.isnan(batch_xirr([10, 10], [1000, 1000], 10, 2500))
+    assert np.isnan(batch_xirr([0, 30], [0, 0], 60, 0.0))
+
+
+def test_xirr_from_records():
+    records = [{'date': pd.Timestamp('2024-01-02')}, {'date': pd.Timestamp('2024-07-01'), 'amount': 2000}]
+    end = pd.Timestamp('2025-01-02')
+    expected = reference_xirr([0, (records[1]['date'] - records[0]['date']).days], [1000, 2000],
+                              (end - records[0]['date']).days, 3300)
+    assert xirr_from_records(records, end, 3300) == pytest.approx(expected, rel=1e-7)
+    assert np.isnan(xirr_from_records([], end, 0))
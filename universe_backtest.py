@@ -0,0 +1,103 @@
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from data_loader import load_price_data
+from price_panel import PricePanel
+from sip_backtest import EnhancedSIPBacktest
+
+SUMMARY_FIELDS = ['total_invested', 'final_value', 'total_profit', 'profit_rate',
+                  'annualized_return', 'xirr', 'investment_count']
+
+
+def find_symbol_files(data_dir, pattern='*.csv'):
+    files = sorted(glob.glob(os.path.join(data_dir, pattern)))
+    return [(os.path.splitext(os.path.basename(path))[0], path) for path in files]
+
+
+_panel_cache = {}
+
+
+def load_panel(panel_dir):
+    # 每个 worker 只以内存映射方式打开一次面板，各进程共享同一份页缓存
+    if panel_dir not in _panel_cache:
+        _panel_cache[panel_dir] = PricePanel.load(panel_dir, mmap=True)
+    return _panel_cache[panel_dir]
+
+
+def backtest_symbol(task):
+    # 在 worker 内加载数据并回测，只把精简的汇总结果传回主进程，不传 investment_dates
+    # path 为 CSV 文件；panel_dir 不为 None 时改为从面板中取出该股票
+    symbol, csv_path, monthly_investment, smart, panel_dir = task
+    try:
+        data = load_panel(panel_dir)[symbol] if panel_dir is not None else load_price_data(csv_path)
+        if len(data) == 0 or (panel_dir is not None and not data.valid.any()):
+            raise ValueError("数据为空")
+        backtest = EnhancedSIPBacktest(data, monthly_investment=monthly_investment)
+        results = backtest.run_all_strategies(verbose=False, smart=smart)
+        rows = []
+        for name, result in results.items():
+            row = {'symbol': symbol, 'strategy': name}
+            row.update({field: result[field] for field in SUMMARY_FIELDS})
+            rows.append(row)
+        return symbol, rows, None
+    except Exception as e:
+        return symbol, [], f"{type(e).__name__}: {e}"
+
+
+def run_universe(symbol_files, monthly_investment=1000, workers=None, chunksize=4, sort_by='profit_rate', smart=False,
+                 panel_dir=None):
+    tasks = [(symbol, path, monthly_investment, smart, panel_dir) for symbol, path in symbol_files]
+    rows = []
+    failures = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for done, (symbol, symbol_rows, error) in enumerate(pool.map(backtest_symbol, tasks, chunksize=chunksize), 1):
+            if error is None:
+                rows.extend(symbol_rows)
+            else:
+                failures[symbol] = error
+            if done % 100 == 0 or done == len(tasks):
+                print(f"已完成 {done}/{len(tasks)}")
+
+    table = pd.DataFrame(rows, columns=['symbol', 'strategy'] + SUMMARY_FIELDS)
+    table = table.sort_values(sort_by, ascending=False, ignore_index=True)
+    table.insert(0, 'rank', range(1, len(table) + 1))
+    return table, failures
+
+
+def run(args):
+    # 排序字段在这里校验，cli.py 解析参数时不需要导入本模块
+    if args.sort_by not in SUMMARY_FIELDS:
+        raise SystemExit(f"--sort-by 必须是以下字段之一: {', '.join(SUMMARY_FIELDS)}")
+    if args.panel:
+        symbol_files = [(symbol, None) for symbol in PricePanel.load(args.panel).symbols]
+        print(f"面板 {args.panel} 共 {len(symbol_files)} 只股票，开始回测...")
+    else:
+        symbol_files = find_symbol_files(args.data_dir, args.pattern)
+        print(f"共找到 {len(symbol_files)} 个股票数据文件，开始回测...")
+
+    started = time.time()
+    table, failures = run_universe(symbol_files, args.monthly_investment, args.workers, sort_by=args.sort_by,
+                                   smart=args.smart, panel_dir=args.panel)
+    print(f"回测完成，用时 {time.time() - started:.1f} 秒")
+
+    print("\n" + "=" * 100)
+    print(f"{'排名':<6} {'代码':<10} {'策略名称':<25} {'收益率(%)':<12} {'年化(%)':<10} {'期末资产(元)':<15}")
+    print("-" * 100)
+    for _, row in table.head(args.top).iterrows():
+        print(f"{row['rank']:<6} {row['symbol']:<10} {row['strategy']:<25} "
+              f"{row['profit_rate']:<12.2f} {row['annualized_return']:<10.2f} {row['final_value']:<15.2f}")
+
+    table.to_csv(args.output, index=False, encoding='utf-8-sig')
+    print(f"\n排名结果已保存为: {args.output}")
+    if failures:
+        print(f"失败 {len(failures)} 个: " + ', '.join(f"{k} ({v})" for k, v in failures.items()))
+
+
+if __name__ == '__main__':
+    import sys
+    from cli import main
+    main(['universe'] + sys.argv[1:])
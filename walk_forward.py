@@ -0,0 +1,173 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from data_loader import load_price_data
+from shared_prices import map_with_shared_data
+from sip_backtest import EnhancedSIPBacktest
+from sip_engine import build_month_index
+from universe_backtest import find_symbol_files, load_panel
+
+# 滚动前推检验: 历史按自然月切成 训练 train_months 个月 + 测试 test_months 个月 的窗口，每次前移 step_months 个月
+# 在训练窗口上按 metric 给策略排名并选出第一名，再看它在紧接着的测试窗口里排第几；各窗口共用整段数据的月份边界
+
+# 月内最低/最高点只有事后才知道，无法作为实际的定投日程，默认不参与排名
+HINDSIGHT_STRATEGIES = ("每月最低点定投(理想)", "每月最高点定投(最差)")
+
+
+def window_bounds(n_months, train_months=24, test_months=12, step_months=None):
+    # 每个窗口为 (训练首月, 测试首月, 测试结束月)，均为月份序号，区间左闭右开
+    step_months = test_months if step_months is None else step_months
+    return [(first, first + train_months, first + train_months + test_months)
+            for first in range(0, n_months - train_months - test_months + 1, step_months)]
+
+
+def slice_month_index(month_index, first, last):
+    # 第 first 至 last-1 个月对应的行区间，以及窗口内相对该区间起点的月份边界
+    month_starts, month_ends = month_index
+    row_start, row_end = month_starts[first], month_ends[last - 1]
+    return (row_start, row_end), (month_starts[first:last] - row_start, month_ends[first:last] - row_start)
+
+
+def window_metrics(data, month_index, first, last, monthly_investment=1000, metric='profit_rate', smart=False,
+                   exclude=HINDSIGHT_STRATEGIES):
+    (row_start, row_end), window_index = slice_month_index(month_index, first, last)
+    backtest = EnhancedSIPBacktest(data.iloc[row_start:row_end], monthly_investment=monthly_investment, copy=False,
+                                   month_index=window_index)
+    results = backtest.run_all_strategies(verbose=False, smart=smart)
+    return pd.Series({name: result[metric] for name, result in results.items() if name not in exclude}, dtype=float)
+
+
+def evaluate_window(data, task):
+    month_index, (train_first, test_first, test_last), monthly_investment, metric, smart, exclude = task
+    train = window_metrics(data, month_index, train_first, test_first, monthly_investment, metric, smart, exclude)
+    test = window_metrics(data, month_index, test_first, test_last, monthly_investment, metric, smart, exclude)
+    # 指标为 NaN 的策略(例如没有买入的窗口里的 xirr)不参与排名；任一侧全为 NaN 时跳过该窗口
+    if train.isna().all() or test.isna().all():
+        return None
+    train_ranks = train.rank(ascending=False, method='min')
+    test_ranks = test.rank(ascending=False, method='min')
+    chosen = train.idxmax()
+    month_starts, month_ends = month_index
+    return {
+        'train_start': data.index[month_starts[train_first]],
+        'test_start': data.index[month_starts[test_first]],
+        'test_end': data.index[month_ends[test_last - 1] - 1],
+        'chosen': chosen,
+        'chosen_train': train[chosen],
+        'chosen_test': test[chosen],
+        # 训练第一名在测试窗口中指标为 NaN 时没有排名
+        'chosen_test_rank': test_ranks[chosen],
+        'test_best': test.idxmax(),
+        'test_best_value': test.max(),
+        'test_median': test.median(),
+        # 训练与测试排名的 Spearman 相关系数，1 表示排名完全一致
+        'rank_correlation': train_ranks.corr(test_ranks),
+        'strategies': len(test)
+    }
+
+
+def walk_forward(data, train_months=24, test_months=12, step_months=None, monthly_investment=1000,
+                 metric='profit_rate', smart=False, workers=None, month_index=None, exclude=HINDSIGHT_STRATEGIES):
+    # 窗口之间相互独立，多于一个窗口时通过共享内存并行计算
+    if month_index is None:
+        month_index = build_month_index(data.index)
+    windows = window_bounds(len(month_index[0]), train_months, test_months, step_months)
+    tasks = [(month_index, window, monthly_investment, metric, smart, tuple(exclude)) for window in windows]
+    if len(tasks) <= 1 or workers == 1:
+        rows = [evaluate_window(data, task) for task in tasks]
+    else:
+        rows = map_with_shared_data(evaluate_window, data, tasks, workers)
+    return pd.DataFrame([row for row in rows if row is not None])
+
+
+def walk_forward_symbol(task):
+    # 全市场模式的 worker: 一只股票的所有窗口在同一进程内依次计算，月份边界只算一次
+    symbol, csv_path, panel_dir, options = task
+    try:
+        data = load_panel(panel_dir)[symbol].to_frame() if panel_dir is not None else load_price_data(csv_path)
+        table = walk_forward(data, workers=1, **options)
+        return symbol, table.assign(symbol=symbol), None
+    except Exception as e:
+        return symbol, None, f"{type(e).__name__}: {e}"
+
+
+def walk_forward_universe(symbol_files, panel_dir=None, workers=None, chunksize=4, **options):
+    tasks = [(symbol, path, panel_dir, options) for symbol, path in symbol_files]
+    tables = []
+    failures = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for done, (symbol, table, error) in enumerate(pool.map(walk_forward_symbol, tasks, chunksize=chunksize), 1):
+            if error is None:
+                tables.append(table)
+            else:
+                failures[symbol] = error
+            if done % 100 == 0 or done == len(tasks):
+                print(f"已完成 {done}/{len(tasks)}")
+    table = pd.concat(tables, ignore_index=True) if tables else pd.DataFrame()
+    return table, failures
+
+
+def ranking_stability(table):
+    # 汇总所有窗口: 训练第一名在测试中仍为第一的比例、平均测试排名、相对测试中位数的超额，以及排名相关系数
+    if len(table) == 0:
+        return {}
+    return {
+        'windows': len(table),
+        'winner_persistence': float((table['chosen'] == table['test_best']).mean() * 100),
+        'mean_chosen_test_rank': float(table['chosen_test_rank'].mean()),
+        'mean_excess_over_median': float((table['chosen_test'] - table['test_median']).mean()),
+        'mean_rank_correlation': float(table['rank_correlation'].mean()),
+        'chosen_counts': table['chosen'].value_counts().to_dict()
+    }
+
+
+def run(args):
+    options = {'train_months': args.train_months, 'test_months': args.test_months, 'step_months': args.step_months,
+               'monthly_investment': args.monthly_investment, 'metric': args.metric, 'smart': args.smart,
+               'exclude': [x.strip() for x in args.exclude.split(',') if x.strip()]}
+    started = time.time()
+    if args.panel or args.data_dir:
+        if args.panel:
+            from price_panel import PricePanel
+            symbol_files = [(symbol, None) for symbol in PricePanel.load(args.panel).symbols]
+        else:
+            symbol_files = find_symbol_files(args.data_dir, args.pattern)
+        print(f"共 {len(symbol_files)} 只股票，开始滚动前推检验...")
+        table, failures = walk_forward_universe(symbol_files, args.panel, args.workers, **options)
+        if failures:
+            print(f"失败 {len(failures)} 个: " + ', '.join(f"{k} ({v})" for k, v in failures.items()))
+    else:
+        data = load_price_data(args.csv)
+        table = walk_forward(data, workers=args.workers, **options)
+    print(f"完成，用时 {time.time() - started:.1f} 秒")
+
+    if len(table) == 0:
+        print("没有可评估的 训练 + 测试 窗口(数据不足，或各窗口的指标全为 NaN)")
+        return
+
+    if not (args.panel or args.data_dir):
+        print("\n" + "=" * 100)
+        print(f"{'训练开始':<12} {'测试开始':<12} {'训练第一名':<25} {'测试排名':<10} {'测试第一名':<25} {'排名相关':<10}")
+        print("-" * 100)
+        for _, row in table.iterrows():
+            print(f"{row['train_start']:%Y-%m-%d}   {row['test_start']:%Y-%m-%d}   {row['chosen']:<25} "
+                  f"{row['chosen_test_rank']:<10.0f} {row['test_best']:<25} {row['rank_correlation']:<10.2f}")
+
+    stability = ranking_stability(table)
+    print(f"\n窗口数: {stability['windows']} (训练 {args.train_months} 个月 / 测试 {args.test_months} 个月，指标 {args.metric})")
+    print(f"训练第一名在测试中仍为第一: {stability['winner_persistence']:.1f}%")
+    print(f"训练第一名的平均测试排名: {stability['mean_chosen_test_rank']:.2f}")
+    print(f"训练第一名相对测试中位数的平均超额: {stability['mean_excess_over_median']:.2f}")
+    print(f"训练与测试排名的平均相关系数: {stability['mean_rank_correlation']:.2f}")
+    print("各策略被选为第一的次数: " + ', '.join(f"{k} {v}" for k, v in stability['chosen_counts'].items()))
+
+    table.to_csv(args.output, index=False, encoding='utf-8-sig')
+    print(f"\n各窗口结果已保存为: {args.output}")
+
+
+if __name__ == '__main__':
+    import sys
+    from cli import main
+    main(['walkforward'] + sys.argv[1:])
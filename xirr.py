@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+# 资金加权收益率(XIRR): 求年化收益率 r，使每笔投入按 (1+r) 复利到期末的总额等于期末市值
+# 以 x = ln(1+r) 为未知数，所有序列同时做带区间保护的牛顿迭代: 牛顿步落在当前有根区间外时改用二分，已收敛的序列不再参与计算
+
+DAYS_PER_YEAR = 365.25
+LOG_RATE_BOUNDS = (-20.0, 10.0)
+
+
+def batch_xirr(flow_days, amounts, terminal_days, terminal_values, tol=1e-10, max_iter=100):
+    # flow_days/amounts 形状为 (现金流数, 序列...)，amounts 为投入金额(正数为买入，负数为卖出，0 表示没有现金流)
+    # terminal_days/terminal_values 可广播到 序列... 的形状；返回百分比形式的年化收益率，区间内无解的序列为 NaN
+    # 只有投入、期末市值为 0 的序列(全部亏光)没有有限的根，直接返回 -100%
+    amounts = np.asarray(amounts, dtype=float)
+    series_shape = amounts.shape[1:]
+    n_flows = amounts.shape[0]
+    amounts = amounts.reshape(n_flows, -1)
+    flow_days = np.broadcast_to(np.asarray(flow_days, dtype=float), (n_flows,) + series_shape).reshape(n_flows, -1)
+    terminal_days = np.broadcast_to(np.asarray(terminal_days, dtype=float), series_shape).reshape(-1)
+    terminal_values = np.broadcast_to(np.asarray(terminal_values, dtype=float), series_shape).reshape(-1)
+    years = (terminal_days[None, :] - flow_days) / DAYS_PER_YEAR
+    n_series = amounts.shape[1]
+
+    def residual(x, columns):
+        # 期末市值 - 各笔投入复利到期末的总额，以及对 x 的导数
+        growth = np.exp(years[:, columns] * x) * amounts[:, columns]
+        return terminal_values[columns] - growth.sum(axis=0), -(years[:, columns] * growth).sum(axis=0)
+
+    all_columns = np.arange(n_series)
+    lo = np.full(n_series, LOG_RATE_BOUNDS[0])
+    hi = np.full(n_series, LOG_RATE_BOUNDS[1])
+    f_lo, _ = residual(lo, all_columns)
+    f_hi, _ = residual(hi, all_columns)
+    scale = np.abs(amounts).sum(axis=0) + np.abs(terminal_values)
+    solvable = (np.sign(f_lo) != np.sign(f_hi)) & (scale > 0)
+
+    # 初值: 把所有投入视为在金额加权的平均时点一次投入
+    invested = amounts.sum(axis=0)
+    mean_years = np.divide((amounts * years).sum(axis=0), invested, out=np.zeros(n_series), where=invested > 0)
+    ratio = np.divide(terminal_values, invested, out=np.ones(n_series), where=(invested > 0) & (terminal_values > 0))
+    x = np.divide(np.log(ratio), mean_years, out=np.zeros(n_series), where=mean_years > 0)
+    x = np.clip(x, lo + 1e-9, hi - 1e-9)
+
+    result = np.full(n_series, np.nan)
+    active = np.flatnonzero(solvable)
+    for _ in range(max_iter):
+        if len(active) == 0:
+            break
+        f, df = residual(x[active], active)
+        done = np.abs(f) <= tol * scale[active]
+        result[active[done]] = x[active[done]]
+
+        # 与下界同号则根在 x 右侧
+        right = np.sign(f) == np.sign(f_lo[active])
+        lo[active] = np.where(right, x[active], lo[active])
+        hi[active] = np.where(right, hi[active], x[active])
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = x[active] - f / df
+        inside = np.isfinite(step) & (step > lo[active]) & (step < hi[active])
+        x[active] = np.where(inside, step, (lo[active] + hi[active]) / 2)
+
+        narrow = hi[active] - lo[active] <= 1e-15 * np.maximum(1.0, np.abs(x[active]))
+        result[active[narrow & ~done]] = x[active[narrow & ~done]]
+        active = active[~done & ~narrow]
+
+    result[active] = x[active]
+    total_loss = (terminal_values == 0) & (amounts >= 0).all(axis=0) & (invested > 0)
+    result[total_loss] = -np.inf
+    return (np.expm1(result) * 100).reshape(series_shape)
+
+
+def xirr_from_records(investment_dates, end_date, final_value, monthly_investment=1000):
+    # 单个回测结果的 XIRR；记录中没有 amount 时每笔按 monthly_investment 计
+    if not investment_dates:
+        return np.nan
+    end_date = pd.Timestamp(end_date)
+    days = [(end_date - pd.Timestamp(x['date'])).days for x in investment_dates]
+    amounts = [x.get('amount', monthly_investment) for x in investment_dates]
+    return float(batch_xirr(-np.asarray(days, dtype=float), amounts, 0.0, final_value))